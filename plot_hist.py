@@ -2,38 +2,62 @@
 
 '''
 Plot results of nographics run
-'''
 
-import numpy as np
-import matplotlib.pyplot as plt
+Usage: plot_hist.py [stats]
 
-with open('stats.txt') as f:
-    good = map(int, f.readline().split(', '))
-    bad = map(int, f.readline().split(', '))
-    scores = map(int, f.readline().split(', '))
-
-total_counts = [0 for i in range(11)]
-for i in range(len(good)):
-    total_counts[good[i] + bad[i]] += 1
+Reads the columnar results directory written by nographics
+(memory-mapped, so sweeps of any size load instantly) or, when
+given a text file, the older stats.txt layout.
+'''
 
-good_counts = [0 for i in range(11)]
-for count in good:
-    good_counts[count] += 1
+import json
+import os
+import sys
 
-bad_counts = [0 for i in range(11)]
-for count in bad:
-    bad_counts[count] += 1
+import numpy as np
+import matplotlib.pyplot as plt
 
-plt.subplot(131)
+if len(sys.argv) > 1:
+    path = sys.argv[1]
+else:
+    path = 'stats' if os.path.isdir('stats') else 'stats.txt'
+
+if os.path.isdir(path):
+    done = np.load(os.path.join(path, 'done.npy'), mmap_mode='r')
+    good = np.load(os.path.join(path, 'good_exits.npy'), mmap_mode='r')[done]
+    bad = np.load(os.path.join(path, 'bad_exits.npy'), mmap_mode='r')[done]
+    exit_time = np.load(os.path.join(path, 'exit_time.npy'), mmap_mode='r')[done]
+
+    with open(os.path.join(path, 'meta.json')) as f:
+        targets = json.load(f)['targets']
+else:
+    with open(path) as f:
+        good = np.array(f.readline().split(', '), dtype=int)
+        bad = np.array(f.readline().split(', '), dtype=int)
+    exit_time = None
+    targets = max((good + bad).max(), 10)
+
+bins = range(0, targets + 1)
+
+plt.subplot(141 if exit_time is not None else 131)
 plt.title('Exits on the green side')
-plt.bar(range(0, 11), good_counts, 1.0, align='center')
+plt.bar(bins, np.bincount(good, minlength=targets + 1), 1.0, align='center')
 
-plt.subplot(132)
+plt.subplot(142 if exit_time is not None else 132)
 plt.title('Exits on bad sides')
-plt.bar(range(0, 11), bad_counts, 1.0, align='center')
+plt.bar(bins, np.bincount(bad, minlength=targets + 1), 1.0, align='center')
 
-plt.subplot(133)
+plt.subplot(143 if exit_time is not None else 133)
 plt.title('Exits on all sides')
-plt.bar(range(0, 11), total_counts, 1.0, align='center')
+plt.bar(bins, np.bincount(good + bad, minlength=targets + 1), 1.0, align='center')
+
+if exit_time is not None:
+    # exit times of every target that left, in 10 second bins
+    times = exit_time[~np.isnan(exit_time)]
+    (counts, edges) = np.histogram(times, bins=np.arange(0, times.max() + 10 if len(times) else 10, 10))
+
+    plt.subplot(144)
+    plt.title('Exit times (s)')
+    plt.bar(edges[:-1], counts, 10.0, align='edge')
 
 plt.show()
@@ -8,13 +8,17 @@ CLI interface for various functions.
 from __future__ import print_function
 
 import argparse
+import os
 import numpy as np
 import time
-import pyglet
 
 import roombasim.config as cfg
-from roombasim.graphics import Display
-from roombasim.environment import Environment
+from roombasim.environment import Environment, BatchedEnvironment, noise
+from roombasim import runner
+from roombasim import events
+
+# simulation engines selectable with -engine
+ENGINES = runner.ENGINES
 
 
 def main():
@@ -29,6 +33,12 @@ def main():
                                    nargs=3,
                                    default=[1.5, 1.5, 0.0])
     controller_parser.add_argument('-timescale', type=float)
+    controller_parser.add_argument('-record', type=str)
+    controller_parser.add_argument('-compress', action='store_true')
+    controller_parser.add_argument('-headless', action='store_true')
+    controller_parser.add_argument('-rounds', type=int, default=1)
+    controller_parser.add_argument('-seed', type=int)
+    controller_parser.add_argument('-engine', choices=sorted(ENGINES), default='object')
 
     demo_parser = subparsers.add_parser('demo')
     demo_parser.add_argument('-num_targets', type=int, choices=range(1,25))
@@ -36,13 +46,62 @@ def main():
     demo_parser.add_argument('-target_spawn_radius', type=float)
     demo_parser.add_argument('-obstacle_spawn_radius', type=float)
     demo_parser.add_argument('-timescale', type=float)
+    demo_parser.add_argument('-record', type=str)
+    demo_parser.add_argument('-compress', action='store_true')
+
+    replay_parser = subparsers.add_parser('replay')
+    replay_parser.add_argument('recording')
+    replay_parser.add_argument('-timescale', type=float)
 
-    speedtest_parser = subparsers.add_parser('speedtest')
-    speedtest_parser.add_argument('-frames', type=int, default=1000)
+    bench_parser = subparsers.add_parser('bench')
+    bench_parser.add_argument('filter', nargs='*')
+    bench_parser.add_argument('-steps', type=int)
+    bench_parser.add_argument('-output', type=str, default='bench.json')
+    bench_parser.add_argument('-list', action='store_true')
 
     nographics_parser = subparsers.add_parser('nographics')
     nographics_parser.add_argument('-rounds', type=int, default=1)
     nographics_parser.add_argument('-stats_file', type=str, default='stats.txt')
+    nographics_parser.add_argument('-engine', choices=sorted(ENGINES) + ['batched'], default='object')
+    nographics_parser.add_argument('-batch_size', type=int, default=64)
+    nographics_parser.add_argument('-seed', type=int)
+    nographics_parser.add_argument('-workers', type=int, default=1)
+    nographics_parser.add_argument('-details_file', type=str)
+    nographics_parser.add_argument('-stats_dir', type=str)
+
+    sweep_parser = subparsers.add_parser('sweep')
+    sweep_parser.add_argument('spec')
+    sweep_parser.add_argument('-rounds', type=int)
+    sweep_parser.add_argument('-seed', type=int)
+    sweep_parser.add_argument('-workers', type=int, default=1)
+    sweep_parser.add_argument('-engine', choices=sorted(ENGINES), default='object')
+    sweep_parser.add_argument('-controller', type=str)
+    sweep_parser.add_argument('-start_location', type=float, nargs=3, default=[1.5, 1.5, 0.0])
+    sweep_parser.add_argument('-output', type=str, default='sweep.csv')
+
+    collisiontest_parser = subparsers.add_parser('collisiontest')
+    collisiontest_parser.add_argument('-counts', type=int, nargs='+', default=[14, 50, 100, 200, 400])
+    collisiontest_parser.add_argument('-frames', type=int, default=300)
+
+    clonetest_parser = subparsers.add_parser('clonetest')
+    clonetest_parser.add_argument('-count', type=int, default=10000)
+    clonetest_parser.add_argument('-engine', choices=sorted(ENGINES), default='object')
+
+    render_parser = subparsers.add_parser('render')
+    render_parser.add_argument('output')
+    render_parser.add_argument('-engine', choices=sorted(ENGINES), default='object')
+    render_parser.add_argument('-seed', type=int)
+    render_parser.add_argument('-round', type=int)
+    render_parser.add_argument('-controller', type=str)
+    render_parser.add_argument('-start_location', type=float, nargs=3, default=[1.5, 1.5, 0.0])
+    render_parser.add_argument('-duration', type=float)
+    render_parser.add_argument('-fps', type=float, default=10)
+    render_parser.add_argument('-size', type=int, default=700)
+    render_parser.add_argument('-record', type=str)
+    render_parser.add_argument('-compress', action='store_true')
+
+    geometrytest_parser = subparsers.add_parser('geometrytest')
+    geometrytest_parser.add_argument('-count', type=int, default=1000)
 
     keydemo_parser = subparsers.add_parser('keydemo')
 
@@ -52,6 +111,8 @@ def main():
     hmi_parser.add_argument('-target_spawn_radius', type=float)
     hmi_parser.add_argument('-obstacle_spawn_radius', type=float)
     hmi_parser.add_argument('-timescale', type=float)
+    hmi_parser.add_argument('-record', type=str)
+    hmi_parser.add_argument('-compress', action='store_true')
 
     args = parser.parse_args()
 
@@ -59,10 +120,22 @@ def main():
         run_controller(args)
     elif args.command == 'demo':
         run_demo(args)
-    elif args.command == 'speedtest':
-        speed_test(args)
+    elif args.command == 'replay':
+        replay_round(args)
+    elif args.command == 'bench':
+        run_bench(args)
     elif args.command == 'nographics':
         nographics_test(args)
+    elif args.command == 'sweep':
+        run_sweep(args)
+    elif args.command == 'collisiontest':
+        collision_test(args)
+    elif args.command == 'clonetest':
+        clone_test(args)
+    elif args.command == 'render':
+        render_round(args)
+    elif args.command == 'geometrytest':
+        geometry_test(args)
     elif args.command == 'keydemo':
         keyboard_demo(args)
     elif args.command == 'human_player':
@@ -84,6 +157,19 @@ def _load_class(cpath):
         return (None, e)
 
 
+def _start_recording(args, environment):
+    '''
+    Attaches a Recorder to environment if -record was given.
+    '''
+    if args.record is None:
+        return None
+
+    from roombasim.recording import Recorder
+
+    print('Recording to ' + args.record)
+    return Recorder(args.record, environment, compress=args.compress)
+
+
 def run_controller(args):
     config, err = _load_class(args.config)
 
@@ -104,19 +190,30 @@ def run_controller(args):
         return
     else:
         print("Loaded Controller: " + str(controller_p))
-    
-    # initialize controller
-    controller = controller_p()
 
+    if args.headless:
+        run_headless(args, controller_p)
+        return
+
+    # the window (and pyglet) is only loaded when it is shown
+    import pyglet
+    from roombasim.graphics.display import Display
+    
     # setup mission
     environment = Environment()
     environment.reset()
 
+    # initialize controller with the constants of the round
+    controller = controller_p(config=environment.config)
+
     # setup agent
     location = args.start_location
-    agent = cfg.AGENT([location[0],location[1]], 0, location[2])
+    agent = cfg.AGENT([location[0],location[1]], 0, location[2], config=environment.config)
     environment.agent = agent
 
+    # report exits and controller messages on the console
+    environment.event_log = events.PrintSink(kinds=(events.EXIT, events.MESSAGE))
+
     # create window so the keyboard can access it
     if args.timescale:
         window = Display(environment, args.timescale)
@@ -130,7 +227,66 @@ def run_controller(args):
     window.set_update_func(update_func)
     config = pyglet.gl.Config(sample_buffers=1, samples=4)
 
+    recorder = _start_recording(args, environment)
     pyglet.app.run()
+    if recorder is not None:
+        recorder.close()
+
+
+def run_headless(args, controller_p):
+    '''
+    Plays -rounds rounds of a controller without a window, stepping
+    the environment and the controller at the same fixed rate as
+    the windowed run but as fast as possible.
+
+    Round i is seeded like round i of nographics with the same
+    -seed (so render -seed -round can show it).
+    '''
+    from roombasim.recording import Recorder
+
+    if args.record is not None and args.rounds > 1 and '{' not in args.record:
+        print('Recording several rounds needs a file name pattern, '
+              'for example round_{}.rsim')
+        return
+
+    seed = noise.seed_sequence(args.seed)
+    seeds = noise.spawn_seeds(seed, args.rounds)
+    environment = ENGINES[args.engine]()
+    location = args.start_location
+
+    print('Starting {} rounds (seed entropy {})'.format(args.rounds, seed.entropy))
+
+    scores = []
+    start = time.time()
+
+    for i in range(args.rounds):
+        round_start = time.time()
+
+        environment.reset(seed=seeds[i])
+        environment.agent = cfg.AGENT([location[0], location[1]], 0, location[2],
+                                      config=environment.config)
+        controller = controller_p(config=environment.config)
+
+        recorder = None
+        if args.record is not None:
+            recorder = Recorder(args.record.format(i), environment, compress=args.compress)
+
+        runner.play_round(environment, controller=controller)
+
+        if recorder is not None:
+            recorder.close()
+
+        dur = time.time() - round_start
+        scores.append(environment.score)
+        print('Round {}: good {} bad {} score {} in {:.2f}s ({:.0f}x realtime)'.format(
+            i, environment.good_exits, environment.bad_exits, environment.score,
+            dur, cfg.MISSION_ROUND_DURATION / dur))
+
+    dur = time.time() - start
+    print('Played {} rounds in {} seconds ({} rounds/s)'.format(
+        args.rounds, dur, args.rounds / dur))
+    print('Score mean {} std {} min {} max {}'.format(
+        np.mean(scores), np.std(scores), np.min(scores), np.max(scores)))
 
 
 def run_demo(args):
@@ -150,7 +306,9 @@ def run_demo(args):
         cfg.MISSION_OBSTACLE_SPAWN_RADIUS = args.obstacle_spawn_radius
 
 
+    import pyglet
     import roombasim.pittras.config
+    from roombasim.graphics.display import Display
     cfg.load(roombasim.pittras.config)
 
     # setup mission
@@ -158,9 +316,12 @@ def run_demo(args):
     environment.reset()
 
     # setup agent
-    agent = cfg.AGENT([13,10], 0)
+    agent = cfg.AGENT([13,10], 0, config=environment.config)
     environment.agent = agent
 
+    # report exits and controller messages on the console
+    environment.event_log = events.PrintSink(kinds=(events.EXIT, events.MESSAGE))
+
     config = pyglet.gl.Config(sample_buffers=1, samples=4)
     if args.timescale:
         window = Display(environment, args.timescale)
@@ -172,12 +333,65 @@ def run_demo(args):
 
     window.set_update_func(update_func)
 
+    recorder = _start_recording(args, environment)
+    pyglet.app.run()
+    if recorder is not None:
+        recorder.close()
+
+
+def replay_round(args):
+    '''
+    Plays back a round recorded with -record. Clicking the arena
+    jumps to the time at that horizontal position (left edge is
+    the start, right edge the end) and the left/right arrow keys
+    skip 5 seconds.
+    '''
+    import pyglet
+    from roombasim.graphics.display import Display
+    from roombasim.recording import Replay, ReplayEnvironment
+
+    import roombasim.pittras.config
+    cfg.load(roombasim.pittras.config)
+
+    replay = Replay(args.recording)
+    environment = ReplayEnvironment(replay)
+    print('Loaded {} frames ({} seconds)'.format(
+        len(replay), replay[-1]['elapsed'] / 1000))
+
+    if args.timescale:
+        window = Display(environment, args.timescale)
+    else:
+        window = Display(environment)
+
+    def seek(elapsed):
+        environment.seek_time(elapsed)
+        window.seek(environment.elapsed)
+
+    def update_func(delta, elapsed):
+        environment.update(delta, elapsed)
+
+    def click_callback(target, button):
+        x = target[0] if isinstance(target, tuple) else target.pos[0]
+        seek(replay[-1]['elapsed'] * min(max(x / 20.0, 0), 1))
+
+    def on_key_press(symbol, modifiers):
+        if symbol == pyglet.window.key.LEFT:
+            seek(environment.elapsed - 5000)
+        elif symbol == pyglet.window.key.RIGHT:
+            seek(environment.elapsed + 5000)
+
+    window.set_update_func(update_func)
+    window.set_click_callback(click_callback)
+    window.push_handlers(on_key_press)
+
     pyglet.app.run()
 
 
 def keyboard_demo(args):
+    import pyglet
     import roombasim.pittras.config
     from roombasim.ai import KeyboardController, KeyboardTask
+    from roombasim.graphics.display import Display
 
     cfg.load(roombasim.pittras.config)
 
@@ -186,9 +400,12 @@ def keyboard_demo(args):
     environment.reset()
 
     # setup agent
-    agent = cfg.AGENT([1.5,1.5], 0)
+    agent = cfg.AGENT([1.5,1.5], 0, config=environment.config)
     environment.agent = agent
 
+    # report exits and controller messages on the console
+    environment.event_log = events.PrintSink(kinds=(events.EXIT, events.MESSAGE))
+
     # create window so the keyboard can access it
     window = Display(environment)
 
@@ -205,70 +422,370 @@ def keyboard_demo(args):
     pyglet.app.run()
 
 
-def speed_test(args):
+def run_bench(args):
+    '''
+    Runs the benchmark suite (optionally only the benchmarks
+    whose name contains one of the filter strings) and writes
+    the results to a JSON file.
+    '''
+    from roombasim import benchmark
+
     import roombasim.pittras.config
     cfg.load(roombasim.pittras.config)
 
-    n = args.frames
+    if args.list:
+        for name in sorted(benchmark.BENCHMARKS):
+            print(name)
+        return
 
-    print('Starting speed test [{} frames]'.format(n))
+    def report(name, result):
+        print('{:42s} median {:9.1f} us  p95 {:9.1f} us  {:10.1f} steps/s'.format(
+            name, result['median_us'], result['p95_us'], result['steps_per_sec']))
 
-    e = Environment()
-    e.reset()
+    results = benchmark.run_suite(args.filter, args.steps, report)
+    benchmark.write_json(args.output, results)
+
+    print('Wrote {} results to {}'.format(len(results), args.output))
+
+def nographics_test(args):
+    import roombasim.pittras.config
+    cfg.load(roombasim.pittras.config)
 
-    d = cfg.AGENT([13,10], 0)
-    e.agent = d
+    n = args.rounds
+
+    if args.engine == 'batched' and args.workers > 1:
+        print('-workers is not supported by the batched engine (use -batch_size)')
+        return
+
+    # columnar results (see runner.StatsWriter) next to the stats file
+    stats_dir = args.stats_dir
+    if stats_dir is None:
+        stats_dir = os.path.splitext(args.stats_file)[0]
+
+    print('Starting {} rounds'.format(n))
+
+    # the entropy is kept so unseeded runs can be replayed
+    seed = noise.seed_sequence(args.seed)
+
+    config = cfg.current()
+    start = time.time()
+
+    if args.engine == 'batched':
+        # rounds share one noise stream and are numbered as they
+        # finish, so they cannot be replayed one by one
+        results = _batched_rounds(n, args.batch_size, seed, config)
+        with runner.StatsWriter(stats_dir, n, seed, args.engine, config=config,
+                                round_seeds=False) as writer:
+            for result in results:
+                writer.add(result)
+    else:
+        results = []
+        with runner.StatsWriter(stats_dir, n, seed, args.engine, config=config) as writer:
+            for result in runner.run_rounds(n, args.engine, seed, args.workers,
+                                            config=config):
+                results.append(result)
+                writer.add(result)
+                print('Round {} ({}/{}): good {} bad {} score {} in {:.2f}s'.format(
+                    result['round'], len(results), n, result['good_exits'],
+                    result['bad_exits'], result['score'], result['seconds']))
+
+    dur = time.time() - start
+    scores = [r['score'] for r in results]
+    print('Played {} rounds in {} seconds ({} rounds/s)'.format(n, dur, n / dur))
+    print('Score mean {} std {} min {} max {}'.format(
+        np.mean(scores), np.std(scores), np.min(scores), np.max(scores)))
+
+    runner.write_stats(args.stats_file, results)
+
+    details_file = args.details_file
+    if details_file is None:
+        details_file = os.path.splitext(args.stats_file)[0] + '.csv'
+    runner.write_details(details_file, results)
+
+    print('Done')
+
+def run_sweep(args):
+    '''
+    Plays -rounds seeded headless rounds for every point of a
+    parameter sweep (see roombasim.sweep) and writes one row of
+    results per point to -output.
+    '''
+    import json
+    from roombasim import sweep
+
+    import roombasim.pittras.config
+    cfg.load(roombasim.pittras.config)
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+
+    seed = noise.seed_sequence(args.seed)
+    points = sweep.points(spec, seed)
+    rounds = args.rounds if args.rounds is not None else int(spec.get('rounds', 1))
+
+    # fail on unknown constants before starting any worker
+    for point in points:
+        cfg.Config(**sweep.constants(point))
+
+    print('Sweeping {} points x {} rounds (seed entropy {})'.format(
+        len(points), rounds, seed.entropy))
+
+    start = time.time()
+    results = []
+    for result in sweep.run_sweep(points, rounds, args.engine, seed, args.workers,
+                                  args.controller, args.start_location):
+        results.append(result)
+        print('Point {} round {} ({}/{}): good {} bad {} score {} in {:.2f}s'.format(
+            result['point'], result['round'], len(results), len(points) * rounds,
+            result['good_exits'], result['bad_exits'], result['score'], result['seconds']))
+
+    dur = time.time() - start
+    print('Played {} rounds in {} seconds ({} rounds/s)'.format(
+        len(results), dur, len(results) / dur))
+
+    rows = sweep.summarize(points, results)
+    sweep.write_table(args.output, rows)
+
+    names = sorted(spec.get('params', {}))
+    print()
+    print('  '.join(['point'] + names + ['score_mean', 'score_std', 'good_mean', 'bad_mean']))
+    for row in sorted(rows, key=lambda r: -r['score_mean']):
+        print('  '.join([str(row['point'])] + [str(row[name]) for name in names]
+                        + ['{:.1f}'.format(row[key]) for key in
+                           ('score_mean', 'score_std', 'good_mean', 'bad_mean')]))
+
+    print('Wrote {} points to {}'.format(len(rows), args.output))
+
+def render_round(args):
+    '''
+    Plays a round without a window and writes every few frames
+    to a video or PNG sequence with the software renderer.
+
+    -seed and -round select the same round as the same options
+    of nographics (round i of a run seeded with -seed).
+    '''
+    from roombasim.graphics import RasterCanvas, FrameWriter
+
+    import roombasim.pittras.config
+    cfg.load(roombasim.pittras.config)
+
+    try:
+        writer = FrameWriter(args.output, fps=args.fps)
+    except ValueError as err:
+        print(err)
+        return
+
+    seed = args.seed
+    if args.round is not None:
+        seed = noise.spawn_seeds(seed, args.round + 1)[args.round]
+
+    e = ENGINES[args.engine]()
+    e.reset(seed=seed)
+
+    controller = None
+    if args.controller is not None:
+        controller_p, err = _load_class(args.controller)
+        if controller_p is None:
+            print("Couldn't load class: " + str(args.controller))
+            print('See the following error:\n')
+            print(err)
+            return
+
+        location = args.start_location
+        e.agent = cfg.AGENT([location[0], location[1]], 0, location[2], config=e.config)
+        controller = controller_p(config=e.config)
+
+    duration = args.duration if args.duration is not None else cfg.MISSION_ROUND_DURATION
+    dt = 1/60.
+    frames = int(round(duration / dt))
+    every = max(1, int(round(1 / (args.fps * dt))))
+
+    canvas = RasterCanvas(args.size)
+
+    print('Rendering {} seconds at {} fps to {}'.format(duration, args.fps, args.output))
+
+    recorder = _start_recording(args, e)
 
     start = time.time()
+    with writer:
+        for i in range(frames):
+            if i % every == 0:
+                writer.write(canvas.render(e))
+
+            elapsed = 1000 * i * dt
+            e.update(dt, elapsed)
+            if controller is not None:
+                controller.frame_update(dt, elapsed, e)
+
+    dur = time.time() - start
+    print('Wrote {} frames in {} seconds ({:.1f}x realtime)'.format(
+        writer.frames, dur, duration / dur))
+
+    if recorder is not None:
+        recorder.close()
+
+def _batched_rounds(n, batch_size, seed=None, config=None):
+    '''
+    Plays n rounds with a BatchedEnvironment, keeping up to
+    batch_size rounds in flight at once. Every round that was
+    started is played to the end, so short rounds are not
+    over-represented.
+
+    Returns result dicts with the RESULT_FIELDS keys, numbered in
+    the order the rounds finished (seconds is NaN since rounds
+    are not timed individually).
+    '''
+    e = BatchedEnvironment(min(batch_size, n), seed=seed, config=config, max_rounds=n)
+
+    while e.running.any():
+        e.step()
+
+    return [
+        {'round': i, 'good_exits': good, 'bad_exits': bad, 'score': score,
+         'seconds': float('nan')}
+        for (i, (good, bad, score)) in enumerate(e.results)
+    ]
+
+def collision_test(args):
+    '''
+    Compares the broadphase grid against testing every roomba
+    pair for increasing roomba counts.
+
+    Roombas are scattered uniformly over the arena (with random
+    headings) and both variants replay the same seeded round.
+    '''
+    import random
+
+    print('Starting collision test [{} frames per count]'.format(args.frames))
 
     dt = 1/60.
-    i = 0
-    el = 0
-    while i < n:
-        el += dt
-        e.update(dt, 1000 * el)
-        i += 1
 
-    end = time.time()
+    for count in args.counts:
+        config = cfg.Config(MISSION_NUM_TARGETS=count, MISSION_NUM_OBSTACLES=0)
 
-    dur = end - start
-    mul = n / dur
+        fps = {}
+        final = {}
+        for broadphase in (False, True):
+            np.random.seed(count)
+            random.seed(count)
 
-    print('Processing {} frames took {} seconds'.format(n, dur))
-    print('Speed of {} fps'.format(mul))
+            e = Environment(config)
+            e.reset()
+            e.broadphase = broadphase
 
-def nographics_test(args):
+            for rba in e.roombas:
+                rba.pos[:] = np.random.uniform(1, 19, 2)
+                rba.heading = np.random.uniform(0, cfg.TAU)
+
+            start = time.time()
+            for i in range(args.frames):
+                e.update(dt, 1000 * i * dt)
+            fps[broadphase] = args.frames / (time.time() - start)
+            final[broadphase] = np.array([rba.pos for rba in e.roombas])
+
+        print('{:5d} roombas: all pairs {:9.1f} fps, grid {:9.1f} fps ({:.1f}x){}'.format(
+            count, fps[False], fps[True], fps[True] / fps[False],
+            '' if np.array_equal(final[False], final[True]) else ' MISMATCH'))
+
+def clone_test(args):
+    '''
+    Measures snapshot, restore and clone throughput on a round
+    with an agent that has been running for a few seconds.
+    '''
     import roombasim.pittras.config
     cfg.load(roombasim.pittras.config)
 
-    n = args.rounds
+    n = args.count
 
-    print('Starting {} rounds'.format(n))
+    print('Starting clone test [{} iterations, {} engine]'.format(n, args.engine))
 
-    e = Environment()
+    e = ENGINES[args.engine]()
+    e.reset()
+    e.agent = cfg.AGENT([13,10], 0, config=e.config)
 
-    good_exits = []
-    bad_exits = []
-    scores = []
+    dt = 1/60.
+    for i in range(300):
+        e.update(dt, 1000 * i * dt)
 
-    for i in range(n):
-        e.reset()
+    state = e.snapshot()
 
-        print('Round {}'.format(i))
+    tests = [
+        ('snapshot', lambda: e.snapshot()),
+        ('snapshot (no rng)', lambda: e.snapshot(rng=False)),
+        ('restore', lambda: e.restore(state)),
+        ('clone', lambda: e.clone())
+    ]
 
-        for elapsed in np.arange(0, 10*60, 1/60.):
-            e.update(1/60., 1000 * elapsed)
+    print('Snapshot size: {} values'.format(len(state)))
 
-        good_exits.append(e.good_exits)
-        bad_exits.append(e.bad_exits)
-        scores.append(e.score)
+    for (name, func) in tests:
+        start = time.time()
+        for i in range(n):
+            func()
+        dur = time.time() - start
 
-    with open(args.stats_file, 'w') as f:
-        f.write(', '.join(map(str, good_exits)) + '\n')
-        f.write(', '.join(map(str, bad_exits)) + '\n')
-        f.write(', '.join(map(str, scores)) + '\n')
+        print('{:18s} {:10.1f} per second ({:.1f} us each)'.format(name, n / dur, 1e6 * dur / n))
 
-    print('Done')
+def geometry_test(args):
+    '''
+    Compares calling the scalar geometry functions once per
+    shape with a single call to their batched versions.
+    '''
+    from roombasim import geometry
+
+    n = args.count
+
+    print('Starting geometry test [{} shapes]'.format(n))
+
+    rng = np.random.RandomState(0)
+    circles = rng.uniform(0, 20, (n, 2))
+    squares = rng.uniform(0, 20, (n, 2))
+    headings = rng.uniform(0, cfg.TAU, n)
+    ends = rng.uniform(0, 20, (n, 2))
+
+    # plain float lists are what the scalar functions see in the simulation
+    c = circles.tolist()
+    s = squares.tolist()
+    h = headings.tolist()
+    e = ends.tolist()
+    r = cfg.ROOMBA_RADIUS
+    w = 0.57
+
+    tests = [
+        ('circle_intersects_circle',
+         lambda: [geometry.circle_intersects_circle(c[i], s[i], r) for i in range(n)],
+         lambda: geometry.circle_intersects_circle_batch(circles, squares, r)),
+        ('compare_angle',
+         lambda: [geometry.compare_angle(h[i], h[-i]) for i in range(n)],
+         lambda: geometry.compare_angle_batch(headings, headings[::-1])),
+        ('circle_intersects_square',
+         lambda: [geometry.circle_intersects_square(c[i], r, s[i], h[i], w) for i in range(n)],
+         lambda: geometry.circle_intersects_square_batch(circles, r, squares, headings, w)),
+        ('circle_intersects_line',
+         lambda: [geometry.circle_intersects_line(c[i], r, s[i], e[i]) for i in range(n)],
+         lambda: geometry.circle_intersects_line_batch(circles, r, squares, ends)),
+        ('rotate_vector',
+         lambda: [geometry.rotate_vector(c[i], h[i]) for i in range(n)],
+         lambda: geometry.rotate_vector_batch(circles, headings)),
+        ('get_square_corners',
+         lambda: [geometry.get_square_corners(s[i], h[i], w) for i in range(n)],
+         lambda: geometry.get_square_corners_batch(squares, headings, w))
+    ]
+
+    for (name, scalar, batch) in tests:
+        times = []
+        for func in (scalar, batch):
+            # best of a few repeats to skip warmup noise
+            best = None
+            for repeat in range(5):
+                start = time.time()
+                func()
+                dur = time.time() - start
+                best = dur if best is None else min(best, dur)
+            times.append(best)
+
+        print('{:26s} scalar {:8.3f} us/shape, batch {:8.3f} us/shape ({:.1f}x)'.format(
+            name, 1e6 * times[0] / n, 1e6 * times[1] / n, times[0] / times[1]))
 
 def human_player(args):
     '''
@@ -287,7 +804,9 @@ def human_player(args):
         cfg.MISSION_OBSTACLE_SPAWN_RADIUS = args.obstacle_spawn_radius
 
 
+    import pyglet
     import roombasim.pittras.config
+    from roombasim.graphics.display import Display
     cfg.load(roombasim.pittras.config)
 
     # setup mission
@@ -295,9 +814,12 @@ def human_player(args):
     environment.reset()
 
     # setup agent
-    agent = cfg.AGENT([1.5,1.5], 0)
+    agent = cfg.AGENT([1.5,1.5], 0, config=environment.config)
     environment.agent = agent
 
+    # report exits and controller messages on the console
+    environment.event_log = events.PrintSink(kinds=(events.EXIT, events.MESSAGE))
+
     config = pyglet.gl.Config(sample_buffers=1, samples=4)
     if args.timescale:
         window = Display(environment, args.timescale)
@@ -314,7 +836,10 @@ def human_player(args):
 
     window.set_update_func(update_func)
 
+    recorder = _start_recording(args, environment)
     pyglet.app.run()
+    if recorder is not None:
+        recorder.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,120 @@
+'''
+batched_drone.py
+
+Array form of the generic Drone used by BatchedEnvironment.
+'''
+import numpy as np
+import roombasim.config as cfg
+
+class BatchedDrone(object):
+    '''
+    Simulates one drone per round of a BatchedEnvironment.
+
+    Every attribute of Drone gains a leading batch dimension
+    (xy_pos is float[B, 2], yaw is float[B], ...) and update
+    applies the simplified physics of Drone.update to every
+    drone at once.
+    '''
+
+    def __init__(self, batch_size, pos, yaw, z_pos=0, config=None):
+        if config is None:
+            config = cfg.current()
+
+        self.config = config
+        self.batch_size = batch_size
+
+        # spawn pose used by reset
+        self._start_pos = np.array(pos, dtype=np.float64)
+        self._start_yaw = yaw
+        self._start_z = z_pos
+
+        self.xy_pos = np.zeros((batch_size, 2), dtype=np.float64)
+        self.xy_vel = np.zeros((batch_size, 2), dtype=np.float64)
+        self.xy_accel = np.zeros((batch_size, 2), dtype=np.float64)
+        self._frame_accel = np.zeros((batch_size, 2), dtype=np.float64)
+        self.yaw = np.zeros(batch_size, dtype=np.float64)
+        self.yaw_vel = np.zeros(batch_size, dtype=np.float64)
+        self.z_pos = np.zeros(batch_size, dtype=np.float64)
+        self.z_vel = np.zeros(batch_size, dtype=np.float64)
+
+        self.reset()
+
+    def reset(self, rows=slice(None)):
+        '''
+        Puts the selected drones back at the spawn pose at rest.
+
+        rows - anything that can index the batch dimension
+        '''
+        self.xy_pos[rows] = self._start_pos
+        self.xy_vel[rows] = 0
+        self.xy_accel[rows] = 0
+        self._frame_accel[rows] = 0
+        self.yaw[rows] = self._start_yaw
+        self.yaw_vel[rows] = 0
+        self.z_pos[rows] = self._start_z
+        self.z_vel[rows] = 0
+
+    def control(self, xy_accel, yaw_vel, z_vel):
+        '''
+        Update drone target parameters for every round:
+
+        - xy_accel : float[B, 2] target x and y acceleration values
+        - yaw_vel : float[B] target yaw angular velocities
+        - z_vel : float[B] target z velocities
+
+        Scalars and single vectors are broadcast to every round.
+        '''
+        config = self.config
+        self.xy_accel[:] = xy_accel
+
+        # Make sure acceleration is within drone limits
+        norm = np.hypot(self.xy_accel[:, 0], self.xy_accel[:, 1])
+        over = norm > config.DRONE_MAX_HORIZ_ACCEL
+        if over.any():
+            self.xy_accel[over] *= (config.DRONE_MAX_HORIZ_ACCEL / norm[over])[:, np.newaxis]
+
+        self.yaw_vel[:] = yaw_vel
+
+        # Make sure z velocity is within drone limits
+        np.clip(z_vel, -config.DRONE_MAX_VERTICAL_VELOCITY,
+                config.DRONE_MAX_VERTICAL_VELOCITY, out=self.z_vel)
+
+    def update(self, delta, elapsed):
+        '''
+        Perform a physics update step for every drone.
+        '''
+        config = self.config
+        # update height
+        self.z_pos += self.z_vel * delta
+
+        # bounds check
+        landed = self.z_pos <= 0
+        self.z_pos[landed] = 0
+        self.z_vel[landed] = 0
+        self.xy_vel[landed] = 0
+
+        flying = ~landed
+        if not flying.any():
+            return
+
+        # update yaw
+        self.yaw[flying] = (self.yaw[flying] + self.yaw_vel[flying] * delta) % (np.pi * 2)
+
+        # rotate the acceleration vectors about the origin by
+        # the current yaw and apply them to the velocities
+        c = np.cos(self.yaw)
+        s = np.sin(self.yaw)
+        ax = self.xy_accel[:, 0]
+        ay = self.xy_accel[:, 1]
+        frame_accel = np.stack((c * ax - s * ay, s * ax + c * ay), axis=-1)
+        np.copyto(self._frame_accel, frame_accel, where=flying[:, np.newaxis])
+
+        self.xy_vel[flying] += self._frame_accel[flying] * delta
+
+        # Make sure drone velocity is within limits
+        norm = np.hypot(self.xy_vel[:, 0], self.xy_vel[:, 1])
+        over = norm > config.DRONE_MAX_HORIZ_VELOCITY
+        if over.any():
+            self.xy_vel[over] *= (config.DRONE_MAX_HORIZ_VELOCITY / norm[over])[:, np.newaxis]
+
+        self.xy_pos[flying] += self.xy_vel[flying] * delta
@@ -39,7 +39,12 @@ class Drone(object):
     makes simulating motion quite a bit simpler.
     '''
 
-    def __init__(self, pos, yaw, z_pos=0):
+    def __init__(self, pos, yaw, z_pos=0, config=None):
+        # constants of the drone (see config.Config)
+        if config is None:
+            config = cfg.current()
+        self.config = config
+
         # 2d position vector
         # m
         self.xy_pos = np.array(pos, dtype=np.float64)
@@ -83,11 +88,12 @@ class Drone(object):
         - yaw_vel : a value containing the target yaw angular velocity
         - z_vel : a value containing the target z velocity
         '''
+        config = self.config
         self.xy_accel = np.array(xy_accel, dtype=np.float64)
 
         # Make sure acceleration is within drone limits
-        if np.linalg.norm(self.xy_accel) > cfg.DRONE_MAX_HORIZ_ACCEL:
-            self.xy_accel *= (cfg.DRONE_MAX_HORIZ_ACCEL
+        if np.linalg.norm(self.xy_accel) > config.DRONE_MAX_HORIZ_ACCEL:
+            self.xy_accel *= (config.DRONE_MAX_HORIZ_ACCEL
                             / np.linalg.norm(self.xy_accel))
 
         self.yaw_vel = yaw_vel
@@ -95,14 +101,15 @@ class Drone(object):
         self.z_vel = z_vel
 
         # Make sure z velocity is within drone limits
-        if np.abs(self.z_vel) > cfg.DRONE_MAX_VERTICAL_VELOCITY:
-            self.z_vel = np.copysign(cfg.DRONE_MAX_VERTICAL_VELOCITY,
+        if np.abs(self.z_vel) > config.DRONE_MAX_VERTICAL_VELOCITY:
+            self.z_vel = np.copysign(config.DRONE_MAX_VERTICAL_VELOCITY,
                                      self.z_vel)
 
     def update(self, delta, elapsed):
         '''
         Perform a physics update step.
         '''
+        config = self.config
         # update height
         self.z_pos += self.z_vel * delta
 
@@ -130,12 +137,41 @@ class Drone(object):
             self.xy_vel += self._frame_accel * delta
 
             # Make sure drone velocity is within limits
-            if np.linalg.norm(self.xy_vel) > cfg.DRONE_MAX_HORIZ_VELOCITY:
-                self.xy_vel *= (cfg.DRONE_MAX_HORIZ_VELOCITY
+            if np.linalg.norm(self.xy_vel) > config.DRONE_MAX_HORIZ_VELOCITY:
+                self.xy_vel *= (config.DRONE_MAX_HORIZ_VELOCITY
                               / np.linalg.norm(self.xy_vel))
 
             self.xy_pos += self.xy_vel * delta
 
+    # number of values returned by get_state
+    STATE_SIZE = 12
+
+    def get_state(self):
+        '''
+        Returns the dynamic state of the drone as a tuple of
+        STATE_SIZE numbers (see set_state).
+        '''
+        return (
+            self.xy_pos[0], self.xy_pos[1],
+            self.xy_vel[0], self.xy_vel[1],
+            self.xy_accel[0], self.xy_accel[1],
+            self._frame_accel[0], self._frame_accel[1],
+            self.yaw, self.yaw_vel, self.z_pos, self.z_vel
+        )
+
+    def set_state(self, values):
+        '''
+        Restores the dynamic state saved by get_state.
+
+        The vectors are replaced rather than written in place so
+        a shallow copy of a drone can be restored independently.
+        '''
+        self.xy_pos = np.array(values[0:2], dtype=np.float64)
+        self.xy_vel = np.array(values[2:4], dtype=np.float64)
+        self.xy_accel = np.array(values[4:6], dtype=np.float64)
+        self._frame_accel = np.array(values[6:8], dtype=np.float64)
+        (self.yaw, self.yaw_vel, self.z_pos, self.z_vel) = values[8:12]
+
     # The following functions should be implemented by
     # a team-specific subclass:
 
@@ -150,3 +186,19 @@ class Drone(object):
         True if drone is making contact with roomba front bumper.
         '''
         raise NotImplementedError
+
+    @staticmethod
+    def roomba_contacts(xy_pos, yaw, z_pos, roomba_pos, config=cfg):
+        '''
+        Vectorized form of is_touching_roomba_top and is_blocking_roomba
+        used by the batched engines.
+
+        xy_pos - float[..., 2] drone positions
+        yaw, z_pos - float[...] drone yaw and altitude
+        roomba_pos - float[..., n, 2] roomba positions
+        config - the config.Config (or the config module) with the
+            drone and roomba constants
+
+        Returns (touching_top, blocking) as two bool[..., n] arrays.
+        '''
+        raise NotImplementedError
@@ -4,6 +4,7 @@ controller.py
 Contains the base controller implementation.
 '''
 import roombasim.config as cfg
+from roombasim import events
 
 from .task import TaskController
 from .state import StateController
@@ -13,10 +14,22 @@ class Controller(object):
     Base controller class.
 
     Subclases should implement the update method.
+
+    The controller and its tasks read their constants from config
+    (a config.Config, by default a copy of the current constants).
     '''
-    def __init__(self):
-        self.task_controller = TaskController(cfg.TASKS)
-        self.state_controller = StateController(cfg.STATES)
+    def __init__(self, config=None):
+        if config is None:
+            config = cfg.current()
+
+        self.config = config
+        self.task_controller = TaskController(config.TASKS, config)
+        self.state_controller = StateController(config.STATES, cache=config.STATE_CACHE)
+
+        # environment and time of the frame being updated
+        self._environment = None
+        self._elapsed = 0
+
         self.setup()
 
     def frame_update(self, delta, elapsed, environment):
@@ -25,9 +38,22 @@ class Controller(object):
         update the controller as well as propogate task updates to
         the environment.
         '''
+        self._environment = environment
+        self._elapsed = elapsed
+
         self.update(delta, elapsed, environment)
         self.task_controller.update(delta, elapsed, self.state_controller, environment)
 
+    def message(self, text):
+        '''
+        Reports text as a MESSAGE event to the event log of the
+        environment being updated (nothing is reported before the
+        first frame or when the log is disabled).
+        '''
+        log = getattr(self._environment, 'event_log', events.NULL_SINK)
+        if log.enabled:
+            log.emit(self._elapsed, events.MESSAGE, data=text)
+
     def setup(self):
         '''
         Optional post-initialization setup method
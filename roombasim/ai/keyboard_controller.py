@@ -8,8 +8,6 @@ the task can be incorporated into other controllers to allow
 for a switchover of manual control
 '''
 
-from pyglet.window import key
-
 from .controller import Controller
 from .task import Task, TaskController
 
@@ -17,10 +15,11 @@ class KeyboardController(Controller):
     '''
     Controller that only runs the keyboard task.
     '''
-    def __init__(self, window=None):
+    def __init__(self, window=None, config=None):
         self.task_controller = TaskController({
             'keyboard': KeyboardTask
-        })
+        }, config)
+        self.config = self.task_controller.config
         self.task_controller.switch_task('keyboard', window=window)
         self.state_controller = None
 
@@ -34,12 +33,19 @@ class KeyboardTask(Task):
     D/A +yaw velocity
     W/S +z velocity
     '''   
-    def __init__(self, window=None):
+    def __init__(self, window=None, config=None):
+        super(KeyboardTask, self).__init__(config)
+
+        # imported here so that roombasim.ai does not load pyglet
+        from pyglet.window import key
+
+        self.key = key
         self.window = window
         self.keys = key.KeyStateHandler()
         self.window.push_handlers(self.keys)
 
     def update(self, delta, elapsed, state_controller, environment):
+        key = self.key
         x_accel = 0
         y_accel = 0
         yaw_vel = 0
@@ -8,21 +8,57 @@ class StateController(object):
     '''
     Contains a collection of state subclasses and can perform
     queries by state name.
+
+    With caching enabled, each sensor is queried at most once per
+    environment frame (see Environment.frame) and repeated queries
+    during the frame return the same result. hits and misses count
+    the cached and fresh lookups.
     '''
-    def __init__(self, states):
+    def __init__(self, states, cache=False):
         '''
         Initialize with a state dictionary.
+
+        cache - memoize queries until the environment advances
         '''
         self.states = states
+        self.cache = cache
+
+        self.hits = 0
+        self.misses = 0
+
+        # results of the frame identified by _cache_key
+        self._cache = {}
+        self._cache_key = None
 
     def query(self, state_name, environment):
         '''
         Perform a sensor lookup by name.
         '''
-        if state_name in self.states:
-            return self.states[state_name].query(environment)
-        else:
+        if state_name not in self.states:
             return None # uh oh
+
+        if not self.cache:
+            return self.states[state_name].query(environment)
+
+        key = (id(environment), getattr(environment, 'frame', None))
+        if key != self._cache_key or key[1] is None:
+            self._cache.clear()
+            self._cache_key = key
+        elif state_name in self._cache:
+            self.hits += 1
+            return self._cache[state_name]
+
+        self.misses += 1
+        result = self.states[state_name].query(environment)
+        self._cache[state_name] = result
+        return result
+
+    def reset_counters(self):
+        '''
+        Zeroes the hit and miss counters.
+        '''
+        self.hits = 0
+        self.misses = 0
         
 
 class State(object):
@@ -4,13 +4,16 @@ task.py
 Contains TaskController and Task base classes
 '''
 
+import roombasim.config as cfg
+from roombasim import events
+
 class TaskController(object):
     '''
     A class that represents a sort of state machine that can
     switch between classes and update the currently running
     task via a single interface.
     '''
-    def __init__(self, tasks):
+    def __init__(self, tasks, config=None):
         '''
         Initialize with a dictionary of tasks.
 
@@ -22,9 +25,21 @@ class TaskController(object):
 
         Note: don't supply an instance of a class, this will be
         created when switching to that task.
+
+        Tasks are created with config (a config.Config, by default
+        a copy of the current constants).
         '''
+        if config is None:
+            config = cfg.current()
+
+        self.config = config
         self.tasks = tasks
 
+        # environment and time of the running update, for logging
+        # task completions
+        self._environment = None
+        self._elapsed = 0
+
         self.tasks['idle'] = IdleTask
         self.switch_task('idle')
 
@@ -40,31 +55,44 @@ class TaskController(object):
         Note: params are supplied as kwargs and will be given
         to the task constructor as kwargs.
         '''
-        self.current = self.tasks[task_name](**params)
-        self.current.set_completion_callback(self.callback_wrapper(callback))
+        self.current = self.tasks[task_name](config=self.config, **params)
+        self.current.set_completion_callback(self.callback_wrapper(callback, task_name))
 
-    def callback_wrapper(self, callback):
+    def callback_wrapper(self, callback, task_name=None):
         '''
         Creates a callback function of signature (status, method)
         that will set the current task to 'idle' and will optionally
         call an additional callback function if it exists.
+
+        The completion is reported to the event log of the
+        environment being updated.
         '''
         if callback is not None:
             def fn(status, message):
+                self._log_completion(task_name, status, message)
                 self.switch_task('idle')
                 callback(status, message)
             
             return fn
         else:
             def fn(status, message):
+                self._log_completion(task_name, status, message)
                 self.switch_task('idle')
 
             return fn
 
+    def _log_completion(self, task_name, status, message):
+        log = getattr(self._environment, 'event_log', events.NULL_SINK)
+        if log.enabled:
+            log.emit(self._elapsed, events.TASK, task_name, (status, message))
+
     def update(self, delta, elapsed, state_controller, environment):
         '''
         Perform an update step.
         '''
+        self._environment = environment
+        self._elapsed = elapsed
+
         if self.current:
             self.current.update(delta, elapsed, state_controller, environment)
         # else:
@@ -82,9 +110,15 @@ class Task(object):
     The base Task class.
 
     Subclasses must implement the update method and can optionally
-    override the __init__ constructor.
+    override the __init__ constructor. Constructors take a config
+    keyword argument (the config.Config to read constants from)
+    and pass it on to this one.
     '''
-    def __init__(self, **params):
+    def __init__(self, config=None, **params):
+        if config is None:
+            config = cfg.current()
+
+        self.config = config
         self.params = params
     
     def update(self, delta, elapsed, state_controller, environment):
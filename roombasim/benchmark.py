@@ -0,0 +1,353 @@
+'''
+benchmark.py
+
+A suite of micro benchmarks for the simulator hot paths.
+
+Every benchmark times a single step function many times and
+reports the median and 95th percentile latency of one step as
+well as the resulting steps per second. run_suite collects the
+results into a dict that write_json stores together with some
+information about the machine and the git commit, so runs can
+be compared across commits.
+
+Benchmarks are registered with the benchmark decorator and are
+given a setup function that returns (step, between): step is
+the timed callable and between (optional) runs untimed after
+every step, e.g. to advance the environment while timing only
+a task update.
+
+The startup benchmarks time a fresh interpreter importing the
+headless entry points (and fail if pyglet gets loaded along the
+way) next to one importing the Display window.
+'''
+
+from __future__ import print_function
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import roombasim.config as cfg
+from roombasim.runner import ENGINES
+
+# perf_counter is not available on python 2
+clock = getattr(time, 'perf_counter', time.time)
+
+try:
+    from importlib.util import find_spec
+except ImportError:
+    # python 2
+    from pkgutil import find_loader as find_spec
+
+# benchmark name -> (setup function, default number of steps, warmup steps)
+BENCHMARKS = {}
+
+# roomba counts used by the collision benchmarks
+COLLISION_COUNTS = (14, 50, 100, 200)
+
+DELTA = 1/60.
+
+def benchmark(name, steps=1000, warmup=10):
+    '''
+    Registers the decorated setup function under name.
+    '''
+    def register(setup):
+        BENCHMARKS[name] = (setup, steps, warmup)
+        return setup
+    return register
+
+def measure(step, steps, between=None, warmup=10):
+    '''
+    Calls step steps times (after a few untimed warmup calls)
+    and returns its latency statistics.
+    '''
+    for i in range(warmup):
+        step()
+        if between is not None:
+            between()
+
+    times = np.empty(steps)
+    for i in range(steps):
+        start = clock()
+        step()
+        times[i] = clock() - start
+        if between is not None:
+            between()
+
+    return {
+        'steps': steps,
+        'median_us': 1e6 * float(np.median(times)),
+        'p95_us': 1e6 * float(np.percentile(times, 95)),
+        'mean_us': 1e6 * float(times.mean()),
+        'steps_per_sec': float(steps / times.sum())
+    }
+
+def _environment(engine='object', agent=False, seed=0, config=None):
+    '''
+    Returns a freshly reset environment, optionally with a
+    drone hovering in the middle of the arena.
+    '''
+    e = ENGINES[engine](config)
+    e.reset(seed=seed)
+    if agent:
+        e.agent = e.config.AGENT([10, 10], 0, 1, config=e.config)
+    return e
+
+def _stepper(environment):
+    '''
+    Returns a function that advances environment by one frame.
+    '''
+    frame = [0]
+    def step():
+        frame[0] += 1
+        environment.update(DELTA, 1000 * frame[0] * DELTA)
+    return step
+
+def _register_environment_benchmarks():
+    for engine in sorted(ENGINES):
+        for agent in (False, True):
+            name = 'env.step.{}{}'.format(engine, '.agent' if agent else '')
+
+            def setup(engine=engine, agent=agent):
+                return (_stepper(_environment(engine, agent)), None)
+
+            benchmark(name, steps=3000)(setup)
+
+        def setup(engine=engine):
+            e = ENGINES[engine]()
+            seeds = iter(range(1 << 30))
+            return (lambda: e.reset(seed=next(seeds)), None)
+
+        benchmark('env.reset.{}'.format(engine), steps=500)(setup)
+
+def _register_roomba_benchmarks():
+    def setup():
+        # the roombas of a round updated on their own (no collision
+        # checks), so the cost of the roomba state machine shows
+        e = _environment()
+        frame = [0]
+        def step():
+            frame[0] += 1
+            elapsed = 1000 * frame[0] * DELTA
+            for rba in e.roombas:
+                rba.update(DELTA, elapsed)
+        return (step, None)
+
+    benchmark('roomba.update', steps=3000)(setup)
+
+def _register_collision_benchmarks():
+    for count in COLLISION_COUNTS:
+        for broadphase in (False, True):
+            name = 'collision.{}.{}'.format(count, 'grid' if broadphase else 'pairs')
+
+            def setup(count=count, broadphase=broadphase):
+                e = _environment(config=cfg.Config(MISSION_NUM_TARGETS=count,
+                                                   MISSION_NUM_OBSTACLES=0))
+
+                # spread the roombas over the whole arena
+                rng = np.random.RandomState(count)
+                for rba in e.roombas:
+                    rba.pos[:] = rng.uniform(1, 19, 2)
+                    rba.heading = rng.uniform(0, cfg.TAU)
+
+                e.broadphase = broadphase
+                return (_stepper(e), None)
+
+            benchmark(name, steps=300)(setup)
+
+# constructor arguments used to benchmark each task
+TASK_PARAMS = {
+    'HoldPositionTask': {'hold_duration': 0},
+    'XYZTranslationTask': {'target': [12, 12, 1]},
+    'TakeoffTask': {},
+    'GoToRoombaTask': {'target_roomba': 0, 'offset_xy': [0, 0]},
+    'TrackRoombaTask': {'target_roomba': 0, 'offset_xy': [0, 0], 'timeout': 0},
+    'HitRoombaTask': {'target_roomba': 0},
+    'LandTask': {},
+    'BlockRoombaTask': {'target_roomba': 0, 'block_vector': [0.5, 0]},
+    'VelocityTask': {'target': [0.1, 0, 0]}
+}
+
+def _register_task_benchmarks():
+    from roombasim.ai import StateController
+
+    for name in sorted(TASK_PARAMS):
+        def setup(name=name):
+            e = _environment(agent=True)
+            states = StateController(e.config.STATES)
+            task = [None]
+
+            def restart(status=None, message=None):
+                # a finished task is replaced so every step does real work
+                task[0] = e.config.TASKS[name](config=e.config, **TASK_PARAMS[name])
+                task[0].set_completion_callback(restart)
+            restart()
+
+            frame = [0]
+            def step():
+                task[0].update(DELTA, 1000 * frame[0] * DELTA, states, e)
+
+            advance = _stepper(e)
+            def between():
+                frame[0] += 1
+                advance()
+
+            return (step, between)
+
+        benchmark('task.{}.update'.format(name))(setup)
+
+def _register_state_benchmarks():
+    from roombasim.ai import StateController
+
+    for name in ('DroneState', 'RoombaState'):
+        def setup(name=name):
+            e = _environment(agent=True)
+            states = StateController(e.config.STATES)
+            return (lambda: states.query(name, e), _stepper(e))
+
+        benchmark('state.{}.query'.format(name), steps=3000)(setup)
+
+# controllers run by the controller loop benchmarks
+CONTROLLERS = (
+    'WaypointDemoController',
+    'TrackRoombaDemoController',
+    'HitRoombaDemoController',
+    'BlockRoombaDemoController'
+)
+
+def _register_controller_benchmarks():
+    for name in CONTROLLERS:
+        def setup(name=name):
+            import roombasim.pittras.ai
+
+            e = _environment(agent=True)
+            e.agent.z_pos = 0
+            controller = getattr(roombasim.pittras.ai, name)(config=e.config)
+
+            frame = [0]
+            def step():
+                frame[0] += 1
+                elapsed = 1000 * frame[0] * DELTA
+                e.update(DELTA, elapsed)
+                controller.frame_update(DELTA, elapsed, e)
+
+            return (step, None)
+
+        benchmark('controller.{}'.format(name), steps=3000)(setup)
+
+# command line interface next to the roombasim package
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   'roombasim-cli.py')
+
+# python code run by each startup benchmark in a new interpreter
+STARTUP = {
+    'library': ('import roombasim.pittras.config, roombasim.runner\n'
+                'assert not any(m.startswith("pyglet") for m in sys.modules)'),
+    'cli': ('import runpy\n'
+            'sys.argv = [{!r}, "-h"]\n'
+            'try:\n'
+            '    runpy.run_path(sys.argv[0], run_name="__main__")\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            'assert not any(m.startswith("pyglet") for m in sys.modules)').format(CLI),
+    # without the shadow window pyglet imports without a display
+    'display': ('import pyglet\n'
+                'pyglet.options["shadow_window"] = False\n'
+                'import roombasim.graphics.display, roombasim.pittras.config, roombasim.runner')
+}
+
+# python 2 has no subprocess.DEVNULL, it gets one shared handle instead
+_devnull_file = None
+
+def _devnull():
+    global _devnull_file
+    if hasattr(subprocess, 'DEVNULL'):
+        return subprocess.DEVNULL
+    if _devnull_file is None:
+        _devnull_file = open(os.devnull, 'w')
+    return _devnull_file
+
+def _register_startup_benchmarks():
+    for name in sorted(STARTUP):
+        if name == 'cli' and not os.path.exists(CLI):
+            continue
+        if name == 'display' and find_spec('pyglet') is None:
+            continue
+
+        def setup(name=name):
+            command = [sys.executable, '-c', 'import sys\n' + STARTUP[name]]
+            cwd = os.path.dirname(CLI)
+            devnull = _devnull()
+            return (lambda: subprocess.check_call(command, cwd=cwd, stdout=devnull), None)
+
+        benchmark('startup.{}'.format(name), steps=20, warmup=2)(setup)
+
+_register_environment_benchmarks()
+_register_roomba_benchmarks()
+_register_collision_benchmarks()
+_register_task_benchmarks()
+_register_state_benchmarks()
+_register_controller_benchmarks()
+_register_startup_benchmarks()
+
+def run_benchmark(name, steps=None):
+    '''
+    Sets up and measures a single registered benchmark.
+    '''
+    (setup, default_steps, warmup) = BENCHMARKS[name]
+    (step, between) = setup()
+    return measure(step, default_steps if steps is None else steps, between, warmup)
+
+def run_suite(patterns=None, steps=None, report=None):
+    '''
+    Runs every benchmark whose name contains one of patterns
+    (all of them by default) and returns a dict of results
+    keyed by name.
+
+    steps - overrides the number of timed steps per benchmark
+    report - optional callback(name, result) called as each
+        benchmark finishes
+    '''
+    results = {}
+    for name in sorted(BENCHMARKS):
+        if patterns and not any(p in name for p in patterns):
+            continue
+
+        results[name] = run_benchmark(name, steps)
+        if report is not None:
+            report(name, results[name])
+
+    return results
+
+def _git_commit():
+    '''
+    Returns the commit of the checkout roombasim is imported from
+    (not of the working directory), or None outside a git checkout.
+    '''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(CLI),
+                                       stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_json(path, results):
+    '''
+    Writes results to path along with the commit, interpreter
+    and numpy version they were measured with.
+    '''
+    data = {
+        'commit': _git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'benchmarks': results
+    }
+
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
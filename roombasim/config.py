@@ -4,6 +4,7 @@ config.py
 Contains a bunch of modifiable constants organized by
 module type.
 '''
+import hashlib
 import re
 import numpy as np
 
@@ -23,6 +24,100 @@ def load(module):
         if not attr.startswith('_') and _const_rgx.match(attr):
             g[attr] = getattr(module, attr)
 
+def _constants(namespace):
+    return dict((attr, value) for (attr, value) in namespace.items()
+                if not attr.startswith('_') and _const_rgx.match(attr))
+
+def _digest(values):
+    lines = []
+    for attr in sorted(values):
+        value = values[attr]
+        if hasattr(value, '__name__'):
+            # classes and functions (their repr has an address)
+            value = '{}.{}'.format(getattr(value, '__module__', ''), value.__name__)
+        lines.append('{}={!r}'.format(attr, value))
+
+    return hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()[:16]
+
+def digest():
+    '''
+    Returns a short hash of the current constants, to tell apart
+    results produced with different settings.
+    '''
+    return _digest(_constants(globals()))
+
+class Config(object):
+    '''
+    A frozen copy of the configuration constants.
+
+    Environments, roombas, drones and tasks read their constants
+    from the Config they were given instead of this module, so
+    rounds with different settings can run side by side in one
+    process. Values are resolved once, when the Config is made:
+    changing (or loading into) this module afterwards does not
+    affect existing Configs.
+
+    Config(module, NAME=value, ...) starts from the current
+    module constants, copies the constants of module (like load)
+    and then applies the overrides, which must name existing
+    constants. Array constants are copied and made read-only.
+    '''
+
+    def __init__(self, module=None, **overrides):
+        values = _constants(globals())
+        if module is not None:
+            values.update(_constants(vars(module)))
+
+        for attr in overrides:
+            if attr not in values:
+                raise KeyError('unknown constant: {}'.format(attr))
+        values.update(overrides)
+
+        for (attr, value) in values.items():
+            if isinstance(value, np.ndarray):
+                value = value.copy()
+                value.setflags(write=False)
+            object.__setattr__(self, attr, value)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError('Config is frozen, use replace to change {}'.format(attr))
+
+    def __delattr__(self, attr):
+        raise AttributeError('Config is frozen')
+
+    def replace(self, **overrides):
+        '''
+        Returns a copy of this Config with some constants changed.
+        '''
+        config = object.__new__(Config)
+        config.__dict__.update(self.__dict__)
+        for (attr, value) in overrides.items():
+            if attr not in self.__dict__:
+                raise KeyError('unknown constant: {}'.format(attr))
+            if isinstance(value, np.ndarray):
+                value = value.copy()
+                value.setflags(write=False)
+            config.__dict__[attr] = value
+        return config
+
+    def items(self):
+        '''
+        Returns the (name, value) pairs of every constant.
+        '''
+        return sorted(self.__dict__.items())
+
+    def digest(self):
+        '''
+        Returns a short hash of the constants (see digest).
+        '''
+        return _digest(self.__dict__)
+
+def current():
+    '''
+    Returns a Config with the current module constants.
+    '''
+    return Config()
+
 
 #
 # IMPLEMENTATION SPECIFIC CONSTANTS
@@ -38,8 +133,12 @@ DRONE_MAX_HORIZ_ACCEL = float('Inf')
 DRONE_MAX_HORIZ_VELOCITY = float('Inf')
 
 # (optional)
-# Defines a method to render the agent in the opengl
-# context. See roombasim.graphics.display for examples.
+# Defines a method render(agent, canvas) that draws the agent
+# on a scene canvas. See roombasim.graphics.scene for the
+# canvas primitives and roombasim.pittras.render for an example.
+# Hooks written for the older render(agent) form, which draw
+# with OpenGL calls, still work in the window (with a
+# DeprecationWarning) but are not drawn by the software renderer.
 RENDER_AGENT = None
 
 #
@@ -98,6 +197,17 @@ MISSION_NUM_OBSTACLES = 4
 # radius to spawn obstacle roombas in meters
 MISSION_OBSTACLE_SPAWN_RADIUS = 5
 
+# length of a round in seconds
+MISSION_ROUND_DURATION = 10 * 60
+
+#
+# AI CONFIGURATION
+#
+
+# memoize StateController queries until the environment
+# advances (results must then not be modified by callers)
+STATE_CACHE = False
+
 #
 # GRAPHICS CONFIGURATION
 #
@@ -106,3 +216,13 @@ MISSION_OBSTACLE_SPAWN_RADIUS = 5
 # (note: hopefully someone can implement fragment shaders
 # and this will become irrelevant)
 GRAPHICS_CIRCLE_VERTICES = 10
+
+# simulation step of the Display window in seconds; the window
+# always advances the environment in steps of this size (like
+# the nographics runner) and renders at 60 fps in between
+GRAPHICS_SIM_DELTA = 1/60.
+
+# most simulation steps the Display window runs per rendered
+# frame; if a timescale needs more, the round runs slower than
+# requested instead of skipping frames indefinitely
+GRAPHICS_MAX_SUBSTEPS = 200
@@ -3,5 +3,10 @@ roombasim.environment
 ============
 '''
 
-from .environment import Environment
+from .environment import Environment, RoombaArrays
 from .roomba import TargetRoomba, ObstacleRoomba
+from .noise import NoiseStream, spawn_seeds
+from .array_environment import ArrayEnvironment, TargetRoombaView, ObstacleRoombaView
+from .event_environment import EventEnvironment
+from .batched_environment import BatchedEnvironment
+from .vector_environment import VectorEnvironment
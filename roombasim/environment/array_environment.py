@@ -0,0 +1,743 @@
+'''
+array_environment.py
+
+Contains an ArrayEnvironment class that keeps every roomba in
+a set of contiguous numpy arrays (structure-of-arrays) and
+advances the whole fleet each step with array operations
+instead of per-object update calls.
+
+The public interface matches Environment so the two can be
+swapped freely. The roombas list holds lightweight views whose
+pos, heading, state, collision flags and timers read and write
+straight into the arrays, which keeps Display, RoombaState and
+Roomba.get_state working unchanged.
+
+Most frames nothing interesting happens, so the engine keeps a
+few conservative schedules to skip work:
+
+- the target state machine only runs when a collision flag is
+pending or a timer has expired; in between, targets integrate
+with cached per-state velocities and turn rates
+- roombas move at most ROOMBA_LINEAR_SPEED so collision and
+arena-exit checks are skipped until the closest pair (or the
+closest roomba to an edge) could possibly have made contact
+
+Note: collision flags raised during a step are consumed by
+every roomba on the following step. The object Environment
+lets higher-indexed roombas react within the same frame, so
+the two engines agree statistically but not bit-for-bit.
+'''
+
+import math
+import numpy as np
+
+from roombasim import events
+from roombasim.agent.drone import Drone
+from roombasim.environment import roomba
+from roombasim.environment import noise
+from roombasim.environment import prediction
+from roombasim.environment.environment import Environment, RoombaArrays
+
+def _touch_turn_time(config):
+    '''
+    Duration of the 45 degree turn after a top touch (milliseconds).
+    '''
+    return ((np.pi / 4) / config.ROOMBA_ANGULAR_SPEED) * 1000
+
+def _reverse_turn_time(config):
+    '''
+    Duration of the 180 degree reversal turn (milliseconds).
+    '''
+    return np.pi / config.ROOMBA_ANGULAR_SPEED * 1000
+
+def _column(name, kind):
+    '''
+    Returns a property mapping a roomba attribute onto element
+    _index of the environment array name (converted with kind
+    when read).
+    '''
+    def get(self):
+        return kind(getattr(self._environment, name)[self._index])
+
+    def set(self, value):
+        getattr(self._environment, name)[self._index] = value
+        self._environment.invalidate()
+
+    return property(get, set, doc='Element of ArrayEnvironment.{}.'.format(name))
+
+class _RoombaView(object):
+    '''
+    Maps the per-roomba attributes onto one row of the arrays
+    owned by an ArrayEnvironment.
+    '''
+
+    def __init__(self, environment, index, tag):
+        self._environment = environment
+        self._index = index
+        self.tag = tag
+        self.config = environment.config
+
+        # unused by the array engine
+        self.turn_target = 0
+        self.turn_clockwise = False
+
+    hit_front = _column('hit_front', bool)
+    hit_top = _column('hit_top', bool)
+    timer_reverse = _column('timer_reverse', float)
+    timer_noise = _column('timer_noise', float)
+    timer_touch = _column('timer_touch', float)
+    angular_noise_velocity = _column('noise_velocity', float)
+
+    @property
+    def pos(self):
+        # read-only so in-place writes (which would skip
+        # invalidate) fail instead of leaving stale schedules
+        row = self._environment.pos[self._index]
+        row.setflags(write=False)
+        return row
+
+    @pos.setter
+    def pos(self, value):
+        self._environment.pos[self._index] = value
+        self._environment.invalidate()
+
+    @property
+    def heading(self):
+        return float(self._environment.heading[self._index])
+
+    @heading.setter
+    def heading(self, value):
+        self._environment.heading[self._index] = value
+        self._environment.invalidate()
+
+    @property
+    def state(self):
+        return int(self._environment.state[self._index])
+
+    @state.setter
+    def state(self, value):
+        self._environment.state[self._index] = value
+        self._environment.invalidate()
+
+    def set_state(self, values):
+        '''
+        Restores the dynamic state saved by get_state.
+        '''
+        (x, y, heading, state, front, top, reverse, noise, touch,
+         turn_target, turn_clockwise, angular_noise_velocity) = values
+
+        environment = self._environment
+        i = self._index
+        environment.pos[i] = (x, y)
+        environment.heading[i] = heading
+        environment.state[i] = int(state)
+        environment.hit_front[i] = bool(front)
+        environment.hit_top[i] = bool(top)
+        environment.timer_reverse[i] = reverse
+        environment.timer_noise[i] = noise
+        environment.timer_touch[i] = touch
+        environment.noise_velocity[i] = angular_noise_velocity
+        self.turn_target = turn_target
+        self.turn_clockwise = bool(turn_clockwise)
+        environment.invalidate()
+
+    def predict(self, elapsed, horizons):
+        row = slice(self._index, self._index + 1)
+        (pos, heading) = prediction.predict_poses(
+            *[values[row] for values in self._environment._prediction_state()],
+            elapsed=elapsed, horizons=horizons, config=self.config)
+
+        return (pos[0], heading[0])
+
+class TargetRoombaView(_RoombaView, roomba.TargetRoomba):
+    '''
+    A TargetRoomba backed by an ArrayEnvironment row.
+    '''
+
+    @property
+    def noise(self):
+        return self._environment._noise[self._index]
+
+class ObstacleRoombaView(_RoombaView, roomba.ObstacleRoomba):
+    '''
+    An ObstacleRoomba backed by an ArrayEnvironment row.
+    '''
+    pass
+
+class ArrayEnvironment(Environment):
+    '''
+    A vectorized game round.
+
+    Roomba data lives in the following arrays (n = total roombas,
+    targets first followed by obstacles):
+
+    - pos : float[n, 2]
+    - heading : float[n]
+    - state : int8[n]
+    - is_target : bool[n]
+    - timer_reverse, timer_noise, timer_touch : float[n] (milliseconds)
+    - noise_velocity : float[n] (rad/s)
+    - hit_front, hit_top : bool[n] (pending collision flags)
+    '''
+
+    def __init__(self, config=None):
+        super(ArrayEnvironment, self).__init__(config)
+
+        # (agent class, whether it implements roomba_contacts)
+        self._agent_contacts = (None, False)
+
+        self._allocate(0, 0)
+
+    def _allocate(self, num_targets, num_obstacles):
+        count = num_targets + num_obstacles
+
+        self.num_targets = num_targets
+        self.pos = np.zeros((count, 2), dtype=np.float64)
+        self.heading = np.zeros(count, dtype=np.float64)
+        self.state = np.full(count, self.config.ROOMBA_STATE_IDLE, dtype=np.int8)
+        self.is_target = np.zeros(count, dtype=bool)
+        self.is_target[:num_targets] = True
+        self.timer_reverse = np.zeros(count, dtype=np.float64)
+        self.timer_noise = np.zeros(count, dtype=np.float64)
+        self.timer_touch = np.zeros(count, dtype=np.float64)
+        self.noise_velocity = np.zeros(count, dtype=np.float64)
+        self.hit_front = np.zeros(count, dtype=bool)
+        self.hit_top = np.zeros(count, dtype=bool)
+
+        # heading noise source of every target (filled by reset)
+        self._noise = []
+
+        # per-target rates used between state transitions
+        self._velocity = np.zeros((count, 2), dtype=np.float64)
+        self._turn_rate = np.zeros(num_targets, dtype=np.float64)
+        self._due = np.zeros(num_targets, dtype=np.float64)
+        self._translating = np.zeros(num_targets, dtype=bool)
+        self._targets_turning = False
+
+        # simulated seconds since reset
+        self._clock = 0.0
+
+        self.invalidate()
+
+    def invalidate(self):
+        '''
+        Drops every cached schedule so the next update runs the
+        full state machine and all collision checks.
+
+        Call this after writing to the arrays directly.
+        '''
+        self.frame += 1
+        self._flags_pending = True
+        self._due[:] = -np.inf
+        self._next_transition = -np.inf
+        self._obstacles_stalled = True
+        self._next_collision_check = -np.inf
+        self._next_exit_check = -np.inf
+
+    def reset(self, seed=None):
+        '''
+        Spawns roombas using the same layout as Environment.reset.
+
+        For the same seed, every target draws the same heading
+        noise as in Environment.
+        '''
+        config = self.config
+        self.agent = None
+        self.good_exits = 0
+        self.bad_exits = 0
+        self.score = 0
+        self.target_roomba = None
+        self.target_type = None
+
+        num_targets = config.MISSION_NUM_TARGETS
+        num_obstacles = config.MISSION_NUM_OBSTACLES
+
+        self._allocate(num_targets, num_obstacles)
+
+        self.seed_sequence = noise.seed_sequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self._noise = noise.noise_streams(self.seed_sequence, num_targets, config)
+
+        # spawn target roombas
+        theta = (config.TAU * np.arange(num_targets)) / max(num_targets, 1)
+        self.pos[:num_targets, 0] = np.cos(theta) * config.MISSION_TARGET_SPAWN_RADIUS + 10
+        self.pos[:num_targets, 1] = np.sin(theta) * config.MISSION_TARGET_SPAWN_RADIUS + 10
+        self.heading[:num_targets] = theta
+
+        # spawn obstacle roombas
+        theta = (config.TAU * np.arange(num_obstacles)) / max(num_obstacles, 1)
+        self.pos[num_targets:, 0] = np.cos(theta) * config.MISSION_OBSTACLE_SPAWN_RADIUS + 10
+        self.pos[num_targets:, 1] = np.sin(theta) * config.MISSION_OBSTACLE_SPAWN_RADIUS + 10
+        self.heading[num_targets:] = theta - (config.PI / 2)
+
+        self.state[:] = config.ROOMBA_STATE_FORWARD
+
+        self._make_views()
+
+    def _make_views(self):
+        '''
+        Builds the roombas list of views over the arrays.
+        '''
+        nt = self.num_targets
+        self.roombas = (
+            [TargetRoombaView(self, i, i) for i in range(nt)]
+            + [ObstacleRoombaView(self, nt + i, i) for i in range(len(self.state) - nt)]
+        )
+
+        # views over the arrays stay current, so roomba_arrays
+        # never needs to refresh them
+        self._views = (
+            RoombaArrays(self.pos[:nt], self.heading[:nt], list(range(nt))),
+            RoombaArrays(self.pos[nt:], self.heading[nt:], list(range(len(self.state) - nt)))
+        )
+
+    def roomba_arrays(self):
+        '''
+        Returns read-only views over the roomba arrays (see
+        Environment.roomba_arrays).
+        '''
+        return self._views
+
+    def _roomba_state(self):
+        '''
+        Packs the roomba arrays (and the simulation clock).
+        '''
+        return np.concatenate((
+            self.pos.ravel(), self.heading, self.state,
+            self.timer_reverse, self.timer_noise, self.timer_touch,
+            self.noise_velocity, self.hit_front, self.hit_top,
+            (self._clock,)
+        ))
+
+    def _prediction_state(self):
+        return (self.pos, self.heading, self.state, self.is_target,
+                self.timer_reverse, self.timer_noise, self.timer_touch,
+                self.noise_velocity, self.hit_front, self.hit_top)
+
+    def _restore_roombas(self, buf):
+        '''
+        Inverse of _roomba_state. Cached schedules are dropped.
+        '''
+        n = len(self.state)
+        self.pos[:] = buf[:2 * n].reshape(n, 2)
+        (self.heading[:], self.state[:], self.timer_reverse[:], self.timer_noise[:],
+         self.timer_touch[:], self.noise_velocity[:], self.hit_front[:],
+         self.hit_top[:]) = buf[2 * n:10 * n].reshape(8, n)
+        self._clock = float(buf[10 * n])
+
+        for i in range(self.num_targets):
+            self._cache_target(i)
+        self.invalidate()
+
+    def _copy_roombas(self, other):
+        other._allocate(self.num_targets, len(self.state) - self.num_targets)
+        other._noise = [stream.copy() for stream in self._noise]
+        other._make_views()
+
+    def _noise_streams(self):
+        return self._noise
+
+    def update(self, delta, elapsed):
+        '''
+        Perform an update step for every roomba at once.
+        '''
+        self.frame += 1
+        self._clock += delta
+
+        if self.event_log.enabled:
+            states = self.state.copy()
+
+        if self._flags_pending or elapsed >= self._next_transition:
+            self._update_targets(delta, elapsed)
+        else:
+            self._advance_targets(delta)
+
+        self._update_obstacles(delta)
+
+        if self._clock >= self._next_collision_check:
+            self._detect_roomba_collisions()
+
+        if self.agent is not None:
+            self._detect_agent_collisions()
+
+        if self._clock >= self._next_exit_check:
+            self._check_exits()
+
+        # update the drone
+        if self.agent is not None:
+            self.agent.update(delta, elapsed)
+
+        if self.event_log.enabled:
+            self._log_transitions(states)
+
+        if self.recorder is not None:
+            self.recorder.record(self, elapsed + delta * 1000)
+
+    def _log_transitions(self, states):
+        '''
+        Reports every roomba whose state differs from states to
+        the event log (leaving the arena is reported as an exit
+        instead).
+        '''
+        changed = (self.state != states) & (self.state != self.config.ROOMBA_STATE_IDLE)
+        for i in np.flatnonzero(changed):
+            self.event_log.emit(1000 * self._clock, events.STATE,
+                                self.roombas[i].tag, int(self.state[i]))
+
+    def _advance_targets(self, delta):
+        '''
+        Integrates every target for a step in which no state
+        transition is due, using the cached per-state rates.
+        '''
+        nt = self.num_targets
+        heading = self.heading[:nt]
+
+        if self._targets_turning:
+            heading += self._turn_rate * delta
+
+            # noisy turns drive along a changing heading
+            translating = self._translating
+            speed = self.config.ROOMBA_LINEAR_SPEED * translating
+            self._velocity[:nt, 0] = speed * np.cos(heading)
+            self._velocity[:nt, 1] = speed * np.sin(heading)
+
+        self.pos[:nt] += self._velocity[:nt] * delta
+
+    def _update_targets(self, delta, elapsed):
+        '''
+        Runs the state machine for every target with an expired
+        timer or a pending collision flag and integrates the rest
+        with the cached rates.
+        '''
+        nt = self.num_targets
+        due = self._due <= elapsed
+        if self._flags_pending:
+            due |= self.hit_top[:nt] | self.hit_front[:nt]
+        index = np.flatnonzero(due)
+
+        # integrate everyone, then redo the due targets by hand
+        pos = self.pos[index]
+        heading = self.heading[index]
+        self._advance_targets(delta)
+        self.pos[index] = pos
+        self.heading[index] = heading
+
+        for i in index:
+            self._update_target(i, delta, elapsed)
+
+        self._targets_turning = bool(self._turn_rate.any())
+        self._flags_pending = bool(self.hit_front.any() or self.hit_top.any())
+        self._next_transition = self._due.min() if nt else np.inf
+
+    def _update_target(self, i, delta, elapsed):
+        '''
+        Same state machine as TargetRoomba.update, applied to
+        row i of the arrays.
+        '''
+        config = self.config
+        state = self.state[i]
+
+        if state == config.ROOMBA_STATE_FORWARD:
+            if self.hit_top[i]:
+                state = config.ROOMBA_STATE_TOUCHED
+                self.hit_top[i] = False
+                self.timer_touch[i] = elapsed
+            elif elapsed - self.timer_reverse[i] > config.ROOMBA_REVERSE_PERIOD:
+                state = config.ROOMBA_STATE_REVERSING
+                self.timer_reverse[i] = elapsed
+            elif elapsed - self.timer_noise[i] > config.ROOMBA_HEADING_NOISE_PERIOD:
+                state = config.ROOMBA_STATE_TURNING_NOISE
+                self.noise_velocity[i] = (self._noise[i]()
+                                          / (config.ROOMBA_NOISE_DURATION / 1000.0))
+                self.timer_noise[i] = elapsed
+            elif self.hit_front[i]:
+                self.hit_front[i] = False
+                state = config.ROOMBA_STATE_REVERSING
+                self.timer_reverse[i] = elapsed
+            else:
+                self._move_target(i, delta)
+        elif state == config.ROOMBA_STATE_TOUCHED:
+            self.hit_top[i] = False
+            if elapsed - self.timer_touch[i] >= _touch_turn_time(config):
+                state = config.ROOMBA_STATE_FORWARD
+            elif self.hit_front[i]:
+                state = config.ROOMBA_STATE_REVERSING
+                self.hit_front[i] = False
+                self.timer_reverse[i] = elapsed
+            else:
+                self.heading[i] -= config.ROOMBA_ANGULAR_SPEED * delta
+        elif state == config.ROOMBA_STATE_REVERSING:
+            self.hit_front[i] = False
+            if self.hit_top[i]:
+                self.hit_top[i] = False
+                state = config.ROOMBA_STATE_TOUCHED
+                self.timer_touch[i] = elapsed
+            elif elapsed - self.timer_reverse[i] >= _reverse_turn_time(config):
+                state = config.ROOMBA_STATE_FORWARD
+            else:
+                self.heading[i] -= config.ROOMBA_ANGULAR_SPEED * delta
+        elif state == config.ROOMBA_STATE_TURNING_NOISE:
+            if self.hit_top[i]:
+                self.hit_top[i] = False
+                state = config.ROOMBA_STATE_TOUCHED
+                self.timer_touch[i] = elapsed
+            elif elapsed - self.timer_noise[i] >= config.ROOMBA_NOISE_DURATION:
+                state = config.ROOMBA_STATE_FORWARD
+            elif self.hit_front[i]:
+                self.hit_front[i] = False
+                state = config.ROOMBA_STATE_REVERSING
+                self.timer_reverse[i] = elapsed
+            else:
+                self.heading[i] += self.noise_velocity[i] * delta
+                self._move_target(i, delta)
+
+        self.state[i] = state
+        self._cache_target(i)
+
+    def _move_target(self, i, delta):
+        '''
+        Drives target i forward along its heading for one step.
+        '''
+        config = self.config
+        heading = self.heading[i]
+        self.pos[i, 0] += config.ROOMBA_LINEAR_SPEED * math.cos(heading) * delta
+        self.pos[i, 1] += config.ROOMBA_LINEAR_SPEED * math.sin(heading) * delta
+
+    def _cache_target(self, i):
+        '''
+        Caches the velocity, turn rate and next timer expiry
+        implied by the current state of target i.
+        '''
+        config = self.config
+        state = self.state[i]
+        heading = self.heading[i]
+
+        speed = 0.0
+        turn_rate = 0.0
+
+        if state == config.ROOMBA_STATE_FORWARD:
+            speed = config.ROOMBA_LINEAR_SPEED
+            due = min(self.timer_reverse[i] + config.ROOMBA_REVERSE_PERIOD,
+                      self.timer_noise[i] + config.ROOMBA_HEADING_NOISE_PERIOD)
+        elif state == config.ROOMBA_STATE_TURNING_NOISE:
+            speed = config.ROOMBA_LINEAR_SPEED
+            turn_rate = self.noise_velocity[i]
+            due = self.timer_noise[i] + config.ROOMBA_NOISE_DURATION
+        elif state == config.ROOMBA_STATE_TOUCHED:
+            turn_rate = -config.ROOMBA_ANGULAR_SPEED
+            due = self.timer_touch[i] + _touch_turn_time(config)
+        elif state == config.ROOMBA_STATE_REVERSING:
+            turn_rate = -config.ROOMBA_ANGULAR_SPEED
+            due = self.timer_reverse[i] + _reverse_turn_time(config)
+        else:
+            due = np.inf
+
+        self._velocity[i, 0] = speed * math.cos(heading)
+        self._velocity[i, 1] = speed * math.sin(heading)
+        self._translating[i] = speed != 0
+        self._turn_rate[i] = turn_rate
+
+        # the small margin keeps the exact comparisons in
+        # _update_target authoritative
+        self._due[i] = due - 1e-6
+
+    def _update_obstacles(self, delta):
+        '''
+        Vectorized version of ObstacleRoomba.update.
+        '''
+        config = self.config
+        nt = self.num_targets
+        if nt == len(self.state):
+            return
+
+        pos = self.pos[nt:]
+        heading = self.heading[nt:]
+        front = self.hit_front[nt:]
+
+        if self._flags_pending and front.any():
+            # blocked obstacles skip a step
+            moving = (self.state[nt:] == config.ROOMBA_STATE_FORWARD) & ~front
+            front[:] = False
+        elif self._obstacles_stalled:
+            moving = self.state[nt:] == config.ROOMBA_STATE_FORWARD
+            self._obstacles_stalled = not moving.all()
+        else:
+            moving = None
+
+        step = config.ROOMBA_LINEAR_SPEED * delta
+
+        if moving is None:
+            # fast path: every obstacle is circling
+            pos[:, 0] += step * np.cos(heading)
+            pos[:, 1] += step * np.sin(heading)
+            np.arctan2(10 - pos[:, 1], 10 - pos[:, 0], out=heading)
+            heading += config.PI / 2
+            return
+
+        pos[:, 0] += step * np.cos(heading) * moving
+        pos[:, 1] += step * np.sin(heading) * moving
+
+        # reorient so we are tangent to a circle centered at the origin
+        heading[moving] = np.arctan2(10 - pos[moving, 1], 10 - pos[moving, 0]) + (config.PI / 2)
+
+    def _detect_roomba_collisions(self):
+        '''
+        Flags every active roomba that is touching and facing
+        another active roomba.
+
+        Afterwards, schedules the next check for the earliest
+        time the closest pair could have closed the gap.
+        '''
+        config = self.config
+        index = np.flatnonzero(self.state != config.ROOMBA_STATE_IDLE)
+        if len(index) < 2:
+            self._next_collision_check = np.inf
+            return
+
+        pos = self.pos[index]
+        heading = self.heading[index]
+
+        # diff[i, j] is the vector from roomba i to roomba j
+        diff = pos[np.newaxis, :, :] - pos[:, np.newaxis, :]
+        dist2 = np.einsum('ijk,ijk->ij', diff, diff)
+        np.fill_diagonal(dist2, np.inf)
+
+        contact = 2 * config.ROOMBA_RADIUS
+        touching = dist2 < contact * contact
+
+        if touching.any():
+            # facing within pi/2 is equivalent to a positive dot product
+            facing = (np.cos(heading)[:, np.newaxis] * diff[:, :, 0]
+                      + np.sin(heading)[:, np.newaxis] * diff[:, :, 1]) > 0
+
+            hits = (touching & facing).any(axis=1)
+            if hits.any():
+                self.hit_front[index[hits]] = True
+                self._flags_pending = True
+
+                if self.event_log.enabled:
+                    for (a, b) in np.argwhere(touching & facing):
+                        self.event_log.emit(1000 * self._clock, events.COLLISION,
+                                            self.roombas[index[a]].tag,
+                                            self.roombas[index[b]].tag)
+
+            # keep checking every step while anything is in contact
+            self._next_collision_check = self._clock
+        else:
+            gap = np.sqrt(dist2.min()) - contact
+            self._next_collision_check = (self._clock
+                                          + gap / (2 * config.ROOMBA_LINEAR_SPEED)
+                                          - 1e-9)
+
+    def _detect_agent_collisions(self):
+        '''
+        Runs the agent contact tests against every active roomba,
+        all at once when the agent implements roomba_contacts.
+        '''
+        agent = self.agent
+        index = np.flatnonzero(self.state != self.config.ROOMBA_STATE_IDLE)
+
+        # decided once per agent class rather than catching
+        # NotImplementedError every frame
+        (agent_class, vectorized) = self._agent_contacts
+        if type(agent) is not agent_class:
+            vectorized = type(agent).roomba_contacts is not Drone.roomba_contacts
+            self._agent_contacts = (type(agent), vectorized)
+
+        if not vectorized:
+            self._detect_agent_collisions_each(index)
+            return
+
+        (touching, blocking) = agent.roomba_contacts(agent.xy_pos, agent.yaw,
+                                                     agent.z_pos, self.pos[index],
+                                                     agent.config)
+
+        if touching.any():
+            self.hit_top[index[touching]] = True
+            self._flags_pending = True
+
+            if self.event_log.enabled:
+                for i in index[touching]:
+                    self.event_log.emit(1000 * self._clock, events.TOP_TOUCH, self.roombas[i].tag)
+
+        if blocking.any():
+            index = index[blocking]
+            diff = agent.xy_pos - self.pos[index]
+            heading = self.heading[index]
+
+            # facing within pi/2 is equivalent to a positive dot product
+            facing = np.cos(heading) * diff[:, 0] + np.sin(heading) * diff[:, 1] > 0
+            if facing.any():
+                self.hit_front[index[facing]] = True
+                self._flags_pending = True
+
+                if self.event_log.enabled:
+                    for i in index[facing]:
+                        self.event_log.emit(1000 * self._clock, events.BLOCK, self.roombas[i].tag)
+
+    def _detect_agent_collisions_each(self, index):
+        '''
+        Per-roomba fallback for agents without roomba_contacts.
+        '''
+        agent = self.agent
+        for i in index:
+            rba = self.roombas[i]
+
+            if agent.is_touching_roomba_top(rba):
+                self.hit_top[i] = True
+                self._flags_pending = True
+                if self.event_log.enabled:
+                    self.event_log.emit(1000 * self._clock, events.TOP_TOUCH, rba.tag)
+
+            if agent.is_blocking_roomba(rba):
+                if Environment._check_roomba_is_facing(rba, agent.xy_pos):
+                    self.hit_front[i] = True
+                    self._flags_pending = True
+                    if self.event_log.enabled:
+                        self.event_log.emit(1000 * self._clock, events.BLOCK, rba.tag)
+
+    def _check_exits(self):
+        '''
+        Vectorized version of Environment._check_bounds.
+
+        Afterwards, schedules the next check for the earliest
+        time any roomba could have crossed an edge.
+        '''
+        config = self.config
+        active = self.state != config.ROOMBA_STATE_IDLE
+
+        x = self.pos[:, 0]
+        y = self.pos[:, 1]
+        low = -config.ROOMBA_RADIUS
+        high = 20 + config.ROOMBA_RADIUS
+
+        good = x > high
+        left = active & ((x < low) | (y < low) | good | (y > high))
+
+        for i in np.flatnonzero(left):
+            reward = 2000 if good[i] else -1000
+            if self.event_log.enabled:
+                self.event_log.emit(1000 * self._clock, events.EXIT, self.roombas[i].tag, reward)
+            if reward > 0:
+                self.good_exits += 1
+            else:
+                self.bad_exits += 1
+            self.score += reward
+
+        if left.any():
+            self.state[left] = config.ROOMBA_STATE_IDLE
+            for i in np.flatnonzero(left[:self.num_targets]):
+                self._cache_target(i)
+            self._obstacles_stalled = bool(
+                (self.state[self.num_targets:] != config.ROOMBA_STATE_FORWARD).any())
+
+        active &= ~left
+        if not active.any():
+            self._next_exit_check = np.inf
+            return
+
+        margin = min((x[active] - low).min(), (y[active] - low).min(),
+                     (high - x[active]).min(), (high - y[active]).min())
+        self._next_exit_check = (self._clock
+                                 + margin / config.ROOMBA_LINEAR_SPEED
+                                 - 1e-9)
@@ -0,0 +1,443 @@
+'''
+batched_environment.py
+
+Contains a BatchedEnvironment class that simulates many
+independent rounds at once. Every roomba attribute is stored
+in a (rounds, roombas) array so a single step advances the
+whole batch with array operations.
+
+Rounds run with a fixed time step and are reset automatically
+when they finish (the round duration elapsed or every target
+roomba left the arena), which keeps the batch full for large
+Monte Carlo runs and policy training.
+'''
+
+import numpy as np
+
+import roombasim.config as cfg
+from roombasim.agent.batched_drone import BatchedDrone
+from roombasim.environment import noise
+
+class BatchedEnvironment(object):
+    '''
+    B independent game rounds stepped together.
+
+    Roomba data (targets first followed by obstacles) lives in:
+
+    - pos : float[B, n, 2]
+    - heading : float[B, n]
+    - state : int8[B, n]
+    - timer_reverse, timer_noise, timer_touch : float[B, n] (milliseconds)
+    - noise_velocity : float[B, n] (rad/s)
+    - hit_front, hit_top : bool[B, n] (pending collision flags)
+
+    Per-round bookkeeping lives in good_exits, bad_exits, score
+    and frames (all int[B]).
+
+    When a round finishes, its outcome is copied into final_good_exits,
+    final_bad_exits and final_score, appended to results as a
+    (good_exits, bad_exits, score) tuple, and the round is reset.
+
+    With max_rounds, finished rounds are only reset until
+    max_rounds rounds have been started; the other slots stop
+    (running is False) and results ends up with exactly
+    max_rounds entries once no slot is running. Rounds that end
+    early are therefore not over-represented in results.
+    '''
+
+    def __init__(self, batch_size, delta=1/60., duration=None, agent_start=None, seed=None,
+                 config=None, max_rounds=None):
+        '''
+        batch_size - number of rounds to simulate at once
+        delta - fixed time step in seconds
+        duration - round length in seconds (default MISSION_ROUND_DURATION)
+        agent_start - optional (pos, yaw, z_pos) spawn pose; if given, every
+            round gets a drone that can be driven through agent.control
+        seed - seed for the batch Generator (see Environment.reset)
+        config - the config.Config to use (by default a copy of the
+            current constants)
+        max_rounds - total number of rounds to play, or None to
+            reset finished rounds forever
+        '''
+        if config is None:
+            config = cfg.current()
+
+        self.config = config
+        self.batch_size = batch_size
+        self.delta = delta
+        self.max_rounds = max_rounds
+
+        if duration is None:
+            duration = config.MISSION_ROUND_DURATION
+        self.round_frames = int(round(duration / delta))
+
+        self.num_targets = config.MISSION_NUM_TARGETS
+        self.num_obstacles = config.MISSION_NUM_OBSTACLES
+        count = self.num_targets + self.num_obstacles
+
+        shape = (batch_size, count)
+        self.pos = np.zeros(shape + (2,), dtype=np.float64)
+        self.heading = np.zeros(shape, dtype=np.float64)
+        self.state = np.zeros(shape, dtype=np.int8)
+        self.timer_reverse = np.zeros(shape, dtype=np.float64)
+        self.timer_noise = np.zeros(shape, dtype=np.float64)
+        self.timer_touch = np.zeros(shape, dtype=np.float64)
+        self.noise_velocity = np.zeros(shape, dtype=np.float64)
+        self.hit_front = np.zeros(shape, dtype=bool)
+        self.hit_top = np.zeros(shape, dtype=bool)
+
+        self.good_exits = np.zeros(batch_size, dtype=np.int64)
+        self.bad_exits = np.zeros(batch_size, dtype=np.int64)
+        self.score = np.zeros(batch_size, dtype=np.int64)
+        self.frames = np.zeros(batch_size, dtype=np.int64)
+
+        self.final_good_exits = np.zeros(batch_size, dtype=np.int64)
+        self.final_bad_exits = np.zeros(batch_size, dtype=np.int64)
+        self.final_score = np.zeros(batch_size, dtype=np.int64)
+        self.results = []
+        self.running = np.zeros(batch_size, dtype=bool)
+        self.started = 0
+
+        # spawn layout shared by every round (same as Environment.reset)
+        self._spawn_pos = np.zeros((count, 2), dtype=np.float64)
+        self._spawn_heading = np.zeros(count, dtype=np.float64)
+
+        nt = self.num_targets
+        theta = (config.TAU * np.arange(nt)) / max(nt, 1)
+        self._spawn_pos[:nt, 0] = np.cos(theta) * config.MISSION_TARGET_SPAWN_RADIUS + 10
+        self._spawn_pos[:nt, 1] = np.sin(theta) * config.MISSION_TARGET_SPAWN_RADIUS + 10
+        self._spawn_heading[:nt] = theta
+
+        theta = (config.TAU * np.arange(self.num_obstacles)) / max(self.num_obstacles, 1)
+        self._spawn_pos[nt:, 0] = np.cos(theta) * config.MISSION_OBSTACLE_SPAWN_RADIUS + 10
+        self._spawn_pos[nt:, 1] = np.sin(theta) * config.MISSION_OBSTACLE_SPAWN_RADIUS + 10
+        self._spawn_heading[nt:] = theta - (config.PI / 2)
+
+        # every unordered roomba pair, for collision detection
+        self._pair_i, self._pair_j = np.triu_indices(count, k=1)
+
+        # incidence matrices used to fold pair hits back onto roombas
+        pairs = len(self._pair_i)
+        self._incidence_i = np.zeros((pairs, count), dtype=np.float32)
+        self._incidence_i[np.arange(pairs), self._pair_i] = 1
+        self._incidence_j = np.zeros((pairs, count), dtype=np.float32)
+        self._incidence_j[np.arange(pairs), self._pair_j] = 1
+
+        if agent_start is not None:
+            self.agent = BatchedDrone(batch_size, *agent_start, config=config)
+        else:
+            self.agent = None
+
+        self.reset(seed)
+
+    @property
+    def elapsed(self):
+        '''
+        Time since the start of each round in milliseconds (float[B]).
+        '''
+        return self.frames * (self.delta * 1000)
+
+    def reset(self, seed=None):
+        '''
+        Resets every round and reseeds the batch Generator.
+        '''
+        self.seed_sequence = noise.seed_sequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self._noise_block = np.zeros(0)
+        self._noise_index = 0
+
+        self.results = []
+        self.running[:] = False
+        self.started = 0
+        self._restart_rounds(np.ones(self.batch_size, dtype=bool))
+
+    def _draw_noise(self, count):
+        '''
+        Returns count heading noise samples, drawn from the batch
+        Generator a block at a time.
+        '''
+        config = self.config
+        if self._noise_index + count > len(self._noise_block):
+            size = max(count, noise.NOISE_BLOCK_SIZE * self.batch_size)
+            self._noise_block = self.rng.uniform(-config.ROOMBA_HEADING_NOISE_MAX,
+                                                 config.ROOMBA_HEADING_NOISE_MAX,
+                                                 size=size)
+            self._noise_index = 0
+
+        samples = self._noise_block[self._noise_index:self._noise_index + count]
+        self._noise_index += count
+        return samples
+
+    def _restart_rounds(self, rows):
+        '''
+        Resets the selected rounds while fewer than max_rounds
+        rounds were started and stops the rest.
+
+        rows - bool[B] mask of finished rounds
+        '''
+        if self.max_rounds is not None:
+            indices = np.flatnonzero(rows)
+            stop = indices[max(self.max_rounds - self.started, 0):]
+            rows = rows.copy()
+            rows[stop] = False
+
+            # stopped rounds keep no active roombas
+            self.running[stop] = False
+            self.state[stop] = self.config.ROOMBA_STATE_IDLE
+
+        self.running[rows] = True
+        self.started += int(np.count_nonzero(rows))
+        self._reset_rounds(rows)
+
+    def _reset_rounds(self, rows):
+        '''
+        Respawns the roombas (and drone) of the selected rounds.
+
+        rows - bool[B] mask of rounds to reset
+        '''
+        self.pos[rows] = self._spawn_pos
+        self.heading[rows] = self._spawn_heading
+        self.state[rows] = self.config.ROOMBA_STATE_FORWARD
+        self.timer_reverse[rows] = 0
+        self.timer_noise[rows] = 0
+        self.timer_touch[rows] = 0
+        self.noise_velocity[rows] = 0
+        self.hit_front[rows] = False
+        self.hit_top[rows] = False
+
+        self.good_exits[rows] = 0
+        self.bad_exits[rows] = 0
+        self.score[rows] = 0
+        self.frames[rows] = 0
+
+        if self.agent is not None:
+            self.agent.reset(rows)
+
+    def step(self):
+        '''
+        Advances every round by one fixed time step.
+
+        Returns a bool[B] mask of the rounds that finished during
+        this step (those rounds have already been reset or
+        stopped).
+        '''
+        config = self.config
+        delta = self.delta
+        elapsed = self.elapsed[:, np.newaxis]
+
+        self._update_targets(delta, elapsed)
+        self._update_obstacles(delta)
+
+        active = self.state != config.ROOMBA_STATE_IDLE
+
+        self._detect_roomba_collisions(active)
+
+        if self.agent is not None:
+            self._detect_agent_collisions(active)
+
+        self._check_exits(active)
+
+        if self.agent is not None:
+            self.agent.update(delta, elapsed)
+
+        self.frames += 1
+
+        nt = self.num_targets
+        done = self.running & ((self.frames >= self.round_frames)
+                               | ~(self.state[:, :nt] != config.ROOMBA_STATE_IDLE).any(axis=1))
+
+        if done.any():
+            self.final_good_exits[done] = self.good_exits[done]
+            self.final_bad_exits[done] = self.bad_exits[done]
+            self.final_score[done] = self.score[done]
+            self.results.extend(zip(self.good_exits[done].tolist(),
+                                    self.bad_exits[done].tolist(),
+                                    self.score[done].tolist()))
+            self._restart_rounds(done)
+
+        return done
+
+    def _update_targets(self, delta, elapsed):
+        '''
+        Vectorized version of TargetRoomba.update over the batch.
+
+        Every branch mask is computed from the state at the start
+        of the step so a roomba only takes one transition per step.
+        '''
+        config = self.config
+        nt = self.num_targets
+        state = self.state[:, :nt]
+        top = self.hit_top[:, :nt]
+        front = self.hit_front[:, :nt]
+        heading = self.heading[:, :nt]
+        pos = self.pos[:, :nt]
+        timer_reverse = self.timer_reverse[:, :nt]
+        timer_noise = self.timer_noise[:, :nt]
+        timer_touch = self.timer_touch[:, :nt]
+        noise_velocity = self.noise_velocity[:, :nt]
+
+        forward = state == config.ROOMBA_STATE_FORWARD
+        touched = state == config.ROOMBA_STATE_TOUCHED
+        reversing = state == config.ROOMBA_STATE_REVERSING
+        noise = state == config.ROOMBA_STATE_TURNING_NOISE
+
+        reverse_due = elapsed - timer_reverse > config.ROOMBA_REVERSE_PERIOD
+        noise_due = elapsed - timer_noise > config.ROOMBA_HEADING_NOISE_PERIOD
+        touch_done = (elapsed - timer_touch
+                      >= ((np.pi / 4) / config.ROOMBA_ANGULAR_SPEED) * 1000)
+        reverse_done = (elapsed - timer_reverse
+                        >= np.pi / config.ROOMBA_ANGULAR_SPEED * 1000)
+        noise_done = elapsed - timer_noise >= config.ROOMBA_NOISE_DURATION
+
+        # STATE_FORWARD
+        f_top = forward & top
+        f_reverse = forward & ~top & reverse_due
+        f_noise = forward & ~top & ~reverse_due & noise_due
+        f_front = forward & ~top & ~reverse_due & ~noise_due & front
+        f_move = forward & ~(f_top | f_reverse | f_noise | f_front)
+
+        # STATE_TOUCHED (the top flag is always cleared)
+        t_front = touched & ~touch_done & front
+        t_turn = touched & ~touch_done & ~front
+
+        # STATE_REVERSING (the front flag is always cleared)
+        r_top = reversing & top
+        r_turn = reversing & ~top & ~reverse_done
+
+        # STATE_TURNING_NOISE
+        n_top = noise & top
+        n_front = noise & ~top & ~noise_done & front
+        n_move = noise & ~top & ~noise_done & ~front
+
+        to_touched = f_top | r_top | n_top
+        to_reversing = f_reverse | f_front | t_front | n_front
+        to_forward = ((touched & touch_done) | (reversing & ~top & reverse_done)
+                      | (noise & ~top & noise_done))
+
+        state[to_touched] = config.ROOMBA_STATE_TOUCHED
+        state[to_reversing] = config.ROOMBA_STATE_REVERSING
+        state[f_noise] = config.ROOMBA_STATE_TURNING_NOISE
+        state[to_forward] = config.ROOMBA_STATE_FORWARD
+
+        np.copyto(timer_touch, elapsed, where=to_touched)
+        np.copyto(timer_reverse, elapsed, where=to_reversing)
+        np.copyto(timer_noise, elapsed, where=f_noise)
+
+        count = np.count_nonzero(f_noise)
+        if count:
+            noise_velocity[f_noise] = (self._draw_noise(count)
+                                       / (config.ROOMBA_NOISE_DURATION / 1000.0))
+
+        top[to_touched | touched] = False
+        front[f_front | t_front | n_front | reversing] = False
+
+        # motion
+        heading -= (config.ROOMBA_ANGULAR_SPEED * delta) * (t_turn | r_turn)
+        heading += noise_velocity * delta * n_move
+
+        step = config.ROOMBA_LINEAR_SPEED * delta * (f_move | n_move)
+        pos[..., 0] += step * np.cos(heading)
+        pos[..., 1] += step * np.sin(heading)
+
+    def _update_obstacles(self, delta):
+        '''
+        Vectorized version of ObstacleRoomba.update over the batch.
+        '''
+        config = self.config
+        nt = self.num_targets
+        if self.num_obstacles == 0:
+            return
+
+        state = self.state[:, nt:]
+        front = self.hit_front[:, nt:]
+        pos = self.pos[:, nt:]
+        heading = self.heading[:, nt:]
+
+        moving = (state == config.ROOMBA_STATE_FORWARD) & ~front
+        front[:] = False
+
+        step = config.ROOMBA_LINEAR_SPEED * delta * moving
+        pos[..., 0] += step * np.cos(heading)
+        pos[..., 1] += step * np.sin(heading)
+
+        # reorient so we are tangent to a circle centered at the origin
+        np.copyto(heading,
+                  np.arctan2(10 - pos[..., 1], 10 - pos[..., 0]) + (config.PI / 2),
+                  where=moving)
+
+    def _detect_roomba_collisions(self, active):
+        '''
+        Flags every active roomba that is touching and facing
+        another active roomba in the same round.
+        '''
+        i = self._pair_i
+        j = self._pair_j
+        if len(i) == 0:
+            return
+
+        x = self.pos[..., 0]
+        y = self.pos[..., 1]
+
+        # vector from roomba i to roomba j for every pair
+        dx = x[:, j] - x[:, i]
+        dy = y[:, j] - y[:, i]
+
+        contact = 2 * self.config.ROOMBA_RADIUS
+        touching = ((dx * dx + dy * dy) < contact * contact) & active[:, i] & active[:, j]
+
+        if not touching.any():
+            return
+
+        # facing within pi/2 is equivalent to a positive dot product
+        c = np.cos(self.heading)
+        s = np.sin(self.heading)
+        i_hits = touching & ((c[:, i] * dx + s[:, i] * dy) > 0)
+        j_hits = touching & ((c[:, j] * dx + s[:, j] * dy) < 0)
+
+        self.hit_front |= ((i_hits.astype(np.float32).dot(self._incidence_i)
+                            + j_hits.astype(np.float32).dot(self._incidence_j)) > 0)
+
+    def _detect_agent_collisions(self, active):
+        '''
+        Runs the agent contact tests against every active roomba.
+        '''
+        agent = self.agent
+        config = self.config
+        touching, blocking = config.AGENT.roomba_contacts(agent.xy_pos,
+                                                          agent.yaw,
+                                                          agent.z_pos,
+                                                          self.pos,
+                                                          config)
+
+        self.hit_top |= touching & active
+
+        # only flag roombas whose front faces the drone
+        offset = agent.xy_pos[:, np.newaxis, :] - self.pos
+        facing = (np.cos(self.heading) * offset[..., 0]
+                  + np.sin(self.heading) * offset[..., 1]) > 0
+        self.hit_front |= blocking & facing & active
+
+    def _check_exits(self, active):
+        '''
+        Vectorized version of Environment._check_bounds over the batch.
+        '''
+        config = self.config
+        x = self.pos[..., 0]
+        y = self.pos[..., 1]
+        low = -config.ROOMBA_RADIUS
+        high = 20 + config.ROOMBA_RADIUS
+
+        good = x > high
+        left = active & ((x < low) | (y < low) | good | (y > high))
+
+        if not left.any():
+            return
+
+        good_count = (left & good).sum(axis=1)
+        bad_count = left.sum(axis=1) - good_count
+
+        self.good_exits += good_count
+        self.bad_exits += bad_count
+        self.score += 2000 * good_count - 1000 * bad_count
+
+        self.state[left] = config.ROOMBA_STATE_IDLE
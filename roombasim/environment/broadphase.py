@@ -0,0 +1,76 @@
+'''
+broadphase.py
+
+Contains a UniformGrid class used to find roombas that
+might be touching without testing every pair.
+
+The arena is split into square cells whose side is the
+contact distance of two roombas (2 * ROOMBA_RADIUS). Two
+roombas can only be touching if they sit in the same or in
+adjacent cells, so each roomba only needs to be tested
+against the (few) roombas in its 3x3 block of cells.
+'''
+
+import math
+
+import roombasim.config as cfg
+
+class UniformGrid(object):
+    '''
+    A uniform grid spatial hash over the arena.
+
+    Positions outside the arena are clamped to the border
+    cells. Clamping never moves two points further apart in
+    cell space, so nearby roombas just outside the arena are
+    still reported as neighbours.
+    '''
+
+    def __init__(self, cell_size=None, width=20, height=20):
+        '''
+        cell_size - side of a cell in meters (default 2 * ROOMBA_RADIUS)
+        width, height - arena dimensions in meters
+        '''
+        if cell_size is None:
+            cell_size = 2 * cfg.ROOMBA_RADIUS
+
+        self.cell_size = cell_size
+        self.cols = max(1, int(math.ceil(width / cell_size)))
+        self.rows = max(1, int(math.ceil(height / cell_size)))
+        self.cells = {}
+
+    def cell(self, pos):
+        '''
+        Returns the (col, row) cell containing pos.
+        '''
+        col = int(math.floor(pos[0] / self.cell_size))
+        row = int(math.floor(pos[1] / self.cell_size))
+        return (min(max(col, 0), self.cols - 1), min(max(row, 0), self.rows - 1))
+
+    def build(self, positions):
+        '''
+        Rebuilds the grid from (index, pos) pairs.
+        '''
+        cells = {}
+        for (index, pos) in positions:
+            key = self.cell(pos)
+            if key in cells:
+                cells[key].append(index)
+            else:
+                cells[key] = [index]
+        self.cells = cells
+
+    def neighbours(self, pos):
+        '''
+        Returns the indices stored in the 3x3 block of cells
+        around pos. The result may contain entries that are not
+        actually touching pos and is not sorted.
+        '''
+        (col, row) = self.cell(pos)
+        cells = self.cells
+        found = []
+        for c in (col - 1, col, col + 1):
+            for r in (row - 1, row, row + 1):
+                members = cells.get((c, r))
+                if members is not None:
+                    found.extend(members)
+        return found
@@ -10,10 +10,15 @@ collision detection and notifying child roombas via
 the collision dict.
 '''
 
+import copy
 import numpy as np
 
 import roombasim.config as cfg
 from roombasim.environment import roomba
+from roombasim.environment import noise
+from roombasim.environment import prediction
+from roombasim.environment.broadphase import UniformGrid
+from roombasim import events
 from roombasim import geometry
 
 class Environment(object):
@@ -22,9 +27,18 @@ class Environment(object):
 
     Contains methods to initialize a round and update
     methods that can be used to progress through time.
+
+    The round is played with the constants of config (a
+    config.Config, by default a copy of the current constants
+    made when the environment is created), which is handed on to
+    the roombas it spawns.
     '''
 
-    def __init__(self):
+    def __init__(self, config=None):
+        if config is None:
+            config = cfg.current()
+
+        self.config = config
         self.roombas = []
         self.agent = None
         self.good_exits = 0
@@ -33,7 +47,26 @@ class Environment(object):
         self.target_roomba = None
         self.target_type = None
 
-    def reset(self):
+        # seeded by reset
+        self.seed_sequence = None
+        self.rng = None
+
+        # set to False to test every roomba pair (for benchmarking)
+        self.broadphase = True
+        self._grid = UniformGrid(2 * config.ROOMBA_RADIUS)
+
+        # bumped by every update, reset and restore; per-frame
+        # caches compare it to notice that the round changed
+        self.frame = 0
+        self._roomba_arrays = (None, None)
+
+        # optional recording.Recorder, called after every update
+        self.recorder = None
+
+        # where round events go (see roombasim.events)
+        self.event_log = events.NULL_SINK
+
+    def reset(self, seed=None):
         '''
         Spawns roombas and positions them as follows:
 
@@ -44,6 +77,10 @@ class Environment(object):
         - 4 obstacle roombas evenly spaced around a 4m circle
         centered at the origin. Roombas move clockwise around
         the circle.
+
+        seed - an int, a SeedSequence (see noise.spawn_seeds) or
+            None for a fresh random round. It seeds the environment
+            Generator (rng) and the heading noise of every target.
         '''
         self.roombas = []
         self.agent = None
@@ -52,15 +89,23 @@ class Environment(object):
         self.score = 0
         self.target_roomba = None
         self.target_type = None
+        self.frame += 1
+
+        config = self.config
+        self.seed_sequence = noise.seed_sequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        streams = noise.noise_streams(self.seed_sequence, config.MISSION_NUM_TARGETS, config)
 
         # spawn target roombas
-        for i in range(cfg.MISSION_NUM_TARGETS):
-            theta = (cfg.TAU * i) / cfg.MISSION_NUM_TARGETS
+        for i in range(config.MISSION_NUM_TARGETS):
+            theta = (config.TAU * i) / config.MISSION_NUM_TARGETS
 
             target_roomba = roomba.TargetRoomba(
-                [np.cos(theta) * cfg.MISSION_TARGET_SPAWN_RADIUS + 10, np.sin(theta) * cfg.MISSION_TARGET_SPAWN_RADIUS + 10],
+                [np.cos(theta) * config.MISSION_TARGET_SPAWN_RADIUS + 10, np.sin(theta) * config.MISSION_TARGET_SPAWN_RADIUS + 10],
                 theta,
-                tag=i
+                tag=i,
+                noise=streams[i],
+                config=config
             )
 
             target_roomba.start()
@@ -68,13 +113,14 @@ class Environment(object):
             self.roombas.append(target_roomba)
 
         # spawn obstacle roombas
-        for i in range(cfg.MISSION_NUM_OBSTACLES):
-            theta = (cfg.TAU * i) / cfg.MISSION_NUM_OBSTACLES
+        for i in range(config.MISSION_NUM_OBSTACLES):
+            theta = (config.TAU * i) / config.MISSION_NUM_OBSTACLES
 
             obstacle_roomba = roomba.ObstacleRoomba(
-                [np.cos(theta) * cfg.MISSION_OBSTACLE_SPAWN_RADIUS + 10, np.sin(theta) * cfg.MISSION_OBSTACLE_SPAWN_RADIUS + 10],
-                theta - (cfg.PI / 2),
-                tag=i
+                [np.cos(theta) * config.MISSION_OBSTACLE_SPAWN_RADIUS + 10, np.sin(theta) * config.MISSION_OBSTACLE_SPAWN_RADIUS + 10],
+                theta - (config.PI / 2),
+                tag=i,
+                config=config
             )
 
             obstacle_roomba.start()
@@ -86,46 +132,82 @@ class Environment(object):
         Perform an update step.
 
         This will update all child roombas and perform collision
-        detection in O(n^2) time. At the current stage, this is
-        "good enough" for realtime display but for high-speed
-        simulation in a neural network training phase it may
-        make sense to improve the efficiency of certain aspects
-        of the code.
+        detection. Roomba pairs are found through a uniform grid
+        built at the start of the step so each roomba is only
+        tested against roombas in neighbouring cells.
+
+        Events are reported to event_log with the time at the end
+        of the step.
         '''
+        self.frame += 1
+
+        log = self.event_log
+        now = elapsed + delta * 1000
+        idle = self.config.ROOMBA_STATE_IDLE
+
+        if self.broadphase:
+            # roombas are only tested against later (not yet updated)
+            # roombas so the grid built here stays valid for them
+            self._grid.build((j, rba.pos) for (j, rba) in enumerate(self.roombas)
+                             if rba.state != idle)
+
         for i in range(len(self.roombas)):
             rba = self.roombas[i]
 
             # ignore roombas that left the arena
-            if (rba.state == cfg.ROOMBA_STATE_IDLE):
+            if (rba.state == idle):
                 continue
 
-            rba.update(delta, elapsed)
+            if log.enabled:
+                state = rba.state
+                rba.update(delta, elapsed)
+                if rba.state != state:
+                    log.emit(now, events.STATE, rba.tag, rba.state)
+            else:
+                rba.update(delta, elapsed)
 
             # Perform roomba-to-roomba collision detection
-            for j in range(i + 1, len(self.roombas)):
+            if self.broadphase:
+                candidates = self._grid.neighbours(rba.pos)
+            else:
+                candidates = range(i + 1, len(self.roombas))
+
+            for j in candidates:
+                if j <= i:
+                    continue
+
                 # ignore collisions with roombas that left
-                if self.roombas[j].state == cfg.ROOMBA_STATE_IDLE:
+                if self.roombas[j].state == idle:
                     continue
 
-                if Environment._check_roomba_collision(rba, self.roombas[j]):
+                if self._check_roomba_collision(rba, self.roombas[j]):
                     if Environment._check_roomba_is_facing(rba, self.roombas[j].pos):
-                        rba.collisions['front'] = True
+                        rba.hit_front = True
+                        if log.enabled:
+                            log.emit(now, events.COLLISION, rba.tag, self.roombas[j].tag)
                     if Environment._check_roomba_is_facing(self.roombas[j], rba.pos):
-                        self.roombas[j].collisions['front'] = True
+                        self.roombas[j].hit_front = True
+                        if log.enabled:
+                            log.emit(now, events.COLLISION, self.roombas[j].tag, rba.tag)
 
             # Perform drone-to-roomba collision detection
             if self.agent is not None:
                 if self.agent.is_touching_roomba_top(rba):
-                    rba.collisions['top'] = True
+                    rba.hit_top = True
+                    if log.enabled:
+                        log.emit(now, events.TOP_TOUCH, rba.tag)
 
                 if self.agent.is_blocking_roomba(rba):
                     if Environment._check_roomba_is_facing(rba, self.agent.xy_pos):
-                        rba.collisions['front'] = True
+                        rba.hit_front = True
+                        if log.enabled:
+                            log.emit(now, events.BLOCK, rba.tag)
 
             # Check if the roomba has left the arena
-            (has_left, reward) = Environment._check_bounds(rba)
+            (has_left, reward) = self._check_bounds(rba)
             if has_left:
-                print('roomba left, reward: ' + str(reward))
+                if log.enabled:
+                    log.emit(now, events.EXIT, rba.tag, reward)
                 if reward > 0:
                     self.good_exits += 1
                 else:
@@ -137,8 +219,213 @@ class Environment(object):
         if self.agent is not None:
             self.agent.update(delta, elapsed)
 
-    @staticmethod
-    def _check_roomba_collision(ra, rb):
+        if self.recorder is not None:
+            self.recorder.record(self, elapsed + delta * 1000)
+
+    # good_exits, bad_exits, score and the three block sizes
+    SNAPSHOT_HEADER_SIZE = 6
+
+    def snapshot(self, rng=True):
+        '''
+        Returns the complete state of the round as one flat
+        float64 array that can be passed to restore.
+
+        Layout: a header (block sizes, good_exits, bad_exits,
+        score) followed by the roomba block, the agent block and,
+        if rng is True, the state of the environment Generator and
+        of every noise stream so restored rollouts replay
+        identically.
+
+        A snapshot can only be restored into an environment with
+        the same roombas (in the same order) and agent type.
+        '''
+        roombas = self._roomba_state()
+        agent = self.agent.get_state() if self.agent is not None else ()
+        streams = self._noise_streams()
+
+        rng_size = 0
+        if rng:
+            rng_size = noise.GENERATOR_STATE_SIZE + sum(s.state_size for s in streams)
+
+        header = self.SNAPSHOT_HEADER_SIZE
+        start = header + len(roombas)
+        end = start + len(agent)
+
+        buf = np.empty(end + rng_size, dtype=np.float64)
+        buf[:header] = (len(roombas), len(agent), rng_size,
+                        self.good_exits, self.bad_exits, self.score)
+        buf[header:start] = roombas
+        buf[start:end] = agent
+
+        if rng:
+            noise.write_generator_state(self.rng.bit_generator.state, buf[end:])
+            offset = end + noise.GENERATOR_STATE_SIZE
+            for stream in streams:
+                stream.write_state(buf[offset:])
+                offset += stream.state_size
+
+        return buf
+
+    def restore(self, buf):
+        '''
+        Restores a state returned by snapshot.
+        '''
+        header = self.SNAPSHOT_HEADER_SIZE
+        (roomba_size, agent_size, rng_size) = buf[:3].astype(int).tolist()
+        (self.good_exits, self.bad_exits, self.score) = buf[3:header].astype(int).tolist()
+
+        start = header + roomba_size
+        end = start + agent_size
+
+        self.frame += 1
+        self._restore_roombas(buf[header:start])
+
+        if agent_size:
+            self.agent.set_state(buf[start:end].tolist())
+
+        if rng_size:
+            self.rng.bit_generator.state = noise.read_generator_state(buf[end:])
+            offset = end + noise.GENERATOR_STATE_SIZE
+            for stream in self._noise_streams():
+                stream.read_state(buf[offset:])
+                offset += stream.state_size
+
+    def clone(self):
+        '''
+        Returns an independent copy of the round (including the
+        agent and the random streams) that can be stepped without
+        affecting this one. Until their actions differ, both
+        copies draw the same random numbers.
+        '''
+        other = self.__class__(self.config)
+        self._copy_roombas(other)
+
+        other.target_roomba = self.target_roomba
+        other.target_type = self.target_type
+        other.broadphase = self.broadphase
+        other.seed_sequence = self.seed_sequence
+        other.rng = noise.copy_generator(self.rng)
+
+        if self.agent is not None:
+            other.agent = copy.copy(self.agent)
+
+        other.restore(self.snapshot(rng=False))
+        return other
+
+    def roomba_arrays(self):
+        '''
+        Returns (targets, obstacles) as two RoombaArrays holding
+        the position and heading of every tagged roomba.
+
+        The arrays are refreshed at most once per frame, so any
+        number of sensors and tasks can read them during a frame.
+        They are read-only and are overwritten in place on later
+        frames; copy a position before keeping it across frames.
+        '''
+        (frame, groups) = self._roomba_arrays
+        if frame != self.frame:
+            if groups is None or groups[0] is not self.roombas:
+                groups = self._group_roombas()
+
+            (_, members, arrays) = groups
+            for (group, rows) in zip(members, arrays):
+                if group:
+                    rows.pos.base[:] = [rba.pos for rba in group]
+                    rows.heading.base[:] = [rba.heading for rba in group]
+
+            self._roomba_arrays = (self.frame, groups)
+
+        return groups[2]
+
+    def predict_roombas(self, elapsed, horizons):
+        '''
+        Predicts the pose of every roomba (in self.roombas order)
+        at several times at once, in closed form from the current
+        states and timers (see environment.prediction).
+
+        elapsed - time of the current state in milliseconds (the
+            elapsed argument of the next update)
+        horizons - float[k] times ahead in seconds
+
+        Returns (pos float[n, k, 2], heading float[n, k]).
+        '''
+        return prediction.predict_poses(*self._prediction_state(),
+                                        elapsed=elapsed, horizons=horizons,
+                                        config=self.config)
+
+    def _prediction_state(self):
+        '''
+        Returns the arguments of prediction.predict_poses that
+        describe the roombas (pos through hit_top).
+        '''
+        rows = np.reshape(self._roomba_state(), (-1, roomba.Roomba.STATE_SIZE))
+        is_target = [isinstance(rba, roomba.TargetRoomba) for rba in self.roombas]
+
+        # columns of Roomba.get_state
+        return (rows[:, 0:2], rows[:, 2], rows[:, 3], is_target,
+                rows[:, 6], rows[:, 7], rows[:, 8], rows[:, 11],
+                rows[:, 4], rows[:, 5])
+
+    def _group_roombas(self):
+        '''
+        Splits the tagged roombas into targets and obstacles and
+        allocates their RoombaArrays. Returns (roombas list,
+        (targets, obstacles), (target arrays, obstacle arrays)).
+        '''
+        targets = []
+        obstacles = []
+        for rba in self.roombas:
+            if rba.tag is not None:
+                if isinstance(rba, roomba.TargetRoomba):
+                    targets.append(rba)
+                elif isinstance(rba, roomba.ObstacleRoomba):
+                    obstacles.append(rba)
+
+        arrays = tuple(RoombaArrays(np.zeros((len(group), 2)), np.zeros(len(group)),
+                                    [rba.tag for rba in group])
+                       for group in (targets, obstacles))
+
+        return (self.roombas, (targets, obstacles), arrays)
+
+    def _noise_streams(self):
+        '''
+        Returns the NoiseStream of every target roomba, in order.
+        '''
+        return [rba.noise for rba in self.roombas
+                if getattr(rba, 'noise', None) is not None]
+
+    def _roomba_state(self):
+        '''
+        Returns the state of every roomba as a flat sequence.
+        '''
+        values = []
+        for rba in self.roombas:
+            values.extend(rba.get_state())
+        return values
+
+    def _restore_roombas(self, buf):
+        '''
+        Inverse of _roomba_state.
+        '''
+        values = buf.tolist()
+        size = roomba.Roomba.STATE_SIZE
+        for (i, rba) in enumerate(self.roombas):
+            rba.set_state(values[i * size:(i + 1) * size])
+
+    def _copy_roombas(self, other):
+        '''
+        Gives other a fresh set of roombas of the same types and
+        tags, with copies of their noise streams (the rest of
+        their state is filled in by restore).
+        '''
+        other.roombas = []
+        for rba in self.roombas:
+            copied = rba.__class__(rba.pos, rba.heading, tag=rba.tag, config=rba.config)
+            if getattr(rba, 'noise', None) is not None:
+                copied.noise = rba.noise.copy()
+            other.roombas.append(copied)
+
+    def _check_roomba_collision(self, ra, rb):
         '''
         Returns true if two roombas are touching.
 
@@ -146,7 +433,7 @@ class Environment(object):
         euclidean distance and comparing that to the radius
         of each roomba.
         '''
-        return geometry.circle_intersects_circle(ra.pos, rb.pos, cfg.ROOMBA_RADIUS)
+        return geometry.circle_intersects_circle(ra.pos, rb.pos, self.config.ROOMBA_RADIUS)
 
     @staticmethod
     def _check_roomba_is_facing(ra, pos):
@@ -160,8 +447,7 @@ class Environment(object):
         ang = np.arctan2(pos[1] - ra.pos[1], pos[0] - ra.pos[0])
         return geometry.compare_angle(ra.heading, ang) < cfg.PI / 2
 
-    @staticmethod
-    def _check_bounds(r):
+    def _check_bounds(self, r):
         '''
         Check if a roomba has left the arena.
 
@@ -173,15 +459,40 @@ class Environment(object):
         '''
         has_left = False
         reward = -1000
+        radius = self.config.ROOMBA_RADIUS
 
-        if (r.pos[0] < -cfg.ROOMBA_RADIUS
-            or r.pos[1] < -cfg.ROOMBA_RADIUS
-            or r.pos[0] > 20 + cfg.ROOMBA_RADIUS
-            or r.pos[1] > 20 + cfg.ROOMBA_RADIUS):
+        if (r.pos[0] < -radius
+            or r.pos[1] < -radius
+            or r.pos[0] > 20 + radius
+            or r.pos[1] > 20 + radius):
             has_left = True
 
-        if (r.pos[0] > 20 + cfg.ROOMBA_RADIUS):
+        if (r.pos[0] > 20 + radius):
             reward = 2000
 
         return (has_left, reward)
 
+
+class RoombaArrays(object):
+    '''
+    Positions and headings of a group of roombas:
+
+    - pos : float[k, 2] (read-only)
+    - heading : float[k] (read-only)
+    - tags : the tag of each row
+    - index : dict mapping a tag to its row
+    '''
+
+    def __init__(self, pos, heading, tags):
+        self.pos = _read_only(pos)
+        self.heading = _read_only(heading)
+        self.tags = tags
+        self.index = dict((tag, i) for (i, tag) in enumerate(tags))
+
+def _read_only(array):
+    '''
+    Returns a view of array that cannot be written through.
+    '''
+    view = array.view()
+    view.flags.writeable = False
+    return view
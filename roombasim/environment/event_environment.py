@@ -0,0 +1,395 @@
+'''
+event_environment.py
+
+Contains an EventEnvironment class that advances a round from
+event to event instead of in fixed frames.
+
+Between events every target roomba follows a closed-form path
+(a straight line, a turn in place or a constant-rate arc), so
+the engine only has to stop when something can change:
+
+- a target timer expires (reversal, heading noise, end of a turn)
+- two roombas touch
+- a roomba leaves the arena
+
+Timer expiries are known exactly. Contact and exit times are
+solved exactly for roombas moving in straight lines. A roomba on
+an arc (noisy turns and obstacle roombas) stays within
+ROOMBA_LINEAR_SPEED * t of where it started, which gives a safe
+lower bound instead; those bounds never step less than a 60 Hz
+frame. Touching pairs are solved exactly (until they separate or
+start facing each other) when both move in straight lines, and
+otherwise advance in 60 Hz steps so the state machine sees the
+same collision flags as the frame engines.
+
+The drone needs per-frame control, so whenever an agent is
+attached the engine simply steps like ArrayEnvironment.
+'''
+
+import numpy as np
+
+from roombasim import events
+from roombasim import geometry
+from roombasim.environment.array_environment import ArrayEnvironment
+
+# shortest step taken for conservative (arc) estimates, in seconds
+MIN_CONSERVATIVE_STEP = 1 / 60.
+
+# step taken while roombas are in contact, in seconds
+CONTACT_STEP = 1 / 60.
+
+# time added to exact event times so the event is observed (seconds)
+EVENT_EPSILON = 1e-6
+
+class EventEnvironment(ArrayEnvironment):
+    '''
+    An event-driven game round.
+
+    update(delta, elapsed) simulates the whole interval
+    [elapsed, elapsed + delta * 1000] at once, so a round without
+    a drone can be played with a single call:
+
+        environment.update(environment.config.MISSION_ROUND_DURATION, 0)
+
+    The number of events processed since the last reset is kept
+    in events.
+    '''
+
+    def _allocate(self, num_targets, num_obstacles):
+        super(EventEnvironment, self)._allocate(num_targets, num_obstacles)
+
+        # every unordered roomba pair
+        (self._pair_i, self._pair_j) = np.triu_indices(num_targets + num_obstacles, k=1)
+
+        self.events = 0
+        self._frame_mode = False
+
+    def update(self, delta, elapsed):
+        '''
+        Simulates delta seconds starting at elapsed milliseconds.
+        '''
+        if self.agent is not None:
+            if not self._frame_mode:
+                self._frame_mode = True
+                self.invalidate()
+            super(EventEnvironment, self).update(delta, elapsed)
+            return
+
+        if self._frame_mode:
+            self._frame_mode = False
+            self.invalidate()
+
+        self.frame += 1
+        now = elapsed
+        end = elapsed + delta * 1000
+
+        self._scan()
+
+        log = self.event_log
+
+        while True:
+            if log.enabled:
+                states = self.state.copy()
+                self._transition_targets(now)
+                self._log_transitions(states)
+            else:
+                self._transition_targets(now)
+
+            step = min(self._next_event(now), (end - now) / 1000.0)
+            self._advance(step)
+
+            now += step * 1000
+            self._clock += step
+            self.events += 1
+
+            self._scan()
+            self._flag_contacts()
+            self._check_exits()
+
+            if now >= end - 1e-9:
+                break
+
+        if self.recorder is not None:
+            self.recorder.record(self, end)
+
+    def _scan(self):
+        '''
+        Caches the offset and squared distance of every roomba
+        pair along with the heading vectors. Positions and headings
+        do not change between events, so one scan serves both the
+        collision flags and the prediction of the next event.
+        '''
+        self._diff = self.pos[self._pair_j] - self.pos[self._pair_i]
+        self._dist2 = np.einsum('ij,ij->i', self._diff, self._diff)
+        self._cos = np.cos(self.heading)
+        self._sin = np.sin(self.heading)
+
+    def _flag_contacts(self):
+        '''
+        Flags every active roomba that is touching and facing
+        another active roomba.
+        '''
+        config = self.config
+        i = self._pair_i
+        j = self._pair_j
+
+        contact = 2 * config.ROOMBA_RADIUS
+        touching = self._dist2 < contact * contact
+        if not touching.any():
+            return
+
+        active = self.state != config.ROOMBA_STATE_IDLE
+        touching &= active[i] & active[j]
+
+        # facing within pi/2 is equivalent to a positive dot product
+        diff = self._diff
+        toward = self._cos[i] * diff[:, 0] + self._sin[i] * diff[:, 1]
+        away = self._cos[j] * diff[:, 0] + self._sin[j] * diff[:, 1]
+
+        hits = np.concatenate((i[touching & (toward > 0)], j[touching & (away < 0)]))
+        if len(hits):
+            self.hit_front[hits] = True
+            self._flags_pending = True
+
+            if self.event_log.enabled:
+                others = np.concatenate((j[touching & (toward > 0)], i[touching & (away < 0)]))
+                for (a, b) in zip(hits, others):
+                    self.event_log.emit(1000 * self._clock, events.COLLISION,
+                                        self.roombas[a].tag, self.roombas[b].tag)
+
+    def _check_exits(self):
+        '''
+        Cheap rejection in front of ArrayEnvironment._check_exits.
+        '''
+        config = self.config
+        low = -config.ROOMBA_RADIUS
+        high = 20 + config.ROOMBA_RADIUS
+
+        outside = ((self.pos < low) | (self.pos > high)).any(axis=1)
+        if (outside & (self.state != config.ROOMBA_STATE_IDLE)).any():
+            super(EventEnvironment, self)._check_exits()
+
+    def _transition_targets(self, elapsed):
+        '''
+        Runs the state machine (without moving) for every target
+        with an expired timer or a pending collision flag.
+        '''
+        nt = self.num_targets
+        due = self._due <= elapsed
+        if self._flags_pending:
+            due |= self.hit_top[:nt] | self.hit_front[:nt]
+
+        for i in np.flatnonzero(due):
+            self._update_target(i, 0.0, elapsed)
+
+        self._flags_pending = bool(self.hit_front.any() or self.hit_top.any())
+
+    def _motion(self):
+        '''
+        Classifies the motion of every roomba until the next event.
+
+        Returns (active, linear, speed, watched) where:
+
+        - linear marks roombas moving in a straight line with the
+        cached velocity (or standing still with a fixed heading
+        that matters); the others follow arcs or turn after a touch
+        - speed is the linear speed of each roomba
+        - watched marks linear roombas whose front collision flag
+        changes their behavior (a reversing target ignores it)
+        '''
+        config = self.config
+        nt = self.num_targets
+        state = self.state
+
+        active = state != config.ROOMBA_STATE_IDLE
+        reversing = state == config.ROOMBA_STATE_REVERSING
+        touched = state == config.ROOMBA_STATE_TOUCHED
+        reversing[nt:] = False
+        touched[nt:] = False
+
+        # blocked obstacles stand still until the blocker moves
+        stalled = self.hit_front & active
+        stalled[:nt] = False
+
+        linear = active & ~touched
+        linear[:nt] &= state[:nt] != config.ROOMBA_STATE_TURNING_NOISE
+        linear[nt:] = stalled[nt:]
+
+        speed = np.where(active & ~reversing & ~touched & ~stalled,
+                         config.ROOMBA_LINEAR_SPEED, 0.0)
+
+        watched = linear & ~reversing
+
+        return (active, linear, speed, watched)
+
+    def _next_event(self, elapsed):
+        '''
+        Returns the time in seconds from elapsed (milliseconds)
+        until the next event could happen.
+        '''
+        step = np.inf
+
+        # timer expiries (the cached due times sit slightly early)
+        if self.num_targets:
+            step = max(self._due.min() + 2e-6 - elapsed, 0) / 1000.0
+
+        (active, linear, speed, watched) = self._motion()
+
+        if not active.any():
+            return step
+
+        step = min(step, self._next_contact(active, linear, speed, watched))
+        step = min(step, self._next_exit(active, linear, speed))
+
+        return step
+
+    def _next_contact(self, active, linear, speed, watched):
+        '''
+        Time until a pair of roombas starts touching, or until a
+        touching pair separates or changes which roombas face the
+        other one.
+        '''
+        i = self._pair_i
+        j = self._pair_j
+        if len(i) == 0:
+            return np.inf
+
+        diff = self._diff
+        dist2 = self._dist2
+
+        # roombas on arcs stay within speed * t of where they started,
+        # so contact needs |diff + rel * t| <= contact + arc_speed * t
+        # where rel only includes the straight movers
+        velocity = self._velocity * linear[:, np.newaxis]
+        arc_speed = np.where(linear, 0.0, speed)
+
+        rel = velocity[j] - velocity[i]
+        spread = arc_speed[i] + arc_speed[j]
+
+        contact = 2 * self.config.ROOMBA_RADIUS
+        touching = dist2 < contact * contact
+
+        a = np.einsum('ij,ij->i', rel, rel) - spread * spread
+        b = 2 * (np.einsum('ij,ij->i', diff, rel) - contact * spread)
+        c = dist2 - contact * contact
+        disc = b * b - 4 * a * c
+        root = np.sqrt(np.maximum(disc, 0))
+
+        # smallest positive root, written as 2c / (-b + root) which
+        # stays accurate when a is (close to) zero
+        denom = -b + root
+        reaches = ((a < 0) | ((b < 0) & (disc >= 0))) & (denom > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            times = np.where(reaches, 2 * c / denom, np.inf)
+
+        # bounds involving arcs are only estimates, so never step
+        # less than a frame for them
+        times = np.where(spread > 0, np.maximum(times, MIN_CONSERVATIVE_STEP), times)
+        both_linear = linear[i] & linear[j]
+
+        if touching.any():
+            times = np.where(touching, self._contact_change(rel, a, b, root, both_linear, watched),
+                             times)
+
+        times = np.where(active[i] & active[j], times, np.inf)
+        return times.min() + EVENT_EPSILON
+
+    def _contact_change(self, rel, a, b, root, both_linear, watched):
+        '''
+        For touching pairs, time until the pair separates or a
+        watched roomba starts or stops facing the other one.
+
+        Pairs that cannot be solved exactly step at CONTACT_STEP.
+        '''
+        i = self._pair_i
+        j = self._pair_j
+        diff = self._diff
+        c = self._cos
+        s = self._sin
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            separate = np.where(a > 0, (-b + root) / (2 * a), np.inf)
+
+            # facing is the sign of dot(heading vector, offset to the other)
+            flip_i = -((c[i] * diff[:, 0] + s[i] * diff[:, 1])
+                       / (c[i] * rel[:, 0] + s[i] * rel[:, 1]))
+            flip_j = -((c[j] * diff[:, 0] + s[j] * diff[:, 1])
+                       / (c[j] * rel[:, 0] + s[j] * rel[:, 1]))
+
+        flip_i = np.where(watched[i] & (flip_i > 0), flip_i, np.inf)
+        flip_j = np.where(watched[j] & (flip_j > 0), flip_j, np.inf)
+
+        exact = np.minimum(separate, np.minimum(flip_i, flip_j))
+        return np.where(both_linear, exact, CONTACT_STEP)
+
+    def _next_exit(self, active, linear, speed):
+        '''
+        Time until the first roomba leaves the arena.
+        '''
+        config = self.config
+        low = -config.ROOMBA_RADIUS
+        high = 20 + config.ROOMBA_RADIUS
+
+        pos = self.pos
+        velocity = self._velocity
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # exact crossing time along each axis for straight movers
+            exact = np.where(velocity < 0, (low - pos) / velocity,
+                             np.where(velocity > 0, (high - pos) / velocity, np.inf)).min(axis=1)
+
+            margin = np.minimum(pos - low, high - pos).min(axis=1)
+            bound = np.maximum(margin / speed, MIN_CONSERVATIVE_STEP)
+
+        times = np.where(linear, exact, bound)
+        return times[active].min() + EVENT_EPSILON
+
+    def _advance(self, duration):
+        '''
+        Moves every roomba along its closed-form path.
+        '''
+        config = self.config
+        nt = self.num_targets
+
+        if nt:
+            heading = self.heading[:nt]
+            pos = self.pos[:nt]
+            velocity = self._velocity[:nt]
+
+            arc = np.flatnonzero(self.state[:nt] == config.ROOMBA_STATE_TURNING_NOISE)
+
+            if len(arc):
+                (dx, dy) = geometry.arc_displacement(heading[arc],
+                                                     config.ROOMBA_LINEAR_SPEED,
+                                                     self._turn_rate[arc],
+                                                     duration)
+
+                # swap the cached chord velocity for the arc
+                velocity[arc, 0] = dx / duration if duration else 0
+                velocity[arc, 1] = dy / duration if duration else 0
+
+            # straight movers, turns in place and arcs
+            pos += velocity * duration
+            heading += self._turn_rate * duration
+
+            if len(arc):
+                velocity[arc, 0] = config.ROOMBA_LINEAR_SPEED * np.cos(heading[arc])
+                velocity[arc, 1] = config.ROOMBA_LINEAR_SPEED * np.sin(heading[arc])
+
+        if nt == len(self.state):
+            return
+
+        # blocked obstacles wait out the step
+        front = self.hit_front[nt:]
+        moving = (self.state[nt:] == config.ROOMBA_STATE_FORWARD) & ~front
+        front[:] = False
+
+        if moving.all():
+            (self.pos[nt:], self.heading[nt:]) = geometry.orbit_point(
+                self.pos[nt:], (10, 10), config.ROOMBA_LINEAR_SPEED * duration)
+        elif moving.any():
+            (moved, heading) = geometry.orbit_point(self.pos[nt:][moving],
+                                                    (10, 10),
+                                                    config.ROOMBA_LINEAR_SPEED * duration)
+            self.pos[nt:][moving] = moved
+            self.heading[nt:][moving] = heading
@@ -0,0 +1,173 @@
+'''
+noise.py
+
+Seeded random streams used by the environments.
+
+Every environment owns a numpy SeedSequence. It seeds the
+environment Generator and spawns one NoiseStream per target
+roomba, so a roomba's heading noise only depends on the seed
+and on how many noise turns that roomba made (not on the order
+in which roombas happen to draw).
+
+spawn_seeds splits one seed into independent child seeds that
+can be handed to worker processes.
+'''
+
+import numpy as np
+
+import roombasim.config as cfg
+
+# number of heading noise samples drawn per refill
+NOISE_BLOCK_SIZE = 64
+
+# values used to store a PCG64 state in a float64 buffer
+# (state and increment as 4 x 32-bit words each, has_uint32, uinteger)
+GENERATOR_STATE_SIZE = 10
+
+def seed_sequence(seed=None):
+    '''
+    Returns a SeedSequence for seed, which may be None (fresh
+    entropy), an int or an existing SeedSequence.
+    '''
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+def spawn_seeds(seed, count):
+    '''
+    Splits seed into count independent child SeedSequences, for
+    example one per round or per worker process.
+    '''
+    return seed_sequence(seed).spawn(count)
+
+def noise_streams(sequence, count, config=cfg):
+    '''
+    Spawns count NoiseStreams from a SeedSequence, with the
+    ROOMBA_HEADING_NOISE_MAX of config (a config.Config or the
+    config module).
+    '''
+    noise_max = config.ROOMBA_HEADING_NOISE_MAX
+    return [NoiseStream(np.random.default_rng(child), noise_max=noise_max)
+            for child in sequence.spawn(count)]
+
+def write_generator_state(state, buf):
+    '''
+    Writes a PCG64 bit generator state (the dict returned by
+    Generator.bit_generator.state) into the first
+    GENERATOR_STATE_SIZE values of a float64 buffer.
+    '''
+    raw = (state['state']['state'].to_bytes(16, 'little')
+           + state['state']['inc'].to_bytes(16, 'little'))
+    buf[:8] = np.frombuffer(raw, dtype=np.uint32)
+    buf[8] = state['has_uint32']
+    buf[9] = state['uinteger']
+
+def read_generator_state(buf):
+    '''
+    Returns the bit generator state dict stored by
+    write_generator_state.
+    '''
+    raw = buf[:8].astype(np.uint32).tobytes()
+    return {
+        'bit_generator': 'PCG64',
+        'state': {
+            'state': int.from_bytes(raw[:16], 'little'),
+            'inc': int.from_bytes(raw[16:], 'little')
+        },
+        'has_uint32': int(buf[8]),
+        'uinteger': int(buf[9])
+    }
+
+def copy_generator(generator):
+    '''
+    Returns an independent Generator in the same state
+    (much cheaper than copy.deepcopy).
+    '''
+    bit_generator = np.random.PCG64(0)
+    bit_generator.state = generator.bit_generator.state
+    return np.random.Generator(bit_generator)
+
+class NoiseStream(object):
+    '''
+    Heading noise samples for a single roomba.
+
+    Calling the stream returns the next sample, uniform in
+    [-noise_max, noise_max] (by default ROOMBA_HEADING_NOISE_MAX
+    when the stream is made). Samples
+    are drawn from the generator NOISE_BLOCK_SIZE at a time so
+    the per-turn cost is a list index.
+
+    The generator is only needed when a block runs out, so
+    copies (and restored streams) just keep its state and build
+    a Generator on the next refill.
+    '''
+
+    def __init__(self, generator, block_size=NOISE_BLOCK_SIZE, noise_max=None):
+        if noise_max is None:
+            noise_max = cfg.ROOMBA_HEADING_NOISE_MAX
+
+        self.noise_max = noise_max
+        self._generator = generator
+        self._generator_state = None
+        self.block = [0.0] * block_size
+        self.index = block_size
+
+    @property
+    def generator(self):
+        if self._generator is None:
+            bit_generator = np.random.PCG64(0)
+            bit_generator.state = self._generator_state
+            self._generator = np.random.Generator(bit_generator)
+            self._generator_state = None
+        return self._generator
+
+    def _state(self):
+        if self._generator is None:
+            return self._generator_state
+        return self._generator.bit_generator.state
+
+    def __call__(self):
+        if self.index == len(self.block):
+            self.block = self.generator.uniform(-self.noise_max, self.noise_max,
+                                                size=len(self.block)).tolist()
+            self.index = 0
+
+        value = self.block[self.index]
+        self.index += 1
+        return value
+
+    @property
+    def state_size(self):
+        '''
+        Number of values written by write_state.
+        '''
+        return GENERATOR_STATE_SIZE + 1 + len(self.block)
+
+    def write_state(self, buf):
+        '''
+        Writes the generator, the current block and the position
+        in it into buf.
+        '''
+        write_generator_state(self._state(), buf)
+        buf[GENERATOR_STATE_SIZE] = self.index
+        buf[GENERATOR_STATE_SIZE + 1:self.state_size] = self.block
+
+    def read_state(self, buf):
+        '''
+        Inverse of write_state.
+        '''
+        self._generator = None
+        self._generator_state = read_generator_state(buf)
+        self.index = int(buf[GENERATOR_STATE_SIZE])
+        self.block = buf[GENERATOR_STATE_SIZE + 1:self.state_size].tolist()
+
+    def copy(self):
+        '''
+        Returns an independent stream that will produce the same
+        samples as this one.
+        '''
+        other = NoiseStream(None, len(self.block), self.noise_max)
+        other._generator_state = self._state()
+        other.block = list(self.block)
+        other.index = self.index
+        return other
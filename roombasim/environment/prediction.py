@@ -0,0 +1,169 @@
+'''
+prediction.py
+
+Predicts where roombas will be in closed form from their current
+state and timers, without stepping a simulation.
+
+The prediction follows the roomba state machine (see roomba.py)
+in continuous time and assumes that nothing unforeseeable
+happens: future heading noise is taken to be zero (noise turns
+still take ROOMBA_NOISE_DURATION and can delay a reverse, like in
+the simulation) and no new collisions occur. Pending collision
+flags take effect immediately and a noise turn in progress
+finishes with its known angular velocity.
+
+Obstacles circle the arena center at a constant speed.
+'''
+
+import numpy as np
+
+import roombasim.config as cfg
+from roombasim import geometry
+
+# arena center that obstacles circle around
+CENTER = np.array([10.0, 10.0])
+
+def predict_poses(pos, heading, state, is_target,
+                  timer_reverse, timer_noise, timer_touch, noise_velocity,
+                  hit_front, hit_top, elapsed, horizons, config=cfg):
+    '''
+    Predicts the poses of n roombas at k times.
+
+    pos - float[n, 2] current positions
+    heading, state - current headings and ROOMBA_STATE_* values
+    is_target - bool[n], False for obstacle roombas
+    timer_reverse, timer_noise, timer_touch - Roomba timers
+        (milliseconds)
+    noise_velocity - angular velocity of running noise turns
+    hit_front, hit_top - pending collision flags
+    elapsed - time of the current state in milliseconds (the
+        elapsed argument of the next update)
+    horizons - float[k] times ahead in seconds
+    config - the config.Config (or the config module) with the
+        roomba constants
+
+    Returns (pos float[n, k, 2], heading float[n, k]).
+    '''
+    pos = np.array(pos, dtype=np.float64).reshape(-1, 2)
+    heading = np.array(heading, dtype=np.float64).ravel()
+    state = np.array(state, dtype=np.int64).ravel()
+    is_target = np.asarray(is_target, dtype=bool).ravel()
+    horizons = np.atleast_1d(np.asarray(horizons, dtype=np.float64))
+
+    out_pos = np.empty((len(pos), len(horizons), 2))
+    out_heading = np.empty((len(pos), len(horizons)))
+    out_pos[:] = pos[:, np.newaxis, :]
+    out_heading[:] = heading[:, np.newaxis]
+
+    moving = ~is_target & (state == config.ROOMBA_STATE_FORWARD)
+    if moving.any():
+        arc = config.ROOMBA_LINEAR_SPEED * horizons
+        start = np.repeat(pos[moving][:, np.newaxis, :], len(horizons), axis=1)
+        (out_pos[moving], out_heading[moving]) = geometry.orbit_point(start, CENTER, arc)
+
+    if is_target.any():
+        (out_pos[is_target], out_heading[is_target]) = _predict_targets(
+            pos[is_target], heading[is_target], state[is_target],
+            *[np.array(a, dtype=np.float64).ravel()[is_target]
+              for a in (timer_reverse, timer_noise, timer_touch, noise_velocity,
+                        hit_front, hit_top)],
+            times=elapsed + 1000 * horizons, elapsed=elapsed, config=config)
+
+    return (out_pos, out_heading)
+
+def _predict_targets(pos, heading, state, timer_reverse, timer_noise, timer_touch,
+                     noise_velocity, hit_front, hit_top, times, elapsed, config):
+    '''
+    Walks every target through its state machine one segment of
+    constant motion at a time, filling in the times (absolute
+    milliseconds) that fall in each segment.
+    '''
+    speed = config.ROOMBA_LINEAR_SPEED
+    turn_rate = config.ROOMBA_ANGULAR_SPEED
+    reverse_time = np.pi / turn_rate * 1000
+    touch_time = (np.pi / 4) / turn_rate * 1000
+
+    forward = config.ROOMBA_STATE_FORWARD
+    touched = config.ROOMBA_STATE_TOUCHED
+    reversing = config.ROOMBA_STATE_REVERSING
+    noise = config.ROOMBA_STATE_TURNING_NOISE
+
+    out_pos = np.empty((len(pos), len(times), 2))
+    out_heading = np.empty((len(pos), len(times)))
+    out_pos[:] = pos[:, np.newaxis, :]
+    out_heading[:] = heading[:, np.newaxis]
+
+    pos = pos.copy()
+    heading = heading.copy()
+    state = state.copy()
+
+    # pending collisions (a top touch wins over a front bump)
+    top = (hit_top != 0) & np.isin(state, (forward, reversing, noise))
+    front = (hit_front != 0) & ~top & np.isin(state, (forward, touched, noise))
+    state[top] = touched
+    timer_touch = np.where(top, elapsed, timer_touch)
+    state[front] = reversing
+    timer_reverse = np.where(front, elapsed, timer_reverse)
+
+    start = np.full(len(pos), float(elapsed))
+    last = times.max()
+
+    while True:
+        active = (state != config.ROOMBA_STATE_IDLE) & (start <= last)
+        if not active.any():
+            break
+
+        next_reverse = timer_reverse + config.ROOMBA_REVERSE_PERIOD
+        next_noise = timer_noise + config.ROOMBA_HEADING_NOISE_PERIOD
+        reverse_first = next_reverse <= next_noise
+
+        is_forward = state == forward
+        is_noise = state == noise
+        is_turning = (state == reversing) | (state == touched)
+
+        end = np.select(
+            [is_forward, is_noise, state == reversing, state == touched],
+            [np.minimum(next_reverse, next_noise),
+             timer_noise + config.ROOMBA_NOISE_DURATION,
+             timer_reverse + reverse_time,
+             timer_touch + touch_time],
+            np.inf)
+        end = np.maximum(end, start)
+
+        linear = np.where(is_forward | is_noise, speed, 0.0)
+        angular = np.select([is_noise, is_turning], [noise_velocity, -turn_rate], 0.0)
+
+        # times inside this segment
+        inside = (active[:, np.newaxis]
+                  & (times >= start[:, np.newaxis])
+                  & (times < end[:, np.newaxis]))
+        if inside.any():
+            (rows, cols) = np.nonzero(inside)
+            duration = (times[cols] - start[rows]) / 1000
+            (dx, dy) = geometry.arc_displacement(heading[rows], linear[rows],
+                                                 angular[rows], duration)
+            out_pos[rows, cols, 0] = pos[rows, 0] + dx
+            out_pos[rows, cols, 1] = pos[rows, 1] + dy
+            out_heading[rows, cols] = heading[rows] + angular[rows] * duration
+
+        # move to the end of the segment and take the transition
+        done = active & np.isfinite(end)
+        duration = np.where(done, end - start, 0.0) / 1000
+        (dx, dy) = geometry.arc_displacement(heading, linear, angular, duration)
+        pos[:, 0] += dx
+        pos[:, 1] += dy
+        heading += angular * duration
+
+        to_reverse = done & is_forward & reverse_first
+        to_noise = done & is_forward & ~reverse_first
+
+        state[done & ~is_forward] = forward
+        state[to_reverse] = reversing
+        timer_reverse = np.where(to_reverse, end, timer_reverse)
+        state[to_noise] = noise
+        timer_noise = np.where(to_noise, end, timer_noise)
+        noise_velocity = np.where(to_noise, 0.0, noise_velocity)
+
+        start = np.where(done, end, start)
+
+    return (out_pos, out_heading)
@@ -20,14 +20,31 @@ import numpy as np
 import random
 
 import roombasim.config as cfg
+from roombasim.environment import prediction
 
 class Roomba(object):
     '''
     Represents a generic roomba.
     (No update function)
+
+    Roombas are updated several times per frame, so their state
+    is kept in slots rather than an instance dict:
+
+    - hit_front, hit_top : pending collision flags
+    - timer_reverse, timer_noise, timer_touch : time (in
+      milliseconds) the last reverse, noise turn and touch
+      started
     '''
 
-    def __init__(self, pos, heading, tag=None):
+    __slots__ = ('config', 'pos', 'heading', 'tag', 'state',
+                 'hit_front', 'hit_top',
+                 'timer_reverse', 'timer_noise', 'timer_touch',
+                 'turn_target', 'turn_clockwise', 'angular_noise_velocity')
+
+    # number of values returned by get_state
+    STATE_SIZE = 12
+
+    def __init__(self, pos, heading, tag=None, config=None):
         '''
         Initialize a roomba object with a given position and heading.
         By default, the roomba starts in STATE_IDLE.
@@ -35,33 +52,65 @@ class Roomba(object):
         pos - [x,y] in meters
         heading - angle in radians (0 is +x and pi/2 is +y)
         [tag] - an optional identification element
+        [config] - the config.Config to use (by default a copy of
+            the current constants)
         '''
-        self.pos = np.array(pos)
+        if config is None:
+            config = cfg.current()
+
+        self.config = config
+        self.pos = np.array(pos, dtype=np.float64)
         self.heading = heading
         self.tag = tag
 
-        self.collisions = {
-            'front': False,
-            'top': False
-        }
+        self.hit_front = False
+        self.hit_top = False
 
-        self.timers = {
-            'reverse': 0,
-            'noise': 0,
-            'touch': 0
-        }
+        self.timer_reverse = 0
+        self.timer_noise = 0
+        self.timer_touch = 0
 
-        self.state = cfg.ROOMBA_STATE_IDLE
+        self.state = config.ROOMBA_STATE_IDLE
 
         # amount we need to turn
         self.turn_target = 0
         self.turn_clockwise = False
 
+        # angular velocity of the current noise turn (rad/s)
+        self.angular_noise_velocity = 0.0
+
+    @property
+    def collisions(self):
+        '''
+        The pending collision flags as a {'front', 'top'} dict.
+
+        Read-only copy kept for older controllers and sensors; set
+        hit_front and hit_top instead.
+        '''
+        return {
+            'front': self.hit_front,
+            'top': self.hit_top
+        }
+
+    @property
+    def timers(self):
+        '''
+        The timers as a {'reverse', 'noise', 'touch'} dict.
+
+        Read-only copy kept for older controllers and sensors; set
+        timer_reverse, timer_noise and timer_touch instead.
+        '''
+        return {
+            'reverse': self.timer_reverse,
+            'noise': self.timer_noise,
+            'touch': self.timer_touch
+        }
+
     def start(self):
         '''
         Sets the roomba to STATE_FORWARD
         '''
-        self.state = cfg.ROOMBA_STATE_FORWARD
+        self.state = self.config.ROOMBA_STATE_FORWARD
 
     def stop(self):
         '''
@@ -70,7 +119,7 @@ class Roomba(object):
         Note: if the roomba was mid-turn during this call, it will
         not resume after a restart.
         '''
-        self.state = cfg.ROOMBA_STATE_IDLE
+        self.state = self.config.ROOMBA_STATE_IDLE
 
     def update(self, delta, elapsed):
         '''
@@ -78,12 +127,72 @@ class Roomba(object):
         '''
         pass
 
+    def predict(self, elapsed, horizons):
+        '''
+        Predicts the pose of the roomba horizons (float[k], in
+        seconds) after elapsed (the time of the current state in
+        milliseconds), assuming no heading noise and no new
+        collisions. See environment.prediction.
+
+        Returns (pos float[k, 2], heading float[k]).
+        '''
+        (pos, heading) = prediction.predict_poses(
+            [self.pos], [self.heading], [self.state], [isinstance(self, TargetRoomba)],
+            [self.timer_reverse], [self.timer_noise], [self.timer_touch],
+            [self.angular_noise_velocity], [self.hit_front], [self.hit_top],
+            elapsed, horizons, self.config)
+
+        return (pos[0], heading[0])
+
+    def get_state(self):
+        '''
+        Returns the dynamic state of the roomba as a tuple of
+        STATE_SIZE numbers (see set_state).
+        '''
+        return (
+            self.pos[0], self.pos[1], self.heading, self.state,
+            self.hit_front, self.hit_top,
+            self.timer_reverse, self.timer_noise, self.timer_touch,
+            self.turn_target, self.turn_clockwise, self.angular_noise_velocity
+        )
+
+    def set_state(self, values):
+        '''
+        Restores the dynamic state saved by get_state.
+        '''
+        (x, y, heading, state, front, top, reverse, noise, touch,
+         turn_target, turn_clockwise, angular_noise_velocity) = values
+
+        self.pos[0] = x
+        self.pos[1] = y
+        self.heading = heading
+        self.state = int(state)
+        self.hit_front = bool(front)
+        self.hit_top = bool(top)
+        self.timer_reverse = reverse
+        self.timer_noise = noise
+        self.timer_touch = touch
+        self.turn_target = turn_target
+        self.turn_clockwise = bool(turn_clockwise)
+        self.angular_noise_velocity = angular_noise_velocity
+
 
 class TargetRoomba(Roomba):
     '''
     Represents a target roomba.
     '''
 
+    __slots__ = ('noise',)
+
+    def __init__(self, pos, heading, tag=None, noise=None, config=None):
+        '''
+        [noise] - an optional callable returning heading noise
+            samples in radians (see environment.noise.NoiseStream);
+            by default samples come from the random module
+        '''
+        super(TargetRoomba, self).__init__(pos, heading, tag, config)
+        self.noise = noise
+
     def update(self, delta, elapsed):
         '''
         Perform an update step.
@@ -91,65 +200,70 @@ class TargetRoomba(Roomba):
         delta - change in time since last update (seconds)
         elapsed - total time elapsed since start (milliseconds)
         '''
-        if self.state == cfg.ROOMBA_STATE_FORWARD:
-            if self.collisions['top']:
-                self.state = cfg.ROOMBA_STATE_TOUCHED
-                self.collisions['top'] = False
-                self.timers['touch'] = elapsed
-            elif elapsed - self.timers['reverse'] > cfg.ROOMBA_REVERSE_PERIOD:
-                self.state = cfg.ROOMBA_STATE_REVERSING
-                self.timers['reverse'] = elapsed
-            elif elapsed - self.timers['noise'] > cfg.ROOMBA_HEADING_NOISE_PERIOD:
-                self.state = cfg.ROOMBA_STATE_TURNING_NOISE
-                self.angular_noise_velocity = (random.uniform(-cfg.ROOMBA_HEADING_NOISE_MAX,
-                                                              cfg.ROOMBA_HEADING_NOISE_MAX)
-                                             / (cfg.ROOMBA_NOISE_DURATION / 1000.0))
-                self.timers['noise'] = elapsed
-            elif self.collisions['front']:
-                self.collisions['front'] = False
-                self.state = cfg.ROOMBA_STATE_REVERSING
-                self.timers['reverse'] = elapsed
+        config = self.config
+
+        if self.state == config.ROOMBA_STATE_FORWARD:
+            if self.hit_top:
+                self.state = config.ROOMBA_STATE_TOUCHED
+                self.hit_top = False
+                self.timer_touch = elapsed
+            elif elapsed - self.timer_reverse > config.ROOMBA_REVERSE_PERIOD:
+                self.state = config.ROOMBA_STATE_REVERSING
+                self.timer_reverse = elapsed
+            elif elapsed - self.timer_noise > config.ROOMBA_HEADING_NOISE_PERIOD:
+                self.state = config.ROOMBA_STATE_TURNING_NOISE
+                if self.noise is not None:
+                    sample = self.noise()
+                else:
+                    sample = random.uniform(-config.ROOMBA_HEADING_NOISE_MAX,
+                                            config.ROOMBA_HEADING_NOISE_MAX)
+                self.angular_noise_velocity = sample / (config.ROOMBA_NOISE_DURATION / 1000.0)
+                self.timer_noise = elapsed
+            elif self.hit_front:
+                self.hit_front = False
+                self.state = config.ROOMBA_STATE_REVERSING
+                self.timer_reverse = elapsed
             else:
-                self.pos[0] += cfg.ROOMBA_LINEAR_SPEED * np.cos(self.heading) * delta
-                self.pos[1] += cfg.ROOMBA_LINEAR_SPEED * np.sin(self.heading) * delta
-        elif self.state == cfg.ROOMBA_STATE_TOUCHED:
-            self.collisions['top'] = False #TODO: Is this right?
-            turn_time = (np.pi / 4) / cfg.ROOMBA_ANGULAR_SPEED
-            if elapsed - self.timers['touch'] >= turn_time * 1000:
-                self.state = cfg.ROOMBA_STATE_FORWARD
-            elif self.collisions['front']:
-                self.state = cfg.ROOMBA_STATE_REVERSING
-                self.collisions['front'] = False
-                self.timers['reverse'] = elapsed
+                self.pos[0] += config.ROOMBA_LINEAR_SPEED * np.cos(self.heading) * delta
+                self.pos[1] += config.ROOMBA_LINEAR_SPEED * np.sin(self.heading) * delta
+        elif self.state == config.ROOMBA_STATE_TOUCHED:
+            self.hit_top = False #TODO: Is this right?
+            turn_time = (np.pi / 4) / config.ROOMBA_ANGULAR_SPEED
+            if elapsed - self.timer_touch >= turn_time * 1000:
+                self.state = config.ROOMBA_STATE_FORWARD
+            elif self.hit_front:
+                self.state = config.ROOMBA_STATE_REVERSING
+                self.hit_front = False
+                self.timer_reverse = elapsed
             else:
-                self.heading -= cfg.ROOMBA_ANGULAR_SPEED * delta
-        elif self.state == cfg.ROOMBA_STATE_REVERSING:
-            self.collisions['front'] = False #TODO: Is this right?
-            if self.collisions['top']:
-                self.collisions['top'] = False
-                self.state = cfg.ROOMBA_STATE_TOUCHED
-                self.timers['touch'] = elapsed
-            elif elapsed - self.timers['reverse'] >= np.pi / cfg.ROOMBA_ANGULAR_SPEED * 1000:
-                self.state = cfg.ROOMBA_STATE_FORWARD
+                self.heading -= config.ROOMBA_ANGULAR_SPEED * delta
+        elif self.state == config.ROOMBA_STATE_REVERSING:
+            self.hit_front = False #TODO: Is this right?
+            if self.hit_top:
+                self.hit_top = False
+                self.state = config.ROOMBA_STATE_TOUCHED
+                self.timer_touch = elapsed
+            elif elapsed - self.timer_reverse >= np.pi / config.ROOMBA_ANGULAR_SPEED * 1000:
+                self.state = config.ROOMBA_STATE_FORWARD
             else:
-                self.heading -= cfg.ROOMBA_ANGULAR_SPEED * delta
-            self.collisions['front'] = False
-        elif self.state == cfg.ROOMBA_STATE_TURNING_NOISE:
-            if self.collisions['top']:
-                self.collisions['top'] = False
-                self.state = cfg.ROOMBA_STATE_TOUCHED
-                self.timers['touch'] = elapsed
-            elif elapsed - self.timers['noise'] >= cfg.ROOMBA_NOISE_DURATION:
-                self.state = cfg.ROOMBA_STATE_FORWARD
-            elif self.collisions['front']:
-                self.collisions['front'] = False
-                self.state = cfg.ROOMBA_STATE_REVERSING
-                self.timers['reverse'] = elapsed
+                self.heading -= config.ROOMBA_ANGULAR_SPEED * delta
+            self.hit_front = False
+        elif self.state == config.ROOMBA_STATE_TURNING_NOISE:
+            if self.hit_top:
+                self.hit_top = False
+                self.state = config.ROOMBA_STATE_TOUCHED
+                self.timer_touch = elapsed
+            elif elapsed - self.timer_noise >= config.ROOMBA_NOISE_DURATION:
+                self.state = config.ROOMBA_STATE_FORWARD
+            elif self.hit_front:
+                self.hit_front = False
+                self.state = config.ROOMBA_STATE_REVERSING
+                self.timer_reverse = elapsed
             else:
                 self.heading += self.angular_noise_velocity * delta
-                self.pos[0] += cfg.ROOMBA_LINEAR_SPEED * np.cos(self.heading) * delta
-                self.pos[1] += cfg.ROOMBA_LINEAR_SPEED * np.sin(self.heading) * delta
-        elif self.state != cfg.ROOMBA_STATE_IDLE:
+                self.pos[0] += config.ROOMBA_LINEAR_SPEED * np.cos(self.heading) * delta
+                self.pos[1] += config.ROOMBA_LINEAR_SPEED * np.sin(self.heading) * delta
+        elif self.state != config.ROOMBA_STATE_IDLE:
             assert False
 
 class ObstacleRoomba(Roomba):
@@ -157,6 +271,8 @@ class ObstacleRoomba(Roomba):
     Represents an obstacle roomba.
     '''
 
+    __slots__ = ()
+
     def update(self, delta, elapsed):
         '''
         Perform an update step.
@@ -169,12 +285,14 @@ class ObstacleRoomba(Roomba):
         delta - change in time since last update (seconds)
         elapsed - total time elapsed since start (milliseconds)
         '''
-        if self.collisions['front']:
-            self.collisions['front'] = False
-        elif self.state == cfg.ROOMBA_STATE_FORWARD:
-            self.pos[0] += cfg.ROOMBA_LINEAR_SPEED * np.cos(self.heading) * delta
-            self.pos[1] += cfg.ROOMBA_LINEAR_SPEED * np.sin(self.heading) * delta
+        config = self.config
+
+        if self.hit_front:
+            self.hit_front = False
+        elif self.state == config.ROOMBA_STATE_FORWARD:
+            self.pos[0] += config.ROOMBA_LINEAR_SPEED * np.cos(self.heading) * delta
+            self.pos[1] += config.ROOMBA_LINEAR_SPEED * np.sin(self.heading) * delta
 
             # reorient so we tangent to a circle centered at the origin
             ang = np.arctan2(10 - self.pos[1], 10 - self.pos[0])
-            self.heading = ang + (cfg.PI / 2)
+            self.heading = ang + (config.PI / 2)
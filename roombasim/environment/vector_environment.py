@@ -0,0 +1,163 @@
+'''
+vector_environment.py
+
+Contains a VectorEnvironment class that exposes a
+BatchedEnvironment through a gym style reset()/step(actions)
+interface for reinforcement learning.
+
+Observations are written into arrays that are allocated once,
+so a training loop can keep references to them instead of
+rebuilding dicts of roomba and drone state every frame.
+'''
+
+import numpy as np
+
+from roombasim.environment.batched_environment import BatchedEnvironment
+
+# columns of the drone observation
+DRONE_FIELDS = ('x', 'y', 'x_vel', 'y_vel', 'z', 'z_vel', 'yaw', 'yaw_vel')
+
+# columns of an action: the arguments of Drone.control
+ACTION_FIELDS = ('x_accel', 'y_accel', 'yaw_vel', 'z_vel')
+
+class VectorEnvironment(object):
+    '''
+    num_envs rounds, each with a drone, driven by one action
+    per round.
+
+    Observation buffers (rewritten in place by reset and step):
+
+    - roomba_pos : float32[B, n, 2]
+    - roomba_heading : float32[B, n]
+    - roomba_state : int8[B, n] (cfg.ROOMBA_STATE_*)
+    - drone : float32[B, len(DRONE_FIELDS)]
+
+    step returns (observations, rewards, dones, info) where
+    observations is a dict of the buffers above, rewards is the
+    change in score over the step and dones flags the rounds that
+    ended. Finished rounds are reset automatically and their
+    outcome is reported in info. The reward of a finished round
+    stops at its final score: score changes of the new round
+    during the rest of a frame skip are counted in the reward of
+    the next step.
+
+    Like the observations, rewards and dones are buffers that
+    the next step rewrites; copy them to keep them around.
+    '''
+
+    def __init__(self, num_envs, frame_skip=1, delta=1/60., duration=None,
+                 agent_start=None, seed=None, config=None):
+        '''
+        num_envs - number of rounds simulated together
+        frame_skip - physics steps taken per action
+        delta - physics time step in seconds
+        duration - round length in seconds (default MISSION_ROUND_DURATION)
+        agent_start - (pos, yaw, z_pos) drone spawn pose
+            (default: landed in the center of the arena)
+        seed - seed for the rounds (see BatchedEnvironment)
+        config - the config.Config of the rounds (see
+            BatchedEnvironment)
+        '''
+        if agent_start is None:
+            agent_start = ([10, 10], 0, 0)
+
+        self.num_envs = num_envs
+        self.frame_skip = frame_skip
+        self.env = BatchedEnvironment(num_envs, delta, duration, agent_start, seed, config)
+
+        count = self.env.num_targets + self.env.num_obstacles
+
+        self.roomba_pos = np.zeros((num_envs, count, 2), dtype=np.float32)
+        self.roomba_heading = np.zeros((num_envs, count), dtype=np.float32)
+        self.roomba_state = np.zeros((num_envs, count), dtype=np.int8)
+        self.drone = np.zeros((num_envs, len(DRONE_FIELDS)), dtype=np.float32)
+
+        self.observations = {
+            'roomba_pos': self.roomba_pos,
+            'roomba_heading': self.roomba_heading,
+            'roomba_state': self.roomba_state,
+            'drone': self.drone
+        }
+
+        self.rewards = np.zeros(num_envs, dtype=np.float64)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self._last_score = np.zeros(num_envs, dtype=np.int64)
+
+    def reset(self, seed=None):
+        '''
+        Restarts every round and returns the observations.
+        '''
+        self.env.reset(seed)
+        self._last_score[:] = 0
+        return self.observe()
+
+    def observe(self):
+        '''
+        Copies the current state into the observation buffers
+        and returns them.
+        '''
+        env = self.env
+        agent = env.agent
+
+        np.copyto(self.roomba_pos, env.pos, casting='same_kind')
+        np.copyto(self.roomba_heading, env.heading, casting='same_kind')
+        np.copyto(self.roomba_state, env.state)
+
+        drone = self.drone
+        drone[:, 0:2] = agent.xy_pos
+        drone[:, 2:4] = agent.xy_vel
+        drone[:, 4] = agent.z_pos
+        drone[:, 5] = agent.z_vel
+        drone[:, 6] = agent.yaw
+        drone[:, 7] = agent.yaw_vel
+
+        return self.observations
+
+    def step(self, actions):
+        '''
+        Applies one action per round (float[B, len(ACTION_FIELDS)],
+        clamped to the drone limits) and advances frame_skip
+        physics steps.
+
+        Returns (observations, rewards, dones, info). info holds
+        final_good_exits, final_bad_exits and final_score for the
+        rounds flagged in dones. observations, rewards and dones
+        are rewritten in place by the next step.
+        '''
+        env = self.env
+        actions = np.asarray(actions, dtype=np.float64)
+        env.agent.control(actions[:, 0:2], actions[:, 2], actions[:, 3])
+
+        rewards = self.rewards
+        dones = self.dones
+        rewards[:] = 0
+        dones[:] = False
+
+        last_score = self._last_score
+
+        for i in range(self.frame_skip):
+            done = env.step()
+
+            if done.any() or dones.any():
+                # the score of a finished round was reset with it;
+                # rounds that already finished during this frame
+                # skip keep their reward and start again from 0
+                running = ~dones
+                score = np.where(done, env.final_score, env.score)
+                rewards[running] += score[running] - last_score[running]
+                last_score[running] = env.score[running]
+                last_score[done] = 0
+                dones |= done
+            else:
+                rewards += env.score - last_score
+                last_score[:] = env.score
+
+        info = {}
+        if dones.any():
+            info = {
+                'final_good_exits': np.where(dones, env.final_good_exits, 0),
+                'final_bad_exits': np.where(dones, env.final_bad_exits, 0),
+                'final_score': np.where(dones, env.final_score, 0)
+            }
+
+        return (self.observe(), rewards, dones, info)
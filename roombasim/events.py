@@ -0,0 +1,151 @@
+'''
+events.py
+
+A structured log of what happens during a round.
+
+Environments (and the task controller) report events to the
+sink in their event_log attribute instead of printing them.
+The default NullSink is disabled, and the simulation checks
+`event_log.enabled` before assembling an event, so rounds that
+nobody watches pay nothing for logging. To collect events, set
+another sink:
+
+    environment.event_log = RingBufferSink(10000)
+    ... play ...
+    for event in environment.event_log.events():
+        print(event)
+
+Every event is an Event(elapsed, kind, tag, data) tuple where
+elapsed is the round time in milliseconds, kind one of the kinds
+below and tag identifies the roomba (or task) involved.
+'''
+
+from __future__ import print_function
+
+import collections
+import json
+
+Event = collections.namedtuple('Event', ('elapsed', 'kind', 'tag', 'data'))
+
+# a roomba left the arena, data is the reward
+EXIT = 'exit'
+
+# a roomba bumped into the roomba tagged data
+COLLISION = 'collision'
+
+# the agent touched the top of a roomba
+TOP_TOUCH = 'top_touch'
+
+# the agent blocked a roomba
+BLOCK = 'block'
+
+# a target roomba changed state, data is the new state
+STATE = 'state'
+
+# a task completed, tag is the task name and data (status, message)
+TASK = 'task'
+
+# a free-form note (for example from a controller), data is the text
+MESSAGE = 'message'
+
+class NullSink(object):
+    '''
+    Discards every event.
+    '''
+    enabled = False
+
+    def emit(self, elapsed, kind, tag=None, data=None):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+# shared default of every environment
+NULL_SINK = NullSink()
+
+class RingBufferSink(NullSink):
+    '''
+    Keeps the last capacity events in memory.
+    '''
+    enabled = True
+
+    def __init__(self, capacity=10000):
+        self._events = collections.deque(maxlen=capacity)
+
+    def emit(self, elapsed, kind, tag=None, data=None):
+        self._events.append(Event(elapsed, kind, tag, data))
+
+    def events(self, kind=None):
+        '''
+        Returns the buffered events (optionally only one kind),
+        oldest first.
+        '''
+        if kind is None:
+            return list(self._events)
+        return [e for e in self._events if e.kind == kind]
+
+    def clear(self):
+        self._events.clear()
+
+class FileSink(NullSink):
+    '''
+    Writes events to path as JSON lines, buffering buffer_size
+    events in memory between writes. Use as a context manager or
+    call close when done.
+    '''
+    enabled = True
+
+    def __init__(self, path, buffer_size=4096):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._file = open(path, 'w')
+        self._buffer = []
+
+    def emit(self, elapsed, kind, tag=None, data=None):
+        self._buffer.append((elapsed, kind, tag, data))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(''.join(
+                json.dumps({'elapsed': float(elapsed), 'kind': kind, 'tag': tag, 'data': data}) + '\n'
+                for (elapsed, kind, tag, data) in self._buffer))
+            self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PrintSink(NullSink):
+    '''
+    Prints events as they happen (only the given kinds, if any),
+    for interactive runs.
+    '''
+    enabled = True
+
+    def __init__(self, kinds=None):
+        self.kinds = kinds
+
+    def emit(self, elapsed, kind, tag=None, data=None):
+        if self.kinds is not None and kind not in self.kinds:
+            return
+
+        if kind == EXIT:
+            print('roomba left, reward: ' + str(data))
+        elif kind == MESSAGE:
+            print(data)
+        else:
+            print('{:.0f}ms {} {} {}'.format(elapsed, kind, tag, data))
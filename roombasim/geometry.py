@@ -2,15 +2,24 @@
 geometry.py
 
 Utility methods for working in 2D space.
+
+The single shape functions use the math module on plain
+floats, which is much cheaper than building small numpy arrays
+for every call. Each has a *_batch counterpart that takes
+arrays of shapes (points as float[N, 2]) and returns an array
+of results; batch arguments broadcast against each other, so
+many circles can be tested against one square and so on.
 '''
 
+import math
+
 import numpy as np
 
 import roombasim.config as cfg
 
 PI = cfg.PI
 TAU = cfg.TAU
-ROOT2 = np.sqrt(2)
+ROOT2 = math.sqrt(2)
 
 def circle_intersects_circle(a_center, b_center, radius):
     '''
@@ -45,13 +54,10 @@ def circle_intersects_square(c_center, c_radius, s_center, s_heading, s_width):
     '''
     corners = get_square_corners(s_center, s_heading, s_width)
 
-    intersects = False
-    intersects |= circle_intersects_line(c_center, c_radius, corners[0], corners[1])
-    intersects |= circle_intersects_line(c_center, c_radius, corners[1], corners[2])
-    intersects |= circle_intersects_line(c_center, c_radius, corners[2], corners[3])
-    intersects |= circle_intersects_line(c_center, c_radius, corners[3], corners[0])
-    
-    return intersects
+    return (circle_intersects_line(c_center, c_radius, corners[0], corners[1])
+            or circle_intersects_line(c_center, c_radius, corners[1], corners[2])
+            or circle_intersects_line(c_center, c_radius, corners[2], corners[3])
+            or circle_intersects_line(c_center, c_radius, corners[3], corners[0]))
 
 def get_square_corners(center, heading, width):
     '''
@@ -65,20 +71,20 @@ def get_square_corners(center, heading, width):
 
     corners = [
         [
-            center[0] + (np.cos(heading - (PI / 4)) * diagonal),
-            center[1] + (np.sin(heading - (PI / 4)) * diagonal)
+            center[0] + (math.cos(heading - (PI / 4)) * diagonal),
+            center[1] + (math.sin(heading - (PI / 4)) * diagonal)
         ],
         [
-            center[0] + (np.cos(heading - (3 * PI / 4)) * diagonal),
-            center[1] + (np.sin(heading - (3 * PI / 4)) * diagonal)
+            center[0] + (math.cos(heading - (3 * PI / 4)) * diagonal),
+            center[1] + (math.sin(heading - (3 * PI / 4)) * diagonal)
         ],
         [
-            center[0] + (np.cos(heading + (3 * PI / 4)) * diagonal),
-            center[1] + (np.sin(heading + (3 * PI / 4)) * diagonal)
+            center[0] + (math.cos(heading + (3 * PI / 4)) * diagonal),
+            center[1] + (math.sin(heading + (3 * PI / 4)) * diagonal)
         ],
         [
-            center[0] + (np.cos(heading + (PI / 4)) * diagonal),
-            center[1] + (np.sin(heading + (PI / 4)) * diagonal)
+            center[0] + (math.cos(heading + (PI / 4)) * diagonal),
+            center[1] + (math.sin(heading + (PI / 4)) * diagonal)
         ]
     ]
 
@@ -92,35 +98,188 @@ def circle_intersects_line(circle, radius, p0, p1):
     radius - radius of circle
     p0, p1 - endpoints of line
     '''
-    # black magic
-    
-    segment = np.array([p1[0]-p0[0], p1[1]-p0[1]])
-    seg_circ = np.array([circle[0]-p0[0], circle[1]-p0[1]])
+    # project the circle center onto the segment
+    seg_x = p1[0] - p0[0]
+    seg_y = p1[1] - p0[1]
+    circ_x = circle[0] - p0[0]
+    circ_y = circle[1] - p0[1]
 
-    norm_seg = segment / np.linalg.norm(segment)
+    length = math.sqrt(seg_x * seg_x + seg_y * seg_y)
+    norm_x = seg_x / length
+    norm_y = seg_y / length
 
-    dot = np.dot(norm_seg, seg_circ)
-    project = norm_seg * np.dot(norm_seg, seg_circ)
+    dot = norm_x * circ_x + norm_y * circ_y
 
-    if dot < 0 or dot > np.linalg.norm(segment):
+    if dot < 0 or dot > length:
         # projected vector is in the wrong direction
         # or larger than the original segment vector
         return False
 
-    proj_point = project + np.array(p0)
-
-    dist = np.linalg.norm(proj_point - np.array(circle))
+    off_x = norm_x * dot - circ_x
+    off_y = norm_y * dot - circ_y
 
-    return dist < radius
+    return math.sqrt(off_x * off_x + off_y * off_y) < radius
 
 def rotate_vector(vector, theta):
     '''
     Returns the given vector rotated clockwise about the origin
     by theta.
     '''
-    rot_matrix = np.array([
-        [np.cos(theta), -np.sin(theta)],
-        [np.sin(theta), np.cos(theta)]
+    c = math.cos(theta)
+    s = math.sin(theta)
+
+    return np.array([
+        c * vector[0] - s * vector[1],
+        s * vector[0] + c * vector[1]
     ])
 
-    return rot_matrix.dot(vector)
+def circle_intersects_circle_batch(a_centers, b_centers, radius):
+    '''
+    Batched circle_intersects_circle. Returns bool[N].
+
+    a_centers, b_centers - float[N, 2] (or float[2]) centers
+    radius - the radius of each circle
+    '''
+    offset = np.asarray(a_centers, dtype=np.float64) - b_centers
+    dist = offset[..., 0] * offset[..., 0] + offset[..., 1] * offset[..., 1]
+    return dist < (4 * radius * radius)
+
+def compare_angle_batch(a, b):
+    '''
+    Batched compare_angle. Returns float[N].
+
+    a, b - float[N] (or scalar) angles in radians
+    '''
+    return np.abs((((np.asarray(a) - b) + PI) % TAU) - PI)
+
+# corner directions relative to the heading, in get_square_corners order
+SQUARE_CORNER_ANGLES = np.array([-PI / 4, -3 * PI / 4, 3 * PI / 4, PI / 4])
+
+def get_square_corners_batch(centers, headings, width):
+    '''
+    Batched get_square_corners. Returns float[N, 4, 2] with the
+    corners in the same order.
+
+    centers - float[N, 2] square centers
+    headings - float[N] (or scalar) square headings
+    width - width of the sides of the squares
+    '''
+    angles = np.asarray(headings, dtype=np.float64)[..., np.newaxis] + SQUARE_CORNER_ANGLES
+
+    corners = np.empty(angles.shape + (2,))
+    corners[..., 0] = np.cos(angles)
+    corners[..., 1] = np.sin(angles)
+    corners *= width / ROOT2
+    corners += np.asarray(centers, dtype=np.float64)[..., np.newaxis, :]
+
+    return corners
+
+def circle_intersects_line_batch(circles, radius, p0, p1):
+    '''
+    Batched circle_intersects_line. Returns bool[N].
+
+    circles - float[N, 2] circle centers
+    radius - radius of the circles
+    p0, p1 - float[N, 2] (or float[2]) endpoints of the lines
+    '''
+    p0 = np.asarray(p0, dtype=np.float64)
+    segment = np.asarray(p1, dtype=np.float64) - p0
+    seg_circ = np.asarray(circles, dtype=np.float64) - p0
+
+    length = np.hypot(segment[..., 0], segment[..., 1])
+    norm_x = segment[..., 0] / length
+    norm_y = segment[..., 1] / length
+
+    dot = norm_x * seg_circ[..., 0] + norm_y * seg_circ[..., 1]
+
+    off_x = norm_x * dot - seg_circ[..., 0]
+    off_y = norm_y * dot - seg_circ[..., 1]
+
+    return ((dot >= 0) & (dot <= length)
+            & (np.sqrt(off_x * off_x + off_y * off_y) < radius))
+
+def circle_intersects_square_batch(c_centers, c_radius, s_centers, s_headings, s_width):
+    '''
+    Batched circle_intersects_square. Returns bool[N].
+
+    c_centers - float[N, 2] (or float[2]) circle centers
+    c_radius - radius of the circles
+
+    s_centers - float[N, 2] (or float[2]) square centers
+    s_headings - float[N] (or scalar) square headings
+    s_width - width of the sides of the squares
+    '''
+    corners = get_square_corners_batch(s_centers, s_headings, s_width)
+    following = np.roll(corners, -1, axis=-2)
+
+    hits = circle_intersects_line_batch(
+        np.asarray(c_centers, dtype=np.float64)[..., np.newaxis, :],
+        c_radius, corners, following)
+
+    return hits.any(axis=-1)
+
+def rotate_vector_batch(vectors, theta):
+    '''
+    Batched rotate_vector. Returns float[N, 2].
+
+    vectors - float[N, 2] vectors
+    theta - float[N] (or scalar) angles
+    '''
+    vectors = np.asarray(vectors, dtype=np.float64)
+    c = np.cos(theta)
+    s = np.sin(theta)
+
+    rotated = np.empty(np.broadcast(vectors, np.asarray(c)[..., np.newaxis]).shape)
+    rotated[..., 0] = c * vectors[..., 0] - s * vectors[..., 1]
+    rotated[..., 1] = s * vectors[..., 0] + c * vectors[..., 1]
+    return rotated
+
+def arc_displacement(heading, speed, turn_rate, duration):
+    '''
+    Returns the (dx, dy) travelled by a body that drives at a
+    constant speed while its heading changes at a constant rate.
+
+    Works elementwise on arrays. A turn rate of zero gives a
+    straight line.
+
+    heading - initial heading in radians
+    speed - linear speed
+    turn_rate - angular velocity in radians per unit time
+    duration - length of the motion
+    '''
+    heading = np.asarray(heading, dtype=np.float64)
+    turn_rate = np.asarray(turn_rate, dtype=np.float64)
+    turn = turn_rate * duration
+
+    straight = np.abs(turn) < 1e-9
+    safe_rate = np.where(straight, 1.0, turn_rate)
+
+    end = heading + turn
+    dx = np.where(straight,
+                  speed * duration * np.cos(heading),
+                  speed * (np.sin(end) - np.sin(heading)) / safe_rate)
+    dy = np.where(straight,
+                  speed * duration * np.sin(heading),
+                  speed * (np.cos(heading) - np.cos(end)) / safe_rate)
+
+    return (dx, dy)
+
+def orbit_point(pos, center, arc_length):
+    '''
+    Moves points clockwise along the circle centered at center
+    that passes through each point. Returns the new positions
+    and the clockwise tangent heading at each one.
+
+    pos - float[..., 2] points
+    center - the shared circle center
+    arc_length - distance travelled along the circle
+    '''
+    offset = np.asarray(pos, dtype=np.float64) - center
+    radius = np.hypot(offset[..., 0], offset[..., 1])
+    angle = np.arctan2(offset[..., 1], offset[..., 0]) - arc_length / radius
+
+    moved = np.empty_like(offset)
+    moved[..., 0] = center[0] + radius * np.cos(angle)
+    moved[..., 1] = center[1] + radius * np.sin(angle)
+
+    return (moved, angle - (PI / 2))
@@ -3,6 +3,19 @@ roombasim.graphics
 ==================
 
 Contains decoupled vizualisation tools.
+
+The scene description and the software renderer only need
+numpy; the Display window needs pyglet and an OpenGL display and
+is only imported when it is first used.
 '''
 
-from .display import Display
+from .scene import draw_environment
+from .raster import RasterCanvas, FrameWriter, write_png
+
+def __getattr__(name):
+    # the Display window is imported on first use so that headless
+    # users of the package never load pyglet or OpenGL
+    if name in ('Display', 'BatchCanvas'):
+        from . import display
+        return getattr(display, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -5,8 +5,8 @@ Contains a Display class which can be used to visualize
 a mission round.
 
 The graphics are entirely decoupled from the simulation
-engine and this file contains all the implementations
-of the drawing methods.
+engine. What a frame contains is described in scene.py;
+this file draws it into a window.
 
 Graphics are drawn to the screen using pyglet as an
 OpenGL interface. This should provide realtime-capable
@@ -17,12 +17,22 @@ from pyglet.gl import *
 import numpy as np
 import time
 
-import roombasim.config as cfg
 
 from roombasim.environment import roomba
-from roombasim import geometry
+from roombasim.graphics import scene
 
 class Display(pyglet.window.Window):
+    '''
+    A window that draws an environment at 60 fps.
+
+    The environment is advanced in fixed steps of
+    GRAPHICS_SIM_DELTA seconds, as many per rendered frame as
+    the timescale asks for (at most GRAPHICS_MAX_SUBSTEPS, both
+    read from the config of the environment), so
+    a round plays out exactly like it does in the nographics
+    runner at any timescale. Roombas are drawn interpolated
+    between the last two steps to keep slow timescales smooth.
+    '''
 
     def __init__(self, environment, timescale=1.0, self_update=True):
         super(Display, self).__init__(700,700)
@@ -33,12 +43,22 @@ class Display(pyglet.window.Window):
         self._paused = False
         self._elapsed = 0.0
 
+        self._delta = environment.config.GRAPHICS_SIM_DELTA
+        self._max_substeps = environment.config.GRAPHICS_MAX_SUBSTEPS
+        self._steps = 0
+        self._accumulator = 0.0
+        self._previous_poses = None
+
         if self_update:
-            pyglet.clock.schedule_interval(self._update, 1.0/self._timescale/60.0)
-            pyglet.clock.set_fps_limit(self._timescale*60)
+            pyglet.clock.schedule_interval(self._update, 1.0/60.0)
+            pyglet.clock.set_fps_limit(60)
 
         self.environment = environment
         self.start_time = time.time()
+        self.canvas = BatchCanvas()
+
+        # the gridlines never change, so their vertex list is kept
+        self._gridlines = None
 
     def set_click_callback(self, callback):
         self._click_callback = callback
@@ -46,11 +66,38 @@ class Display(pyglet.window.Window):
     def set_update_func(self, update_func):
         self.update_func = update_func
 
+    def seek(self, elapsed):
+        '''
+        Moves the round clock to elapsed milliseconds, for
+        environments that jump in time (see
+        recording.ReplayEnvironment).
+        '''
+        self._steps = int(round(elapsed / 1000.0 / self._delta))
+        self._elapsed = elapsed
+        self._accumulator = 0.0
+        self._previous_poses = None
+
     def _update(self, dt):
-        if not self._paused:
-            dt *= self._timescale
-            self._elapsed += dt * 1000
-            self.update_func(dt, self._elapsed)
+        if self._paused:
+            return
+
+        self._accumulator += dt * self._timescale
+        substeps = int(self._accumulator / self._delta)
+        if substeps > self._max_substeps:
+            # can't keep up, drop the time that doesn't fit in this frame
+            substeps = self._max_substeps
+            self._accumulator = substeps * self._delta
+
+        for i in range(substeps):
+            if i == substeps - 1:
+                self._previous_poses = scene.roomba_poses(self.environment)
+
+            # same elapsed times as runner.play_round
+            self._elapsed = 1000 * (self._steps * self._delta)
+            self.update_func(self._delta, self._elapsed)
+
+            self._steps += 1
+            self._accumulator -= self._delta
 
     def on_resize(self, width, height):
         glViewport(10, 10, width-20, height-20)
@@ -65,32 +112,34 @@ class Display(pyglet.window.Window):
         pyglet.clock.tick()
         glClear(GL_COLOR_BUFFER_BIT)
 
-        Display._draw_gridlines()
+        glEnable(GL_BLEND)
+        glEnable(GL_LINE_SMOOTH)
+        glHint(GL_LINE_SMOOTH_HINT,GL_NICEST)
 
         self._draw_header(self.environment.good_exits,
                           self.environment.bad_exits,
                           self.environment.score,
                           int(self._elapsed / 1000))
 
-        for r in self.environment.roombas:
-            if isinstance(r, roomba.TargetRoomba):
-                if self.environment.target_roomba == r.tag:
-                    Display._draw_target_roomba(r,
-                                                self.environment.target_type)
-                else:
-                    Display._draw_target_roomba(r)
-            else:
-                Display._draw_obstacle_roomba(r)
+        if self._gridlines is None:
+            scene.draw_gridlines(self.canvas)
+            self._gridlines = self.canvas.vertex_list()
+        self._gridlines.draw(GL_LINES)
+
+        poses = None
+        if self._previous_poses is not None:
+            alpha = min(max(self._accumulator / self._delta, 0.0), 1.0)
+            poses = scene.interpolate_poses(self.environment, self._previous_poses, alpha)
 
-        if self.environment.agent is not None:
-            Display._draw_drone(self.environment.agent)
+        scene.draw_environment(self.canvas, self.environment, gridlines=False, poses=poses)
+        self.canvas.flush()
 
     def on_mouse_release(self, x, y, button, modifiers):
         x = (x - 10) * 20.0 / (self.get_size()[0] - 20.0)
         y = (y - 10) * 20.0 / (self.get_size()[1] - 20.0)
         for r in self.environment.roombas:
             if isinstance(r, roomba.TargetRoomba):
-                if np.hypot(x - r.pos[0], y - r.pos[1]) < cfg.ROOMBA_RADIUS:
+                if np.hypot(x - r.pos[0], y - r.pos[1]) < r.config.ROOMBA_RADIUS:
                     self._click_callback(r,
                                          'left'
                                          if button == pyglet.window.mouse.LEFT
@@ -106,71 +155,6 @@ class Display(pyglet.window.Window):
         if symbol == pyglet.window.key.SPACE:
             self._paused = not self._paused
 
-    @staticmethod
-    def _draw_target_roomba(r, special_state=None):
-        pos = r.pos
-        heading = r.heading
-        vertex_count = cfg.GRAPHICS_CIRCLE_VERTICES
-        radius = cfg.ROOMBA_RADIUS
-
-        glEnable(GL_BLEND)
-        glEnable(GL_LINE_SMOOTH)
-        glHint(GL_LINE_SMOOTH_HINT,GL_NICEST)
-
-        # Outline
-        if special_state == 'hitting':
-            glColor3f(0.7, 0.7, 1.0)
-        elif special_state == 'blocking':
-            glColor3f(0.7, 1.0, 0.7)
-        elif r.state == cfg.ROOMBA_STATE_FORWARD:
-            glColor3f(1,1,1)
-        elif r.state in (cfg.ROOMBA_STATE_TURNING_NOISE,
-                         cfg.ROOMBA_STATE_REVERSING,
-                         cfg.ROOMBA_STATE_TOUCHED):
-            glColor3f(1,0.8,0.8)
-
-        Display._draw_hollow_circle(pos, radius)
-
-        # Direction indicator
-        glBegin(GL_LINES)
-
-        glVertex2f(pos[0], pos[1])
-        glVertex2f(np.cos(heading) * radius + pos[0], np.sin(heading) * radius + pos[1])
-
-        glEnd()
-
-    @staticmethod
-    def _draw_obstacle_roomba(r):
-        pos = r.pos
-        heading = r.heading
-        vertex_count = cfg.GRAPHICS_CIRCLE_VERTICES
-        radius = cfg.ROOMBA_RADIUS
-
-        glEnable(GL_BLEND)
-        glEnable(GL_LINE_SMOOTH)
-        glHint(GL_LINE_SMOOTH_HINT,GL_NICEST)
-
-        # Outline
-        if r.state == cfg.ROOMBA_STATE_FORWARD or True:
-            glColor3f(1,0.2,0.2)
-        elif r.state == cfg.ROOMBA_STATE_TURNING:
-            glColor3f(1,0.8,0.8)
-
-        Display._draw_hollow_circle(pos, radius)
-
-        # Direction indicator
-        glBegin(GL_LINES)
-
-        glVertex2f(pos[0], pos[1])
-        glVertex2f(np.cos(heading) * radius + pos[0], np.sin(heading) * radius + pos[1])
-
-        glEnd()
-
-    @staticmethod
-    def _draw_drone(drone):
-        if cfg.RENDER_AGENT != None:
-            cfg.RENDER_AGENT(drone)
-
     def _draw_header(self, good, bad, score, elapsed_secs):
         mins = elapsed_secs // 60
         secs = elapsed_secs % 60
@@ -182,79 +166,55 @@ class Display(pyglet.window.Window):
                 bad,
                 score))
 
-    @staticmethod
-    def _draw_gridlines():
-
-        # draw horizontal lines
-        for y in range(0,21):
-            if y % 5 == 0:
-                glColor3f(0.5,0.5,0.5)
-            else:
-                glColor3f(0.25,0.25,0.25)
-
-            glBegin(GL_LINES)
-            glVertex2f(0,y)
-            glVertex2f(20,y)
-            glEnd()
-
-        # draw vertical lines
-        for x in range(1,20):
-            if x % 5 == 0:
-                glColor3f(0.5,0.5,0.5)
-            else:
-                glColor3f(0.25,0.25,0.25)
-
-            glBegin(GL_LINES)
-            glVertex2f(x,0)
-            glVertex2f(x,20)
-            glEnd()
-
-        glColor3f(0.5, 0.0, 0.0)
-        glBegin(GL_LINES)
-        glVertex2f(0, 0)
-        glVertex2f(0, 20)
-        glEnd()
-
-        glColor3f(0.0, 0.5, 0.0)
-        glBegin(GL_LINES)
-        glVertex2f(20, 0)
-        glVertex2f(20, 20)
-        glEnd()
-
-    @staticmethod
-    def _draw_hollow_circle(pos, radius):
-        glBegin(GL_LINE_LOOP)
-
-        for i in range(cfg.GRAPHICS_CIRCLE_VERTICES):
-            theta = (2 * np.pi * i) / cfg.GRAPHICS_CIRCLE_VERTICES
-            glVertex2f(
-                (np.cos(theta) * radius + pos[0]),
-                (np.sin(theta) * radius + pos[1])
-            )
-
-        glEnd()
-
-    @staticmethod
-    def _draw_hollow_square(pos, heading, diagonal):
-        glBegin(GL_LINE_LOOP)
-        # front right
-        glVertex2f(
-            pos[0] + (np.cos(heading - (cfg.PI / 4)) * diagonal),
-            pos[1] + (np.sin(heading - (cfg.PI / 4)) * diagonal)
-        )
-        # back right
-        glVertex2f(
-            pos[0] + (np.cos(heading - (3 * cfg.PI / 4)) * diagonal),
-            pos[1] + (np.sin(heading - (3 * cfg.PI / 4)) * diagonal)
-        )
-        # back left
-        glVertex2f(
-            pos[0] + (np.cos(heading + (3 * cfg.PI / 4)) * diagonal),
-            pos[1] + (np.sin(heading + (3 * cfg.PI / 4)) * diagonal)
-        )
-        # front left
-        glVertex2f(
-            pos[0] + (np.cos(heading + (cfg.PI / 4)) * diagonal),
-            pos[1] + (np.sin(heading + (cfg.PI / 4)) * diagonal)
-        )
-        glEnd()
+class BatchCanvas(object):
+    '''
+    Scene canvas (see scene.py) that collects line segments in
+    flat vertex and color lists and hands them to OpenGL as one
+    vertex list, instead of a glBegin/glEnd pair per primitive.
+    '''
+
+    # old style RENDER_AGENT hooks may draw with OpenGL directly
+    direct_gl = True
+
+    def __init__(self):
+        self._color = (1.0, 1.0, 1.0, 1.0)
+        self._vertices = []
+        self._colors = []
+
+    def set_color(self, r, g, b, a=1.0):
+        self._color = (r, g, b, a)
+
+    def line(self, p0, p1):
+        self._vertices.extend((p0[0], p0[1], p1[0], p1[1]))
+        self._colors.extend(self._color * 2)
+
+    def line_loop(self, points):
+        count = len(points)
+        for i in range(count):
+            p0 = points[i - 1]
+            p1 = points[i]
+            self._vertices.extend((p0[0], p0[1], p1[0], p1[1]))
+        self._colors.extend(self._color * (2 * count))
+
+    def vertex_list(self):
+        '''
+        Moves everything drawn so far into a new GL_LINES vertex
+        list (the caller draws it and deletes it when done).
+        '''
+        vertices = pyglet.graphics.vertex_list(len(self._vertices) // 2,
+                                               ('v2f', self._vertices),
+                                               ('c4f', self._colors))
+        self._vertices = []
+        self._colors = []
+        return vertices
+
+    def flush(self):
+        '''
+        Draws and discards everything drawn so far.
+        '''
+        if not self._vertices:
+            return
+
+        vertices = self.vertex_list()
+        vertices.draw(GL_LINES)
+        vertices.delete()
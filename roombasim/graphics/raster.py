@@ -0,0 +1,217 @@
+'''
+raster.py
+
+A software renderer that draws the scene (see scene.py) into
+numpy RGB images, without a window or an OpenGL context, so
+rounds can be rendered on headless machines.
+
+RasterCanvas collects the line segments of a frame and
+rasterizes them all at once with array operations. The arena
+gridlines never change, so they are drawn once and reused as
+the background of every frame.
+
+FrameWriter stores the frames either as a numbered PNG
+sequence (pure python, no extra dependencies) or, for video
+file names, by piping raw frames into ffmpeg.
+'''
+import os
+import struct
+import subprocess
+import zlib
+
+import numpy as np
+
+from roombasim.graphics import scene
+
+# extensions that FrameWriter encodes with ffmpeg
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.webm', '.mov')
+
+class RasterCanvas(object):
+    '''
+    Scene canvas that draws into image, a uint8[height, width, 3]
+    array. The arena is mapped like the Display window: a square
+    20m area inset by a small margin, with y pointing up.
+    '''
+
+    def __init__(self, width=700, height=None, line_width=None, background=(0, 0, 0)):
+        '''
+        width, height - image size in pixels (height defaults to width)
+        line_width - line thickness in pixels (default scales with width)
+        background - RGB color in [0, 1]
+        '''
+        if height is None:
+            height = width
+        if line_width is None:
+            line_width = max(1, int(round(width / 700.0)))
+
+        self.width = width
+        self.height = height
+        self.line_width = line_width
+
+        # same 10px inset as Display, scaled with the image
+        margin_x = 10.0 * width / 700
+        margin_y = 10.0 * height / 700
+        self._offset = np.array([margin_x, height - 1 - margin_y])
+        self._scale = np.array([(width - 2 * margin_x) / 20.0,
+                                -(height - 2 * margin_y) / 20.0])
+
+        self.image = np.empty((height, width, 3), dtype=np.uint8)
+        self.image[:] = np.round(np.array(background) * 255).astype(np.uint8)
+        self._background = None
+
+        self._color = (1.0, 1.0, 1.0, 1.0)
+        self._segments = []
+        self._colors = []
+
+    def set_color(self, r, g, b, a=1.0):
+        self._color = (r, g, b, a)
+
+    def line(self, p0, p1):
+        self._segments.append((p0[0], p0[1], p1[0], p1[1]))
+        self._colors.append(self._color)
+
+    def line_loop(self, points):
+        for i in range(len(points)):
+            self.line(points[i - 1], points[i])
+
+    def flush(self):
+        '''
+        Rasterizes every segment drawn since the last flush.
+        '''
+        if not self._segments:
+            return
+
+        segments = np.array(self._segments, dtype=np.float64).reshape(-1, 2, 2)
+        colors = np.array(self._colors, dtype=np.float64)
+        self._segments = []
+        self._colors = []
+
+        # endpoints in pixels
+        segments = segments * self._scale + self._offset
+        start = segments[:, 0]
+        span = segments[:, 1] - start
+
+        # one sample per pixel along the longer axis
+        counts = np.ceil(np.abs(span).max(axis=1)).astype(np.int64) + 1
+        owner = np.repeat(np.arange(len(counts)), counts)
+        first = np.cumsum(counts) - counts
+        t = (np.arange(counts.sum()) - first[owner]) / np.maximum(counts - 1, 1)[owner]
+
+        points = np.round(start[owner] + t[:, np.newaxis] * span[owner]).astype(np.int64)
+        rgb = colors[owner, :3] * 255
+        alpha = colors[owner, 3:]
+
+        low = -(self.line_width // 2)
+        for dx in range(low, low + self.line_width):
+            for dy in range(low, low + self.line_width):
+                x = points[:, 0] + dx
+                y = points[:, 1] + dy
+                inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+
+                (px, py) = (x[inside], y[inside])
+                a = alpha[inside]
+                blended = self.image[py, px] * (1 - a) + rgb[inside] * a
+                self.image[py, px] = np.round(blended).astype(np.uint8)
+
+    def render(self, environment):
+        '''
+        Draws a full frame of environment and returns the image
+        (the same array is reused by the next call).
+        '''
+        if self._background is None:
+            scene.draw_gridlines(self)
+            self.flush()
+            self._background = self.image.copy()
+
+        self.image[:] = self._background
+        scene.draw_environment(self, environment, gridlines=False)
+        self.flush()
+
+        return self.image
+
+def write_png(path, image, level=1):
+    '''
+    Writes a uint8[height, width, 3] image as an RGB PNG.
+    '''
+    (height, width) = image.shape[:2]
+
+    # every row starts with filter type 0 (none)
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), level)))
+        f.write(chunk(b'IEND', b''))
+
+class FrameWriter(object):
+    '''
+    Writes a stream of frames to path, which is either a video
+    file (encoded by ffmpeg, see VIDEO_EXTENSIONS) or a PNG file
+    name pattern with a format field for the frame number, for
+    example 'frames/frame_{:05d}.png' (a ValueError is raised if
+    an image path has no positional format field, since every frame would
+    overwrite the last).
+
+    Use as a context manager or call close when done.
+    '''
+
+    def __init__(self, path, fps=60):
+        self.path = path
+        self.fps = fps
+        self.frames = 0
+        self._ffmpeg = None
+
+        if os.path.splitext(path)[1].lower() not in VIDEO_EXTENSIONS:
+            try:
+                numbered = path.format(0) != path.format(1)
+            except (KeyError, IndexError):
+                # named or out of range fields
+                numbered = False
+            if not numbered:
+                raise ValueError('{} needs a positional format field for the frame number '
+                                 '(for example frame_{{:05d}}.png)'.format(path))
+
+            directory = os.path.dirname(path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+
+    def write(self, image):
+        if os.path.splitext(self.path)[1].lower() in VIDEO_EXTENSIONS:
+            if self._ffmpeg is None:
+                self._ffmpeg = self._open_ffmpeg(image.shape[1], image.shape[0])
+            self._ffmpeg.stdin.write(image.tobytes())
+        else:
+            write_png(self.path.format(self.frames), image)
+
+        self.frames += 1
+
+    def _open_ffmpeg(self, width, height):
+        command = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-s', '{}x{}'.format(width, height), '-r', str(self.fps),
+            '-i', '-', '-pix_fmt', 'yuv420p', self.path
+        ]
+        try:
+            return subprocess.Popen(command, stdin=subprocess.PIPE)
+        except OSError:
+            raise RuntimeError('ffmpeg is needed to write {} (write a PNG '
+                               'sequence such as frame_{{:05d}}.png instead)'.format(self.path))
+
+    def close(self):
+        if self._ffmpeg is not None:
+            self._ffmpeg.stdin.close()
+            self._ffmpeg.wait()
+            self._ffmpeg = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
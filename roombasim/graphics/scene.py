@@ -0,0 +1,223 @@
+'''
+scene.py
+
+Describes what a frame of a mission round looks like in terms
+of a few drawing primitives, independently of how they end up
+on screen.
+
+A canvas is any object with the following methods (coordinates
+are arena meters):
+
+- set_color(r, g, b, a=1.0) : color of the following primitives
+- line(p0, p1) : a line segment
+- line_loop(points) : a closed polyline
+
+Display draws the scene with OpenGL (display.BatchCanvas) and
+raster.RasterCanvas draws it into a numpy image without any
+window or GL context. Canvases that draw with OpenGL set
+direct_gl = True and also have:
+
+- flush() : draws everything collected so far
+
+Sizes and states are read from the config.Config of the roomba
+or drone being drawn, so a round is drawn with the geometry it
+was played with.
+'''
+import inspect
+import math
+import warnings
+
+import roombasim.config as cfg
+
+from roombasim.environment import roomba
+from roombasim import geometry
+
+# unit circle vertices, keyed by vertex count
+_circles = {}
+
+def circle_points(pos, radius, config=cfg):
+    '''
+    Returns the config.GRAPHICS_CIRCLE_VERTICES vertices of a
+    circle.
+    '''
+    count = config.GRAPHICS_CIRCLE_VERTICES
+    unit = _circles.get(count)
+    if unit is None:
+        unit = _circles[count] = [
+            (math.cos((2 * math.pi * i) / count), math.sin((2 * math.pi * i) / count))
+            for i in range(count)
+        ]
+
+    return [(c * radius + pos[0], s * radius + pos[1]) for (c, s) in unit]
+
+def draw_hollow_circle(canvas, pos, radius, config=cfg):
+    canvas.line_loop(circle_points(pos, radius, config))
+
+def draw_hollow_square(canvas, pos, heading, diagonal):
+    # corners in front right, back right, back left, front left order
+    canvas.line_loop(geometry.get_square_corners(pos, heading, diagonal * geometry.ROOT2))
+
+def draw_heading(canvas, pos, heading, length):
+    '''
+    Draws a direction indicator of the given length.
+    '''
+    canvas.line(pos, (math.cos(heading) * length + pos[0],
+                      math.sin(heading) * length + pos[1]))
+
+def draw_gridlines(canvas):
+    # draw horizontal lines
+    for y in range(0,21):
+        if y % 5 == 0:
+            canvas.set_color(0.5,0.5,0.5)
+        else:
+            canvas.set_color(0.25,0.25,0.25)
+
+        canvas.line((0, y), (20, y))
+
+    # draw vertical lines
+    for x in range(1,20):
+        if x % 5 == 0:
+            canvas.set_color(0.5,0.5,0.5)
+        else:
+            canvas.set_color(0.25,0.25,0.25)
+
+        canvas.line((x, 0), (x, 20))
+
+    canvas.set_color(0.5, 0.0, 0.0)
+    canvas.line((0, 0), (0, 20))
+
+    canvas.set_color(0.0, 0.5, 0.0)
+    canvas.line((20, 0), (20, 20))
+
+def draw_target_roomba(canvas, r, special_state=None, pose=None):
+    config = r.config
+
+    # Outline
+    if special_state == 'hitting':
+        canvas.set_color(0.7, 0.7, 1.0)
+    elif special_state == 'blocking':
+        canvas.set_color(0.7, 1.0, 0.7)
+    elif r.state == config.ROOMBA_STATE_FORWARD:
+        canvas.set_color(1,1,1)
+    elif r.state in (config.ROOMBA_STATE_TURNING_NOISE,
+                     config.ROOMBA_STATE_REVERSING,
+                     config.ROOMBA_STATE_TOUCHED):
+        canvas.set_color(1,0.8,0.8)
+
+    (pos, heading) = pose or (r.pos, r.heading)
+    draw_hollow_circle(canvas, pos, config.ROOMBA_RADIUS, config)
+    draw_heading(canvas, pos, heading, config.ROOMBA_RADIUS)
+
+def draw_obstacle_roomba(canvas, r, pose=None):
+    config = r.config
+    canvas.set_color(1,0.2,0.2)
+
+    (pos, heading) = pose or (r.pos, r.heading)
+    draw_hollow_circle(canvas, pos, config.ROOMBA_RADIUS, config)
+    draw_heading(canvas, pos, heading, config.ROOMBA_RADIUS)
+
+def roomba_poses(environment):
+    '''
+    Returns a copy of the (pos, heading) of every roomba, keyed
+    by roomba, to pass to interpolate_poses later.
+    '''
+    return dict((r, ((r.pos[0], r.pos[1]), r.heading)) for r in environment.roombas)
+
+def interpolate_poses(environment, previous, alpha):
+    '''
+    Blends the roomba poses saved by roomba_poses with the
+    current ones: alpha = 0 gives the saved poses and alpha = 1
+    the current ones. Headings take the shorter way around.
+    '''
+    poses = {}
+    for r in environment.roombas:
+        if r not in previous:
+            continue
+
+        ((x, y), heading) = previous[r]
+        turn = (r.heading - heading + math.pi) % (2 * math.pi) - math.pi
+        poses[r] = ((x + (r.pos[0] - x) * alpha, y + (r.pos[1] - y) * alpha),
+                    heading + turn * alpha)
+
+    return poses
+
+def draw_roombas(canvas, environment, poses=None):
+    '''
+    poses optionally overrides where roombas are drawn (see
+    interpolate_poses).
+    '''
+    poses = poses or {}
+    for r in environment.roombas:
+        if isinstance(r, roomba.TargetRoomba):
+            if environment.target_roomba == r.tag:
+                draw_target_roomba(canvas, r, environment.target_type, poses.get(r))
+            else:
+                draw_target_roomba(canvas, r, pose=poses.get(r))
+        else:
+            draw_obstacle_roomba(canvas, r, poses.get(r))
+
+# RENDER_AGENT hook -> True if it is an old style render(agent) hook
+_legacy_hooks = {}
+
+def _is_legacy_hook(render):
+    '''
+    Returns True if render cannot be called as render(agent,
+    canvas), i.e. it is a RENDER_AGENT hook written for the
+    one-argument render(agent) form that draws with OpenGL calls.
+    '''
+    legacy = _legacy_hooks.get(render)
+    if legacy is None:
+        try:
+            signature = inspect.signature(render)
+        except AttributeError:
+            # python 2
+            spec = inspect.getargspec(render)
+            positional = len(spec.args) - (1 if inspect.ismethod(render) else 0)
+            legacy = spec.varargs is None and positional < 2
+        except (TypeError, ValueError):
+            # no introspectable signature, assume the current form
+            legacy = False
+        else:
+            try:
+                signature.bind(None, None)
+                legacy = False
+            except TypeError:
+                legacy = True
+
+        _legacy_hooks[render] = legacy
+        if legacy:
+            warnings.warn('RENDER_AGENT {!r} takes only the agent; hooks are now called as '
+                          'render(agent, canvas) and one-argument hooks are only drawn in '
+                          'the OpenGL window'.format(render), DeprecationWarning, stacklevel=3)
+
+    return legacy
+
+def draw_drone(canvas, drone):
+    '''
+    Draws the agent with its RENDER_AGENT hook. One-argument
+    hooks (render(agent), which draw with OpenGL directly) are
+    still called on OpenGL canvases, after the primitives drawn so
+    far, and skipped on the others.
+    '''
+    render = drone.config.RENDER_AGENT
+    if render == None:
+        return
+
+    if not _is_legacy_hook(render):
+        render(drone, canvas)
+    elif getattr(canvas, 'direct_gl', False):
+        canvas.flush()
+        render(drone)
+
+def draw_environment(canvas, environment, gridlines=True, poses=None):
+    '''
+    Draws a complete frame: the arena gridlines (unless the
+    canvas already has them), every roomba and the agent.
+    '''
+    if gridlines:
+        draw_gridlines(canvas)
+
+    draw_roombas(canvas, environment, poses)
+
+    if environment.agent is not None:
+        draw_drone(canvas, environment.agent)
@@ -27,8 +27,18 @@ class PIDController(object):
 
         p_error and d_error should be numpy arrays
 
-        Returns the calculated control vector.
+        Returns the calculated control vector (a float for a
+        one dimensional controller).
         '''
         self.i_error += p_error * delta
-        control = self.k_pdi.dot([p_error, d_error, self.i_error])
+
+        # weighted sum rather than k_pdi.dot so scalar errors
+        # broadcast against the integral term
+        control = (self.k_pdi[0] * np.asarray(p_error)
+                   + self.k_pdi[1] * np.asarray(d_error)
+                   + self.k_pdi[2] * self.i_error)
+
+        if len(self.i_error) == 1:
+            # a 1d controller steers a scalar (height, yaw)
+            return float(control[0])
         return control
@@ -31,7 +31,7 @@ class CallbackWaypointDemoController(Controller):
         self.selected = 0
 
     def waypoint_callback(self, status, message):
-        print("Waypoint reached!")
+        self.message("Waypoint reached!")
         self.set_new_waypoint()
 
     def set_new_waypoint(self):
@@ -45,4 +45,4 @@ class CallbackWaypointDemoController(Controller):
             target = waypoint
         )
 
-        print("New target: " + str(waypoint))
+        self.message("New target: " + str(waypoint))
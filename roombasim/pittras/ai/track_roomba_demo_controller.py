@@ -3,8 +3,6 @@ track_roomba_demo_controller.py
 '''
 from roombasim.ai import Controller
 
-import roombasim.config as cfg
-
 class TrackRoombaDemoController(Controller):
     '''
     A demonstration of the GoToRoomba and TrackRoomba tasks.
@@ -22,7 +20,7 @@ class TrackRoombaDemoController(Controller):
         self.last_switch = 0
 
     def go_to(self, roomba):
-        print("Going to: " + str(roomba))
+        self.message("Going to: " + str(roomba))
         self.task_controller.switch_task(
             'GoToRoombaTask',
             target_roomba = roomba,
@@ -31,7 +29,7 @@ class TrackRoombaDemoController(Controller):
         )
 
     def track(self, roomba):
-        print("Tracking: " + str(roomba))
+        self.message("Tracking: " + str(roomba))
         self.task_controller.switch_task(
             'TrackRoombaTask',
             target_roomba = roomba,
@@ -42,12 +40,11 @@ class TrackRoombaDemoController(Controller):
     def update(self, delta, elapsed, environment):
         # switch every 8 seconds
         if (elapsed - self.last_switch > 8000):
-            self.target = (self.target + 1) % cfg.MISSION_NUM_TARGETS
+            self.target = (self.target + 1) % self.config.MISSION_NUM_TARGETS
+
+            self.message("New target: " + str(self.target))
 
             # construct the new task
             self.go_to(self.target)
 
-            # TODO: implement logging
-            print("New target: " + str(self.target))
-
             self.last_switch = elapsed
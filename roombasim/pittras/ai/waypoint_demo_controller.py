@@ -40,7 +40,6 @@ class WaypointDemoController(Controller):
                 target = waypoint
             )
 
-            # TODO: implement logging
-            print("New target: " + str(waypoint))
+            self.message("New target: " + str(waypoint))
 
             self.last_switch = elapsed
@@ -31,7 +31,8 @@ TASKS = {
 
 STATES = {
     'DroneState': DroneState,
-    'RoombaState': RoombaState
+    'RoombaState': RoombaState,
+    'RoombaArrayState': RoombaArrayState
 }
 
 RENDER_AGENT = render.render_pittrasdrone
@@ -4,11 +4,12 @@ pittrasdrone.py
 Drone implementation for the Univeristy of Pittsburgh's
 Robotic Automation Society.
 '''
+import math
+
 import numpy as np
 
 from roombasim.agent.drone import Drone
 import roombasim.config as cfg
-from roombasim import geometry
 
 class PittRASDrone(Drone):
 
@@ -19,15 +20,79 @@ class PittRASDrone(Drone):
         '''
         PittRAS drone pad has a diameter of 35cm.
         '''
-        dist2 = pow((self.xy_pos[0] - rba.pos[0]), 2) + pow((self.xy_pos[1] - rba.pos[1]), 2)
-        dist = np.sqrt(dist2)
+        config = self.config
+        if self.z_pos >= config.PITTRAS_DRONE_PAD_ACTIVIATION_HEIGHT:
+            return False
+
+        dx = self.xy_pos[0] - rba.pos[0]
+        dy = self.xy_pos[1] - rba.pos[1]
 
-        return self.z_pos < cfg.PITTRAS_DRONE_PAD_ACTIVIATION_HEIGHT and dist < cfg.PITTRAS_DRONE_PAD_RADIUS
+        return dx * dx + dy * dy < config.PITTRAS_DRONE_PAD_RADIUS * config.PITTRAS_DRONE_PAD_RADIUS
 
     def is_blocking_roomba(self, rba):
         '''
         PittRAS drone has a square base of width: 57cm
+
+        Same test as geometry.circle_intersects_square, done on
+        floats in the drone frame after cheap altitude and
+        bounding radius rejects.
+        '''
+        config = self.config
+        if self.z_pos >= config.PITTRAS_DRONE_PAD_ACTIVIATION_HEIGHT:
+            return False
+
+        ox = rba.pos[0] - self.xy_pos[0]
+        oy = rba.pos[1] - self.xy_pos[1]
+
+        # a roomba further than this cannot reach any edge
+        reach = config.PITTRAS_DRONE_BASE_DIAGONAL + config.ROOMBA_RADIUS
+        if ox * ox + oy * oy >= reach * reach:
+            return False
+
+        # rotate the offset into the drone frame
+        c = math.cos(self.yaw)
+        s = math.sin(self.yaw)
+        local_x = abs(c * ox + s * oy)
+        local_y = abs(c * oy - s * ox)
+
+        half = config.PITTRAS_DRONE_BASE_WIDTH / 2
+        return ((local_y <= half and abs(local_x - half) < config.ROOMBA_RADIUS)
+                or (local_x <= half and abs(local_y - half) < config.ROOMBA_RADIUS))
+
+    @staticmethod
+    def roomba_contacts(xy_pos, yaw, z_pos, roomba_pos, config=cfg):
         '''
-        hit_bumper = geometry.circle_intersects_square(rba.pos, cfg.ROOMBA_RADIUS, self.xy_pos, self.yaw, cfg.PITTRAS_DRONE_BASE_WIDTH)
-        
-        return hit_bumper and self.z_pos < cfg.PITTRAS_DRONE_PAD_ACTIVIATION_HEIGHT
+        Vectorized contact tests.
+
+        The bumper test matches geometry.circle_intersects_square:
+        the roomba must cross one of the four edges, which in the
+        drone frame means lying within the edge span and less than
+        a roomba radius away from the edge line.
+        '''
+        low = (np.asarray(z_pos) < config.PITTRAS_DRONE_PAD_ACTIVIATION_HEIGHT)[..., np.newaxis]
+
+        if not low.any():
+            # nothing can touch a drone that is in the air
+            none = np.zeros(np.shape(roomba_pos)[:-1], dtype=bool)
+            none = np.broadcast_to(none, np.broadcast(low, none).shape)
+            return (none, none)
+
+        offset = roomba_pos - np.asarray(xy_pos)[..., np.newaxis, :]
+        ox = offset[..., 0]
+        oy = offset[..., 1]
+
+        touching = low & ((ox * ox + oy * oy)
+                          < config.PITTRAS_DRONE_PAD_RADIUS * config.PITTRAS_DRONE_PAD_RADIUS)
+
+        # rotate the offsets into the drone frame
+        c = np.cos(yaw)[..., np.newaxis]
+        s = np.sin(yaw)[..., np.newaxis]
+        local_x = np.abs(c * ox + s * oy)
+        local_y = np.abs(c * oy - s * ox)
+
+        half = config.PITTRAS_DRONE_BASE_WIDTH / 2
+        blocking = low & (
+            ((local_y <= half) & (np.abs(local_x - half) < config.ROOMBA_RADIUS))
+            | ((local_x <= half) & (np.abs(local_y - half) < config.ROOMBA_RADIUS)))
+
+        return (touching, blocking)
@@ -6,3 +6,4 @@ Sensor classes
 '''
 from .drone_state import DroneState
 from .roomba_state import RoombaState
+from .roomba_array_state import RoombaArrayState
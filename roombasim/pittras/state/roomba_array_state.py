@@ -0,0 +1,30 @@
+'''
+roomba_array_state.py
+
+Provides a RoombaArrayState class to represent roomba detection
+as arrays.
+'''
+
+from roombasim.ai import State
+
+class RoombaArrayState(State):
+    '''
+    Roomba odometry as arrays:
+
+    Returns (target_roombas, obstacle_roombas) where both are
+    RoombaArrays:
+
+    {
+        pos : float[k, 2] (read-only)
+        heading : float[k] (read-only)
+        tags : tag of each row
+        index : { tag : row }
+    }
+
+    Unlike RoombaState, nothing is rebuilt per query: the arrays
+    are cached by the environment for the whole frame.
+    '''
+
+    @staticmethod
+    def query(environment):
+        return environment.roomba_arrays()
@@ -3,8 +3,6 @@ block_roomba_task.py
 '''
 import numpy as np
 
-import roombasim.config as cfg
-
 from roombasim.ai import Task, TaskState
 from roombasim.pid_controller import PIDController
 from roombasim import geometry
@@ -14,12 +12,14 @@ class BlockRoombaTask(Task):
     A task that lands in front of a roomba.
     '''
 
-    def __init__(self, target_roomba, block_vector):
+    def __init__(self, target_roomba, block_vector, config=None):
         '''
         target_roomba - target roomba tag
         block_vector - float[2] that specifies where to land with respect to the
             the target roomba
         '''
+        super(BlockRoombaTask, self).__init__(config)
+
         self.target_roomba = target_roomba
         self.block_vector = np.array(block_vector)
 
@@ -30,42 +30,43 @@ class BlockRoombaTask(Task):
         self.target_xy = None
 
         # PID controllers
-        self.pid_xy = PIDController(cfg.PITTRAS_PID_XY, dimensions=2)
-        self.pid_yaw = PIDController(cfg.PITTRAS_PID_YAW)
+        self.pid_xy = PIDController(self.config.PITTRAS_PID_XY, dimensions=2)
+        self.pid_yaw = PIDController(self.config.PITTRAS_PID_YAW)
 
     def update(self, delta, elapsed, state_controller, environment):
+        config = self.config
         # fetch roomba odometry
-        target_roombas, _ = state_controller.query('RoombaState', environment)
+        target_roombas, _ = state_controller.query('RoombaArrayState', environment)
 
         # fetch drone odometry
         drone_state = state_controller.query('DroneState', environment)
 
         if self.land_time is not None:
-            if elapsed - self.land_time > cfg.PITTRAS_BLOCK_FLOOR_TIME * 1000:
+            if elapsed - self.land_time > config.PITTRAS_BLOCK_FLOOR_TIME * 1000:
                 self.complete(TaskState.SUCCESS)
             return
 
         if drone_state['z_pos'] == 0:
             self.land_time = elapsed
 
-        if not self.target_roomba in target_roombas:
+        if not self.target_roomba in target_roombas.index:
             self.complete(TaskState.FAILURE, "Roomba not found")
             return
 
-        roomba = target_roombas[self.target_roomba]
+        row = target_roombas.index[self.target_roomba]
+        heading = target_roombas.heading[row]
 
         # calculate the target yaw so that we turn less than 45 degrees
         # in either direction and land with a bumper side perpendicular
         # to the direction of roomba motion
         self.target_yaw = BlockRoombaTask._calculate_target_yaw(
             drone_state['yaw'],
-            roomba['heading']
+            heading
         )
 
         # calculate the target landing position
-        block_vector = geometry.rotate_vector(self.block_vector,
-                                              roomba['heading'])
-        self.target_xy = np.array(roomba['pos']) + block_vector
+        block_vector = geometry.rotate_vector(self.block_vector, heading)
+        self.target_xy = target_roombas.pos[row] + block_vector
 
         # PID calculations
         control_xy = self.pid_xy.get_control(
@@ -86,7 +87,7 @@ class BlockRoombaTask(Task):
         # perform control action
         environment.agent.control(adjusted_xy,
                                   control_yaw,
-                                  cfg.PITTRAS_BLOCK_DESCENT_VEL)
+                                  config.PITTRAS_BLOCK_DESCENT_VEL)
 
     @staticmethod
     def _calculate_target_yaw(drone_heading, roomba_heading):
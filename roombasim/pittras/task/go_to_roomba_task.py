@@ -3,47 +3,48 @@ go_to_roomba_task.py
 '''
 import numpy as np
 
-import roombasim.config as cfg
-
 from roombasim.ai import Task, TaskState
 from roombasim.pid_controller import PIDController
 from roombasim import geometry
 
 class GoToRoombaTask(Task):
 
-    def __init__(self, target_roomba, offset_xy):
+    def __init__(self, target_roomba, offset_xy, config=None):
         '''
         target_roomba - target roomba tag
         offset_xy - float[2] that defines x and y offset from the roomba
         '''
+        super(GoToRoombaTask, self).__init__(config)
+
         self.target_roomba = target_roomba
         self.offset_xy = offset_xy
 
         # PID controllers
-        self.pid_xy = PIDController(cfg.PITTRAS_PID_XY, dimensions=2)
-        self.pid_z = PIDController(cfg.PITTRAS_PID_Z)
+        self.pid_xy = PIDController(self.config.PITTRAS_PID_XY, dimensions=2)
+        self.pid_z = PIDController(self.config.PITTRAS_PID_Z)
 
         # estimate roomba velocity
         self.last_target_xy = None
 
     def update(self, delta, elapsed, state_controller, environment):
+        config = self.config
         # fetch roomba odometry
-        target_roombas, _ = state_controller.query('RoombaState', environment)
+        target_roombas, _ = state_controller.query('RoombaArrayState', environment)
 
         # fetch drone odometry
         drone_state = state_controller.query('DroneState', environment)
 
-        if not self.target_roomba in target_roombas:
+        if not self.target_roomba in target_roombas.index:
             self.complete(TaskState.FAILURE, "Roomba not found")
             return
 
-        roomba = target_roombas[self.target_roomba]
+        row = target_roombas.index[self.target_roomba]
 
-        adjusted_offset_xy = geometry.rotate_vector(self.offset_xy, roomba['heading'])
+        adjusted_offset_xy = geometry.rotate_vector(self.offset_xy, target_roombas.heading[row])
 
-        target_xy = np.array(roomba['pos']) + adjusted_offset_xy
+        target_xy = target_roombas.pos[row] + adjusted_offset_xy
 
-        if np.linalg.norm(target_xy - drone_state['xy_pos']) < cfg.PITTRAS_XYZ_TRANSLATION_ACCURACY:
+        if np.linalg.norm(target_xy - drone_state['xy_pos']) < config.PITTRAS_XYZ_TRANSLATION_ACCURACY:
             self.complete(TaskState.SUCCESS)
             return
 
@@ -60,7 +61,7 @@ class GoToRoombaTask(Task):
         )
 
         control_z = self.pid_z.get_control(
-            cfg.PITTRAS_TRACK_ROOMBA_HEIGHT - drone_state['z_pos'],
+            config.PITTRAS_TRACK_ROOMBA_HEIGHT - drone_state['z_pos'],
             -drone_state['z_vel'],
             delta
         )
@@ -3,8 +3,6 @@ hit_roomba_task.py
 '''
 import numpy as np
 
-import roombasim.config as cfg
-
 from roombasim.ai import Task, TaskState
 from roombasim.pid_controller import PIDController
 from roombasim import geometry
@@ -14,11 +12,13 @@ class HitRoombaTask(Task):
     A task to bump the top of a roomba.
     '''
 
-    def __init__(self, target_roomba):
+    def __init__(self, target_roomba, config=None):
+        super(HitRoombaTask, self).__init__(config)
+
         self.target_roomba = target_roomba
 
         # PID controllers
-        self.pid_xy = PIDController(cfg.PITTRAS_PID_XY, dimensions=2)
+        self.pid_xy = PIDController(self.config.PITTRAS_PID_XY, dimensions=2)
 
         # estimate roomba velocity
         self.last_target_xy = None
@@ -26,22 +26,24 @@ class HitRoombaTask(Task):
         self.land_time = None
 
     def update(self, delta, elapsed, state_controller, environment):
+        config = self.config
         # fetch roomba odometry
-        target_roombas, _ = state_controller.query('RoombaState', environment)
+        target_roombas, _ = state_controller.query('RoombaArrayState', environment)
 
         # fetch drone odometry
         drone_state = state_controller.query('DroneState', environment)
 
-        if not self.target_roomba in target_roombas:
+        if not self.target_roomba in target_roombas.index:
             self.complete(TaskState.FAILURE, "Roomba not found")
             return
 
-        roomba = target_roombas[self.target_roomba]
+        row = target_roombas.index[self.target_roomba]
 
-        target_xy = np.array(roomba['pos'])
+        # copied since it is kept until the next frame
+        target_xy = target_roombas.pos[row].copy()
 
         # check if the roomba is too far away
-        if np.linalg.norm(target_xy - drone_state['xy_pos']) > cfg.PITTRAS_HIT_ROOMBA_MAX_START_DIST:
+        if np.linalg.norm(target_xy - drone_state['xy_pos']) > config.PITTRAS_HIT_ROOMBA_MAX_START_DIST:
             self.complete(TaskState.FAILURE, "Roomba is too far away")
             return
 
@@ -63,13 +65,13 @@ class HitRoombaTask(Task):
         # perform control action
         environment.agent.control(adjusted_xy,
                                   0,
-                                  cfg.PITTRAS_HIT_ROOMBA_DESCENT_VELOCITY)
+                                  config.PITTRAS_HIT_ROOMBA_DESCENT_VELOCITY)
 
         # check if we have hit the roomba
-        if drone_state['z_pos'] < cfg.PITTRAS_DRONE_PAD_ACTIVIATION_HEIGHT:
+        if drone_state['z_pos'] < config.PITTRAS_DRONE_PAD_ACTIVIATION_HEIGHT:
             if self.land_time is None:
                 self.land_time = elapsed
-            if elapsed - self.land_time > cfg.PITTRAS_HIT_ROOMBA_FLOOR_TIME * 1000:
+            if elapsed - self.land_time > config.PITTRAS_HIT_ROOMBA_FLOOR_TIME * 1000:
                 self.complete(TaskState.SUCCESS)
             return
 
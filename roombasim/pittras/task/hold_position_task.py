@@ -4,8 +4,6 @@ hold_position_task.py
 
 import numpy as np
 
-import roombasim.config as cfg
-
 from roombasim.ai import Task, TaskState
 from roombasim.pid_controller import PIDController
 from roombasim import geometry
@@ -28,7 +26,9 @@ class HoldPositionTask(Task):
     to zero.
     '''
 
-    def __init__(self, hold_duration):
+    def __init__(self, hold_duration, config=None):
+        super(HoldPositionTask, self).__init__(config)
+
         self.hold_duration = hold_duration
         self.state = HoldPositionTaskStates.init
 
@@ -38,10 +38,11 @@ class HoldPositionTask(Task):
         self.hold_z = 0
 
         # PID controllers
-        self.pid_xy = PIDController(cfg.PITTRAS_PID_XY, dimensions=2)
-        self.pid_z = PIDController(cfg.PITTRAS_PID_Z)
+        self.pid_xy = PIDController(self.config.PITTRAS_PID_XY, dimensions=2)
+        self.pid_z = PIDController(self.config.PITTRAS_PID_Z)
 
     def update(self, delta, elapsed, state_controller, environment):
+        config = self.config
         if (self.state == HoldPositionTaskStates.done or
                 self.state == HoldPositionTaskStates.failed):
             return
@@ -61,9 +62,9 @@ class HoldPositionTask(Task):
         if (self.hold_duration > 0) and (elapsed - self.start_time >
                                          self.hold_duration * 1000):
             if (np.linalg.norm(drone_state['xy_pos'] - self.hold_xy) <
-                    cfg.PITTRAS_HOLD_POSITION_TOLERANCE and
+                    config.PITTRAS_HOLD_POSITION_TOLERANCE and
                     abs(drone_state['z_pos'] - self.hold_z) <
-                    cfg.PITTRAS_HOLD_POSITION_TOLERANCE):
+                    config.PITTRAS_HOLD_POSITION_TOLERANCE):
                 self.complete(TaskState.SUCCESS)
                 self.state = HoldPositionTaskStates.done
             else:
@@ -3,8 +3,6 @@ land_task.py
 '''
 import numpy as np
 
-import roombasim.config as cfg
-
 from roombasim.ai import Task, TaskState
 from roombasim.pid_controller import PIDController
 from roombasim import geometry
@@ -19,12 +17,14 @@ class LandTask(Task):
     A task to land the drone.
     '''
 
-    def __init__(self):
+    def __init__(self, config=None):
+        super(LandTask, self).__init__(config)
+
         # state machine
         self._state = LandTaskState.init
 
         # xy PID controller for velocity control
-        self.pid_xy = PIDController(cfg.PITTRAS_PID_XY, dimensions=2)
+        self.pid_xy = PIDController(self.config.PITTRAS_PID_XY, dimensions=2)
 
     def update(self, delta, elapsed, state_controller, environment):
         # fetch drone state
@@ -46,7 +46,7 @@ class LandTask(Task):
             # Descend if above the landing height tolerance
             self._state = LandTaskState.descend
 
-            environment.agent.control(adjusted_xy, 0, cfg.PITTRAS_LAND_VELOCITY)
+            environment.agent.control(adjusted_xy, 0, self.config.PITTRAS_LAND_VELOCITY)
         else:
             # Stop descending if below the target height tolerance
             self._state = LandTaskState.done
@@ -3,8 +3,6 @@ takeoff_task.py
 '''
 import numpy as np
 
-import roombasim.config as cfg
-
 from roombasim.ai import Task, TaskState
 
 class TakeoffTaskState:
@@ -27,7 +25,9 @@ class TakeoffTask(Task):
     the task will terminate with SUCCESS.
     '''
 
-    def __init__(self):
+    def __init__(self, config=None):
+        super(TakeoffTask, self).__init__(config)
+
         # null velocities
         self.zero_xy_vel = np.array([0,0], dtype=np.float64)
 
@@ -35,19 +35,20 @@ class TakeoffTask(Task):
         self._state = TakeoffTaskState.init
 
     def update(self, delta, elapsed, state_controller, environment):
+        config = self.config
         drone_state = state_controller.query('DroneState', environment)
 
         height = drone_state['z_pos']
         control_z_vel = drone_state['z_vel']
 
         # Pause before ramping up the motors
-        if elapsed > cfg.PITTRAS_DELAY_BEFORE_TAKEOFF * 1000:
+        if elapsed > config.PITTRAS_DELAY_BEFORE_TAKEOFF * 1000:
             # Check if we reached the target height
-            if height < cfg.PITTRAS_TAKEOFF_COMPLETE_HEIGHT:
+            if height < config.PITTRAS_TAKEOFF_COMPLETE_HEIGHT:
                 # Ascend if below the target height
                 self._state = TakeoffTaskState.ascend
 
-                control_z_vel = cfg.PITTRAS_TAKEOFF_VELOCITY
+                control_z_vel = config.PITTRAS_TAKEOFF_VELOCITY
             else:
                 # Stop ascending if above the target height
                 self._state = TakeoffTaskState.done
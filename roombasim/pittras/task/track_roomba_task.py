@@ -5,7 +5,6 @@ import numpy as np
 
 from roombasim.ai import Task, TaskState
 
-import roombasim.config as cfg
 from roombasim.pid_controller import PIDController
 from roombasim import geometry
 
@@ -18,13 +17,15 @@ class TrackRoombaTask(Task):
     tracking the roomba.
     '''
 
-    def __init__(self, target_roomba, offset_xy, timeout):
+    def __init__(self, target_roomba, offset_xy, timeout, config=None):
         '''
         target_roomba - target roomba tag
         offset_xy - float[2] that defines x and y offset from the roomba
         timeout - task duration in milliseconds. If less than or equal to zero,
             the task will run indefinitely
         '''
+        super(TrackRoombaTask, self).__init__(config)
+
         self.target_roomba = target_roomba
         self.offset_xy = offset_xy
         self.timeout = timeout
@@ -33,8 +34,8 @@ class TrackRoombaTask(Task):
         self.start_time = None
 
         # PID controllers
-        self.pid_xy = PIDController(cfg.PITTRAS_PID_XY, dimensions=2)
-        self.pid_z = PIDController(cfg.PITTRAS_PID_Z)
+        self.pid_xy = PIDController(self.config.PITTRAS_PID_XY, dimensions=2)
+        self.pid_z = PIDController(self.config.PITTRAS_PID_Z)
 
         # estimate roomba velocity
         self.last_target_xy = None
@@ -45,18 +46,18 @@ class TrackRoombaTask(Task):
             self.start_time = elapsed
 
         # fetch roomba odometry
-        target_roombas, _ = state_controller.query('RoombaState', environment)
+        target_roombas, _ = state_controller.query('RoombaArrayState', environment)
 
         # fetch drone odometry
         drone_state = state_controller.query('DroneState', environment)
 
-        if not self.target_roomba in target_roombas:
+        if not self.target_roomba in target_roombas.index:
             self.complete(TaskState.FAILURE, "Roomba not found")
             return
 
         # calculate xy target position
-        roomba = target_roombas[self.target_roomba]
-        target_xy = np.array(roomba['pos']) + self.offset_xy
+        row = target_roombas.index[self.target_roomba]
+        target_xy = target_roombas.pos[row] + self.offset_xy
 
         # check if we should timeout
         if self.timeout > 0 and elapsed - self.start_time >= self.timeout:
@@ -76,7 +77,7 @@ class TrackRoombaTask(Task):
         )
 
         control_z = self.pid_z.get_control(
-            cfg.PITTRAS_TRACK_ROOMBA_HEIGHT - drone_state['z_pos'],
+            self.config.PITTRAS_TRACK_ROOMBA_HEIGHT - drone_state['z_pos'],
             - drone_state['z_vel'],
             delta
         )
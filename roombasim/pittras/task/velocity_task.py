@@ -4,8 +4,6 @@ velocity_task.py
 
 import numpy as np
 
-import roombasim.config as cfg
-
 from roombasim.ai import Task, TaskState
 from roombasim.pid_controller import PIDController
 from roombasim import geometry
@@ -16,22 +14,24 @@ class VelocityTask(Task):
     accepts a single 3d vector that defines the target velocty.
     '''
 
-    def __init__(self, target):
+    def __init__(self, target, config=None):
         '''
         target - 3d (v_x, v_y, v_z) vector
         '''
+        super(VelocityTask, self).__init__(config)
+
         self.target_xy = np.array(target[:2])
         self.target_z = target[2]
 
         # PID controller
-        self.pid_xy = PIDController(cfg.PITTRAS_PID_XY, dimensions=2)
+        self.pid_xy = PIDController(self.config.PITTRAS_PID_XY, dimensions=2)
 
     def update(self, delta, elapsed, state_controller, environment):
         # Fetch current odometry
         drone_state = state_controller.query('DroneState', environment)
 
         if np.linalg.norm(self.target_xy - drone_state['xy_vel']) < \
-                cfg.PITTRAS_VELOCITY_TOLERANCE:
+                self.config.PITTRAS_VELOCITY_TOLERANCE:
             self.complete(TaskState.SUCCESS)
             return
 
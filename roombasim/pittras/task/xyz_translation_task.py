@@ -3,8 +3,6 @@ xyz_translation_task.py
 '''
 import numpy as np
 
-import roombasim.config as cfg
-
 from roombasim.ai import Task, TaskState
 from roombasim.pid_controller import PIDController
 from roombasim import geometry
@@ -21,16 +19,18 @@ class XYZTranslationTask(Task):
     PITTRAS_XYZ_TRANSLATION_ACCURACY meters of the target position.
     '''
 
-    def __init__(self, target):
+    def __init__(self, target, config=None):
         '''
         target - 3d (x,y,z) vector
         '''
+        super(XYZTranslationTask, self).__init__(config)
+
         self.target_xy = np.array(target[:2])
         self.target_z = target[2]
 
         # PID controllers
-        self.pid_xy = PIDController(cfg.PITTRAS_PID_XY, dimensions=2)
-        self.pid_z = PIDController(cfg.PITTRAS_PID_Z)
+        self.pid_xy = PIDController(self.config.PITTRAS_PID_XY, dimensions=2)
+        self.pid_z = PIDController(self.config.PITTRAS_PID_Z)
 
     def update(self, delta, elapsed, state_controller, environment):
         # fetch current odometry
@@ -38,7 +38,7 @@ class XYZTranslationTask(Task):
 
         # check if we have reached the target
         dist = np.linalg.norm(self.target_xy - drone_state['xy_pos'])
-        if dist < cfg.PITTRAS_XYZ_TRANSLATION_ACCURACY:
+        if dist < self.config.PITTRAS_XYZ_TRANSLATION_ACCURACY:
             self.complete(TaskState.SUCCESS)
             return
 
@@ -0,0 +1,365 @@
+'''
+recording.py
+
+Records rounds to compact binary files and plays them back
+without re-simulating.
+
+A recording is a small header followed by one fixed-size record
+per simulated frame (see record_dtype): the time, the score, the
+target selection, the pose and state of every roomba and the
+agent state. Records are written in chunks of chunk_frames
+frames, either raw (the body of the file is then one record
+array, which Replay memory-maps) or as zlib-compressed chunks,
+each preceded by its frame count and size.
+
+To record a round, attach a Recorder once the environment has
+been reset and the agent placed:
+
+    recorder = Recorder('round.rsim', environment)
+    ... environment.update(delta, elapsed) ...
+    recorder.close()
+
+Replay reads any frame of a recording, and ReplayEnvironment
+poses a set of roombas and an agent like the recorded round so
+it can be drawn by the graphics.
+'''
+
+import json
+import struct
+import zlib
+
+import numpy as np
+
+from roombasim.environment import Environment, roomba
+
+MAGIC = b'RSIMREC\x01'
+
+# frames per chunk
+CHUNK_FRAMES = 600
+
+# codes of Environment.target_type in the target_type field
+TARGET_TYPES = (None, 'hitting', 'blocking')
+
+# frame count and byte size in front of compressed chunks
+_CHUNK_HEADER = struct.Struct('<II')
+
+# the body starts at a multiple of this many bytes
+_ALIGNMENT = 16
+
+def record_dtype(num_roombas, agent_size):
+    '''
+    Returns the dtype of one frame of a recording.
+    '''
+    return np.dtype([
+        ('elapsed', '<f8'),
+        ('good_exits', '<i2'),
+        ('bad_exits', '<i2'),
+        ('score', '<i4'),
+        ('target', '<i2'),
+        ('target_type', 'u1'),
+        ('pos', '<f4', (num_roombas, 2)),
+        ('heading', '<f4', (num_roombas,)),
+        ('state', 'i1', (num_roombas,)),
+        ('agent', '<f4', (agent_size,))
+    ])
+
+class Recorder(object):
+    '''
+    Appends a record to path after every update of environment
+    (the environment calls record through its recorder
+    attribute). The first record is the current state.
+
+    The roombas and the agent must not be replaced while
+    recording. Use as a context manager or call close when done.
+    '''
+
+    def __init__(self, path, environment, compress=False,
+                 chunk_frames=CHUNK_FRAMES, elapsed=0.0):
+        '''
+        compress - zlib-compress the chunks (the file can then not
+            be memory-mapped, but is several times smaller)
+        elapsed - time of the current state in milliseconds
+        '''
+        self.path = path
+        self.environment = environment
+        self.compress = compress
+        self.frames = 0
+
+        agent_size = 0
+        if environment.agent is not None:
+            agent_size = len(environment.agent.get_state())
+
+        self.dtype = record_dtype(len(environment.roombas), agent_size)
+        self._buffer = np.zeros(chunk_frames, dtype=self.dtype)
+        self._count = 0
+
+        header = json.dumps({
+            'roombas': [['target' if isinstance(r, roomba.TargetRoomba) else 'obstacle', r.tag]
+                        for r in environment.roombas],
+            'agent_size': agent_size,
+            'compressed': compress,
+            'chunk_frames': chunk_frames
+        }).encode('utf-8')
+
+        size = len(MAGIC) + 4 + len(header)
+        header += b' ' * (-size % _ALIGNMENT)
+
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+        environment.recorder = self
+        self.record(environment, elapsed)
+
+    def record(self, environment, elapsed):
+        '''
+        Adds the state of environment at elapsed milliseconds.
+        '''
+        i = self._count
+        buf = self._buffer
+        roombas = environment.roombas
+
+        buf['elapsed'][i] = elapsed
+        buf['good_exits'][i] = environment.good_exits
+        buf['bad_exits'][i] = environment.bad_exits
+        buf['score'][i] = environment.score
+
+        target = environment.target_roomba
+        buf['target'][i] = -1 if target is None else target
+        buf['target_type'][i] = TARGET_TYPES.index(environment.target_type)
+
+        buf['pos'][i] = [r.pos for r in roombas]
+        buf['heading'][i] = [r.heading for r in roombas]
+        buf['state'][i] = [r.state for r in roombas]
+
+        if environment.agent is not None:
+            buf['agent'][i] = environment.agent.get_state()
+
+        self._count += 1
+        self.frames += 1
+        if self._count == len(buf):
+            self._write_chunk()
+
+    def _write_chunk(self):
+        data = self._buffer[:self._count].tobytes()
+        if self.compress:
+            data = zlib.compress(data)
+            self._file.write(_CHUNK_HEADER.pack(self._count, len(data)))
+
+        self._file.write(data)
+        self._count = 0
+
+    def close(self):
+        if self._file is None:
+            return
+
+        if self._count:
+            self._write_chunk()
+
+        self._file.close()
+        self._file = None
+
+        if self.environment.recorder is self:
+            self.environment.recorder = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Replay(object):
+    '''
+    A recording opened for reading. replay[i] returns frame i as
+    a record of record_dtype.
+
+    Raw recordings are memory-mapped, so any frame is read
+    without loading the rest of the file; compressed recordings
+    decompress one chunk at a time.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+
+        if self._data[:len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError('{} is not a recording'.format(path))
+
+        start = len(MAGIC) + 4
+        (size,) = struct.unpack('<I', self._data[len(MAGIC):start].tobytes())
+        header = json.loads(self._data[start:start + size].tobytes().decode('utf-8'))
+        body = start + size
+
+        # [('target' or 'obstacle', tag)] in recorded order
+        self.roombas = [tuple(r) for r in header['roombas']]
+        self.agent_size = header['agent_size']
+        self.compressed = header['compressed']
+        self.dtype = record_dtype(len(self.roombas), self.agent_size)
+
+        # elapsed time of every frame, built by times()
+        self._times = None
+
+        if self.compressed:
+            self._index_chunks(body)
+            self._chunk = (None, None)
+        else:
+            count = (len(self._data) - body) // self.dtype.itemsize
+            self._records = np.ndarray((count,), dtype=self.dtype,
+                                       buffer=self._data, offset=body)
+            self.frames = count
+
+    def _index_chunks(self, offset):
+        '''
+        Finds the first frame and position of every compressed
+        chunk.
+        '''
+        # (first frame, data offset, data size)
+        self._chunks = []
+        self.frames = 0
+        while offset + _CHUNK_HEADER.size <= len(self._data):
+            (count, size) = _CHUNK_HEADER.unpack(
+                self._data[offset:offset + _CHUNK_HEADER.size].tobytes())
+            offset += _CHUNK_HEADER.size
+            self._chunks.append((self.frames, offset, size))
+            self.frames += count
+            offset += size
+
+        self._starts = [c[0] for c in self._chunks]
+
+    def __len__(self):
+        return self.frames
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.frames
+        if not 0 <= index < self.frames:
+            raise IndexError('frame {} out of range'.format(index))
+
+        if not self.compressed:
+            return self._records[index]
+
+        chunk = int(np.searchsorted(self._starts, index, side='right')) - 1
+        return self._chunk_records(chunk)[index - self._starts[chunk]]
+
+    def _chunk_records(self, chunk):
+        '''
+        Returns the records of compressed chunk number chunk (the
+        last chunk read is kept).
+        '''
+        (cached, records) = self._chunk
+        if cached != chunk:
+            (_, offset, size) = self._chunks[chunk]
+            data = zlib.decompress(self._data[offset:offset + size].tobytes())
+            records = np.frombuffer(data, dtype=self.dtype)
+            self._chunk = (chunk, records)
+
+        return records
+
+    def times(self):
+        '''
+        Returns the elapsed time (milliseconds) of every frame as
+        a float64 array. Compressed recordings are decompressed
+        once to build it.
+        '''
+        if self._times is None:
+            if self.compressed:
+                self._times = np.concatenate(
+                    [self._chunk_records(i)['elapsed'] for i in range(len(self._chunks))]
+                    or [np.zeros(0)])
+            else:
+                self._times = np.array(self._records['elapsed'])
+        return self._times
+
+    def frame_at(self, elapsed):
+        '''
+        Returns the index of the last frame recorded at or before
+        elapsed milliseconds (0 before the first frame).
+        '''
+        index = int(np.searchsorted(self.times(), elapsed + 1e-6, side='right')) - 1
+        return max(index, 0)
+
+class ReplayEnvironment(Environment):
+    '''
+    An environment that shows the frames of a Replay instead of
+    simulating. seek jumps to any frame, seek_time to any time,
+    and update advances by delta (showing the last frame recorded
+    at or before the new time), so a Display can play it like a
+    live round whatever its time step.
+
+    The agent is an instance of config.AGENT (so config, by
+    default a copy of the current constants, must match the
+    configuration the round was recorded with). A ValueError is
+    raised if the recording has a drone and no AGENT is set.
+    '''
+
+    def __init__(self, replay, config=None):
+        super(ReplayEnvironment, self).__init__(config)
+        self.replay = replay
+        self.index = 0
+        self.elapsed = 0.0
+
+        for (kind, tag) in replay.roombas:
+            if kind == 'target':
+                self.roombas.append(roomba.TargetRoomba([0, 0], 0, tag=tag, config=self.config))
+            else:
+                self.roombas.append(roomba.ObstacleRoomba([0, 0], 0, tag=tag, config=self.config))
+
+        if replay.agent_size:
+            if self.config.AGENT is None:
+                raise ValueError('{} has a drone but no AGENT is configured (load the '
+                                 'configuration it was recorded with, such as '
+                                 'roombasim.pittras.config)'.format(replay.path))
+            self.agent = self.config.AGENT([0, 0], 0, config=self.config)
+
+        self.seek(0)
+
+    def seek(self, index):
+        '''
+        Poses the roombas and agent like frame index (clamped to
+        the recording).
+        '''
+        index = min(max(index, 0), len(self.replay) - 1)
+        record = self.replay[index]
+
+        self.index = index
+        self.frame += 1
+        self.elapsed = float(record['elapsed'])
+        self._time = self.elapsed
+        self.good_exits = int(record['good_exits'])
+        self.bad_exits = int(record['bad_exits'])
+        self.score = int(record['score'])
+
+        target = int(record['target'])
+        self.target_roomba = None if target < 0 else target
+        self.target_type = TARGET_TYPES[record['target_type']]
+
+        for (r, pos, heading, state) in zip(self.roombas, record['pos'].tolist(),
+                                            record['heading'].tolist(),
+                                            record['state'].tolist()):
+            r.pos[0] = pos[0]
+            r.pos[1] = pos[1]
+            r.heading = heading
+            r.state = state
+
+        if self.agent is not None:
+            self.agent.set_state(record['agent'].tolist())
+
+    def seek_time(self, elapsed):
+        '''
+        Poses the roombas and agent like the last frame recorded
+        at or before elapsed milliseconds.
+        '''
+        self.seek(self.replay.frame_at(elapsed))
+
+    def reset(self, seed=None):
+        self.seek(0)
+
+    def update(self, delta, elapsed):
+        '''
+        Advances the replay clock by delta seconds and shows the
+        last frame recorded at or before it.
+        '''
+        time = self._time + delta * 1000
+        index = self.replay.frame_at(time)
+        if index != self.index:
+            self.seek(index)
+        self._time = time
@@ -0,0 +1,303 @@
+'''
+runner.py
+
+Plays game rounds without graphics, either in this process or
+sharded across a pool of worker processes.
+
+Every round gets its own child seed (see
+environment.noise.spawn_seeds), so the outcome of round i only
+depends on the root seed and i, not on the number of workers
+or the order in which rounds finish.
+'''
+
+from __future__ import print_function
+
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import roombasim.config as cfg
+from roombasim import events
+from roombasim.environment import Environment, ArrayEnvironment, EventEnvironment
+from roombasim.environment.roomba import TargetRoomba
+from roombasim.environment import noise
+
+# simulation engines selectable by name
+ENGINES = {
+    'object': Environment,
+    'array': ArrayEnvironment,
+    'event': EventEnvironment
+}
+
+# columns of the per-round details file
+RESULT_FIELDS = ('round', 'good_exits', 'bad_exits', 'score', 'seconds')
+
+# columns of a stats directory (see StatsWriter) as (name, dtype,
+# one value per target roomba)
+STATS_COLUMNS = (
+    ('done', np.bool_, False),
+    ('good_exits', np.int16, False),
+    ('bad_exits', np.int16, False),
+    ('score', np.int32, False),
+    ('seconds', np.float32, False),
+    ('exit_time', np.float32, True),
+    ('exit_reward', np.int16, True)
+)
+
+# environments reused by run_round within a process
+_environments = {}
+
+class _ExitSink(events.NullSink):
+    '''
+    Keeps the time and reward of every target exit of a round.
+    '''
+    enabled = True
+
+    def __init__(self):
+        self.exits = []
+
+    def emit(self, elapsed, kind, tag=None, data=None):
+        if kind == events.EXIT:
+            self.exits.append((tag, elapsed, data))
+
+def play_round(environment, delta=1/60., controller=None):
+    '''
+    Plays one full round on an environment that was just reset.
+
+    EventEnvironment jumps through the round in a single update
+    (unless there is a controller), the other engines step at a
+    fixed rate. The controller, if any, runs after every step
+    like in the windowed run.
+    '''
+    duration = environment.config.MISSION_ROUND_DURATION
+
+    if controller is None and isinstance(environment, EventEnvironment):
+        environment.update(duration, 0)
+    elif controller is None:
+        for elapsed in np.arange(0, duration, delta):
+            environment.update(delta, 1000 * elapsed)
+    else:
+        for elapsed in np.arange(0, duration, delta):
+            environment.update(delta, 1000 * elapsed)
+            controller.frame_update(delta, 1000 * elapsed, environment)
+
+def run_round(job):
+    '''
+    Plays the round described by job = (index, engine, seed,
+    config.Config) and
+    returns its result as a dict with the RESULT_FIELDS keys, plus
+    exit_time (seconds) and exit_reward lists indexed by target
+    tag (NaN and 0 for targets still in the arena).
+
+    Worker entry point; one environment is kept per process,
+    engine and configuration.
+    '''
+    (index, engine, seed, config) = job
+
+    key = (engine, config.digest())
+    environment = _environments.get(key)
+    if environment is None:
+        environment = _environments[key] = ENGINES[engine](config)
+
+    start = time.time()
+    environment.reset(seed=seed)
+    sink = environment.event_log = _ExitSink()
+    play_round(environment)
+    environment.event_log = events.NULL_SINK
+
+    targets = environment.config.MISSION_NUM_TARGETS
+    exit_time = [float('nan')] * targets
+    exit_reward = [0] * targets
+    target_tags = set(rba.tag for rba in environment.roombas
+                      if isinstance(rba, TargetRoomba))
+    for (tag, elapsed, reward) in sink.exits:
+        if tag in target_tags:
+            exit_time[tag] = elapsed / 1000.0
+            exit_reward[tag] = reward
+
+    return {
+        'round': index,
+        'good_exits': environment.good_exits,
+        'bad_exits': environment.bad_exits,
+        'score': environment.score,
+        'seconds': time.time() - start,
+        'exit_time': exit_time,
+        'exit_reward': exit_reward
+    }
+
+def _init_worker(config_module):
+    '''
+    Loads the configuration module in a freshly started worker.
+    '''
+    import importlib
+    cfg.load(importlib.import_module(config_module))
+
+def run_rounds(rounds, engine='object', seed=None, workers=1,
+               config_module='roombasim.pittras.config', config=None):
+    '''
+    Plays rounds rounds and yields each result dict as soon as
+    its round finishes (in completion order when workers > 1).
+
+    seed - root seed (int, SeedSequence or None)
+    workers - number of processes; 1 plays every round in this
+        process
+    config_module - configuration loaded in each worker
+    config - the config.Config the rounds are played with (by
+        default a copy of the current constants)
+    '''
+    if config is None:
+        config = cfg.current()
+
+    seeds = noise.spawn_seeds(seed, rounds)
+    jobs = [(i, engine, seeds[i], config) for i in range(rounds)]
+
+    if workers <= 1:
+        for job in jobs:
+            yield run_round(job)
+        return
+
+    pool = multiprocessing.Pool(workers, _init_worker, (config_module,))
+    try:
+        for result in pool.imap_unordered(run_round, jobs):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def write_stats(stats_file, results):
+    '''
+    Writes results (ordered by round) in the stats.txt layout
+    read by plot_hist.py: one line each of good exits, bad exits
+    and scores.
+    '''
+    results = sorted(results, key=lambda r: r['round'])
+    with open(stats_file, 'w') as f:
+        for key in ('good_exits', 'bad_exits', 'score'):
+            f.write(', '.join(str(r[key]) for r in results) + '\n')
+
+def write_details(details_file, results):
+    '''
+    Writes one CSV row per round (RESULT_FIELDS) under a header
+    line. The root seed entropy needed to replay any round is in
+    the meta.json of the stats directory (see StatsWriter).
+    '''
+    results = sorted(results, key=lambda r: r['round'])
+    with open(details_file, 'w') as f:
+        f.write(','.join(RESULT_FIELDS) + '\n')
+        for r in results:
+            f.write(','.join(str(r[key]) for key in RESULT_FIELDS) + '\n')
+
+class StatsWriter(object):
+    '''
+    Writes round results to a directory with one .npy file per
+    column (see STATS_COLUMNS), row i holding round i, plus a
+    meta.json with the run settings: root seed entropy, engine,
+    the digest of the config.Config the rounds were played with
+    (by default a copy of the current constants) and round_seeds.
+
+    With round_seeds (the default), round i was seeded with
+    noise.spawn_seeds(entropy, rounds)[i] and can be replayed on
+    its own. Engines that draw every round from one stream (the
+    batched engine) pass round_seeds=False: the entropy then only
+    reproduces the whole run.
+
+    Results can arrive in any order. They are buffered and written
+    into the memory-mapped columns every chunk_rounds rounds;
+    rows of unfinished rounds have done = False. Read the
+    directory back with read_stats.
+
+    Use as a context manager or call close when done.
+    '''
+
+    def __init__(self, path, rounds, seed=None, engine='object', chunk_rounds=1024,
+                 config=None, round_seeds=True):
+        if config is None:
+            config = cfg.current()
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self.path = path
+        self.chunk_rounds = chunk_rounds
+        self.completed = 0
+        self._pending = []
+
+        targets = config.MISSION_NUM_TARGETS
+        self._columns = {}
+        for (name, dtype, per_target) in STATS_COLUMNS:
+            shape = (rounds, targets) if per_target else (rounds,)
+            column = np.lib.format.open_memmap(os.path.join(path, name + '.npy'),
+                                               mode='w+', dtype=dtype, shape=shape)
+            column[:] = np.nan if name == 'exit_time' else 0
+            self._columns[name] = column
+
+        self.meta = {
+            'rounds': rounds,
+            'targets': targets,
+            'engine': engine,
+            'seed_entropy': str(noise.seed_sequence(seed).entropy),
+            'config_digest': config.digest(),
+            'round_seeds': round_seeds,
+            'completed': 0
+        }
+        self._write_meta()
+
+    def add(self, result):
+        '''
+        Adds a result dict of run_round (exit_time and exit_reward
+        are optional).
+        '''
+        self._pending.append(result)
+        if len(self._pending) >= self.chunk_rounds:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            rows = np.array([r['round'] for r in self._pending])
+            for (name, _, _) in STATS_COLUMNS:
+                if name == 'done':
+                    self._columns[name][rows] = True
+                elif name in self._pending[0]:
+                    self._columns[name][rows] = [r[name] for r in self._pending]
+
+            self.completed += len(self._pending)
+            self._pending = []
+
+        for column in self._columns.values():
+            column.flush()
+
+        self.meta['completed'] = self.completed
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f, indent=2)
+
+    def close(self):
+        if self._columns:
+            self.flush()
+            self._columns = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_stats(path):
+    '''
+    Opens a directory written by StatsWriter. Returns (columns,
+    meta) where columns maps each column name to a read-only
+    memory-mapped array.
+    '''
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    columns = dict((name, np.load(os.path.join(path, name + '.npy'), mmap_mode='r'))
+                   for (name, _, _) in STATS_COLUMNS)
+
+    return (columns, meta)
@@ -0,0 +1,259 @@
+'''
+sweep.py
+
+Plays headless rounds over a grid or a random sample of config
+constants and collects the results of every setting.
+
+A sweep is described by a dict (usually read from a JSON file):
+
+{
+    "search": "grid",
+    "samples": 20,
+    "rounds": 8,
+    "fixed": {"MISSION_ROUND_DURATION": 120},
+    "params": {
+        "PITTRAS_PID_XY[0]": [0.3, 0.5, 0.7],
+        "DRONE_MAX_HORIZ_ACCEL": {"linspace": [1, 4, 4]}
+    }
+}
+
+search - "grid" (every combination of the parameter values) or
+    "random" (samples points drawn independently)
+rounds - rounds played per point (default 1)
+fixed - constants set for every point
+params - constant name -> values. NAME[i] sets element i of an
+    array constant. Values are a list (a random search picks one
+    of them), {"linspace": [start, stop, count]}, or, for a
+    random search only, {"uniform": [low, high]},
+    {"loguniform": [low, high]} or {"randint": [low, high]}
+    (high included).
+
+Every point plays the same seeded rounds (round i gets the seed
+of round i of nographics with the same seed), so differences
+between points are not blurred by different roomba noise.
+
+Every round gets a new environment, drone and controller built
+from a config.Config with the constants of its point, so the
+module constants are never changed and a worker process can play
+any mix of points.
+'''
+
+from __future__ import print_function
+
+import csv
+import importlib
+import itertools
+import multiprocessing
+import re
+import time
+
+import numpy as np
+
+import roombasim.config as cfg
+from roombasim import runner
+from roombasim.environment import noise
+
+# NAME or NAME[index]
+_param_rgx = re.compile(r'([A-Z_][A-Z0-9_]*)(?:\[(\d+)\])?$')
+
+# result fields of every round
+ROUND_FIELDS = ('point', 'round', 'good_exits', 'bad_exits', 'score', 'seconds')
+
+def _values(name, values, rng=None):
+    '''
+    Returns the candidate values of a parameter or, if rng is
+    given, one value drawn at random.
+    '''
+    if isinstance(values, dict):
+        if len(values) != 1:
+            raise ValueError('{}: expected a single distribution, got {}'.format(name, values))
+        ((kind, args),) = values.items()
+
+        if kind == 'linspace':
+            values = np.linspace(args[0], args[1], int(args[2])).tolist()
+        elif rng is None:
+            raise ValueError('{}: {} can only be used in a random search'.format(name, kind))
+        elif kind == 'uniform':
+            return float(rng.uniform(args[0], args[1]))
+        elif kind == 'loguniform':
+            return float(np.exp(rng.uniform(np.log(args[0]), np.log(args[1]))))
+        elif kind == 'randint':
+            return int(rng.integers(args[0], args[1], endpoint=True))
+        else:
+            raise ValueError('{}: unknown distribution {}'.format(name, kind))
+
+    if rng is not None:
+        return values[rng.integers(len(values))]
+    return list(values)
+
+def points(spec, seed=None):
+    '''
+    Returns the points of a sweep spec as a list of dicts
+    (parameter name -> value), fixed constants included.
+
+    seed - root seed (int, SeedSequence or None) of the random
+        search
+    '''
+    params = spec.get('params', {})
+    fixed = spec.get('fixed', {})
+    for name in list(params) + list(fixed):
+        if not _param_rgx.match(name):
+            raise ValueError('not a config constant: {}'.format(name))
+
+    names = sorted(params)
+    search = spec.get('search', 'grid')
+
+    if search == 'grid':
+        grid = itertools.product(*[_values(name, params[name]) for name in names])
+        result = [dict(zip(names, values)) for values in grid]
+    elif search == 'random':
+        rng = np.random.default_rng(noise.seed_sequence(seed).entropy)
+        result = [dict((name, _values(name, params[name], rng)) for name in names)
+                  for i in range(int(spec.get('samples', 1)))]
+    else:
+        raise ValueError('unknown search: {}'.format(search))
+
+    for point in result:
+        point.update(fixed)
+    return result
+
+def constants(point):
+    '''
+    Turns the parameters of a point into the config constants to
+    set: NAME[i] entries are written into a copy of the
+    current array and lists replace array constants as arrays.
+    '''
+    values = {}
+    for (name, value) in sorted(point.items()):
+        (attr, index) = _param_rgx.match(name).groups()
+        if not hasattr(cfg, attr):
+            raise KeyError('unknown constant: {}'.format(attr))
+        current = values.get(attr, getattr(cfg, attr))
+
+        if index is not None:
+            current = np.array(current, dtype=np.float64)
+            current[int(index)] = value
+            value = current
+        elif isinstance(current, np.ndarray):
+            value = np.array(value, dtype=current.dtype)
+
+        values[attr] = value
+
+    return values
+
+def _load_controller(path):
+    (module, name) = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module), name)
+
+def run_point_round(job):
+    '''
+    Plays round index of a sweep point and returns its result as a
+    dict with the ROUND_FIELDS keys.
+
+    job = (point index, point, round index, engine, seed,
+    controller path or None, drone start location)
+
+    Worker entry point.
+    '''
+    (index, point, round_index, engine, seed, controller, location) = job
+
+    config = cfg.Config(**constants(point))
+
+    start = time.time()
+    environment = runner.ENGINES[engine](config)
+    environment.reset(seed=seed)
+
+    if controller is not None:
+        environment.agent = config.AGENT([location[0], location[1]], 0, location[2],
+                                         config=config)
+        controller = _load_controller(controller)(config=config)
+
+    runner.play_round(environment, controller=controller)
+
+    return {
+        'point': index,
+        'round': round_index,
+        'good_exits': environment.good_exits,
+        'bad_exits': environment.bad_exits,
+        'score': environment.score,
+        'seconds': time.time() - start
+    }
+
+def run_sweep(points, rounds, engine='object', seed=None, workers=1,
+              controller=None, start_location=(1.5, 1.5, 0.0),
+              config_module='roombasim.pittras.config'):
+    '''
+    Plays rounds rounds of every point and yields each result dict
+    (see run_point_round) as soon as its round finishes.
+
+    controller - dotted path of a controller class run in every
+        round (with a drone at start_location), or None to play
+        rounds without a drone
+    workers - number of processes; 1 plays every round in this
+        process
+    config_module - configuration loaded in each worker
+    '''
+    seeds = noise.spawn_seeds(seed, rounds)
+    jobs = [(i, point, r, engine, seeds[r], controller, tuple(start_location))
+            for (i, point) in enumerate(points)
+            for r in range(rounds)]
+
+    if workers <= 1:
+        for job in jobs:
+            yield run_point_round(job)
+        return
+
+    pool = multiprocessing.Pool(workers, runner._init_worker, (config_module,))
+    try:
+        for result in pool.imap_unordered(run_point_round, jobs):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _mean(values):
+    return float(np.mean(values)) if values else float('nan')
+
+def summarize(points, results):
+    '''
+    Aggregates round results per point. Returns one dict per point
+    (in point order) with the point parameters and the number of
+    rounds, mean and standard deviation of the score and mean good
+    and bad exits.
+    '''
+    by_point = [[] for point in points]
+    for result in results:
+        by_point[result['point']].append(result)
+
+    rows = []
+    for (i, point) in enumerate(points):
+        scores = [r['score'] for r in by_point[i]]
+        row = dict(point)
+        row.update({
+            'point': i,
+            'rounds': len(scores),
+            'score_mean': _mean(scores),
+            'score_std': float(np.std(scores)) if scores else float('nan'),
+            'good_mean': _mean([r['good_exits'] for r in by_point[i]]),
+            'bad_mean': _mean([r['bad_exits'] for r in by_point[i]])
+        })
+        rows.append(row)
+
+    return rows
+
+# aggregate columns of a summary row
+SUMMARY_FIELDS = ('rounds', 'score_mean', 'score_std', 'good_mean', 'bad_mean')
+
+def write_table(path, rows):
+    '''
+    Writes summary rows to a CSV file: the point index, one column
+    per parameter and the SUMMARY_FIELDS.
+    '''
+    names = sorted(set(rows[0]) - set(SUMMARY_FIELDS) - set(['point'])) if rows else []
+    with open(path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(['point'] + names + list(SUMMARY_FIELDS))
+        for row in rows:
+            writer.writerow([row['point']] + [row[name] for name in names]
+                            + [row[field] for field in SUMMARY_FIELDS])